@@ -0,0 +1,148 @@
+"""Compact archive of fetched SoFIFA pages.
+
+Pages are stored in a single SQLite file with zlib-compressed bodies, along with
+the URL, query parameters, fetch timing and size of every page, so a run can be
+replayed offline through the same stream code. Pages are also indexed by
+stream, ``player_id`` and ``change_id`` so they can be re-parsed with the
+current parsers without fetching them again.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+from tap_sofifa.transport import Page
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    stream TEXT NOT NULL,
+    url TEXT NOT NULL,
+    player_id INTEGER,
+    change_id INTEGER,
+    params TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    elapsed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_url ON pages (url);
+CREATE INDEX IF NOT EXISTS pages_stream ON pages (stream, player_id, change_id);
+"""
+
+PLAYER_PATH = re.compile(r"/player/(\d+)")
+
+
+class ArchivedPage(NamedTuple):
+    """A page stored in the archive, with its body still compressed."""
+
+    url: str
+    player_id: Optional[int]
+    change_id: Optional[int]
+    body: bytes
+
+
+def page_ids(url: str) -> Tuple[Optional[int], Optional[int]]:
+    """Return the ``player_id`` and ``change_id`` a page URL refers to."""
+    parts = urlsplit(url)
+    player = PLAYER_PATH.search(parts.path)
+    change = dict(parse_qsl(parts.query)).get("r", "")
+    return (
+        int(player.group(1)) if player else None,
+        int(change) if change.isdigit() else None,
+    )
+
+
+def decompress(body: bytes) -> str:
+    """Return the page source of a compressed archive body."""
+    return zlib.decompress(body).decode("utf-8")
+
+
+class PageArchive:
+    """Append-only store of fetched pages, looked up by URL."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        # Pages may be recorded and replayed from concurrent fetches
+        self._lock = threading.Lock()
+
+    def add(self, stream: str, page: Page) -> None:
+        """Store a fetched page."""
+        body = page.source.encode("utf-8")
+        params = dict(parse_qsl(urlsplit(page.url).query))
+        player_id, change_id = page_ids(page.url)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO pages (stream, url, player_id, change_id, params,"
+                " fetched_at, elapsed, size, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    stream,
+                    page.url,
+                    player_id,
+                    change_id,
+                    json.dumps(params, sort_keys=True),
+                    time.time(),
+                    page.elapsed,
+                    len(body),
+                    zlib.compress(body),
+                ),
+            )
+
+    def get(self, url: str) -> Optional[Page]:
+        """Return the latest page stored for a URL, if any."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, elapsed, body FROM pages WHERE url = ?"
+                " ORDER BY id DESC LIMIT 1",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Page(row[0], decompress(row[2]), row[1])
+
+    def pages(
+        self,
+        stream: str,
+        player_id: Optional[int] = None,
+        change_id: Optional[int] = None,
+        batch_size: int = 100,
+    ) -> Iterator[List[ArchivedPage]]:
+        """Yield batches of the latest page stored for every URL of a stream.
+
+        Args:
+            stream: Name of the stream the pages were fetched for.
+            player_id: Only yield the pages of this player.
+            change_id: Only yield the pages of this change.
+            batch_size: Number of pages per batch.
+        """
+        query = "SELECT MAX(id) FROM pages WHERE stream = ?"
+        args: list = [stream]
+        if player_id is not None:
+            query += " AND player_id = ?"
+            args.append(player_id)
+        if change_id is not None:
+            query += " AND change_id = ?"
+            args.append(change_id)
+        cursor = self._connection.execute(
+            "SELECT url, player_id, change_id, body FROM pages"
+            f" WHERE id IN ({query} GROUP BY url) ORDER BY id",
+            args,
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [ArchivedPage(*row) for row in rows]
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        self._connection.close()
@@ -1,12 +1,727 @@
 """Custom client handling, including SoFIFAStream base class."""
 
+import hashlib
+import importlib
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import nullcontext
+from functools import partial
+from itertools import chain, islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import urljoin
+
+import backoff
+from bs4 import BeautifulSoup, SoupStrainer
 from core.scraper import ScraperStream
+from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
+from singer_sdk.exceptions import RetriableAPIError
+
+from tap_sofifa.archive import PageArchive, decompress
+from tap_sofifa.extraction import Extractor
+from tap_sofifa.ordering import OrderedEmitter
+from tap_sofifa.profiling import Profiler
+from tap_sofifa.transport import (
+    HedgedTransport,
+    HTTPTransport,
+    NotModified,
+    RecordingTransport,
+    ReplayTransport,
+    PageMemo,
+    SeleniumTransport,
+    Transport,
+)
+
+
+def _extract_archived_page(
+    stream_class: Tuple[str, str], body: bytes
+) -> Tuple[List[dict], Optional[str]]:
+    module, name = stream_class
+    extractor = getattr(importlib.import_module(module), name).extractor
+    try:
+        return extractor.extract(BeautifulSoup(decompress(body), "html.parser")), None
+    except RetriableAPIError as ex:
+        return [], str(ex)
+
 
 class SoFIFAStream(ScraperStream):
     """Stream class for SoFIFA streams."""
 
     url_base = "https://www.sofifa.com/"
-    
+
+    # Compiled from the stream's extraction spec, see tap_sofifa.extraction
+    extractor: Optional[Extractor] = None
+
+    # Whether every archived page of the stream can be re-parsed on its own
+    reparsable = True
+
+    # Restricts parsing to the parts of a page the stream reads
+    page_strainer: Optional[SoupStrainer] = None
+
+    # Extract records lazily, decomposing the nodes of each record once it is
+    # yielded, instead of building every record of a page up front. The page
+    # source and its parse tree are still built whole, so this lowers the
+    # peak of a page rather than bounding it
+    stream_records = False
+
+    # Revalidate the stream's pages with conditional requests when
+    # ``skip_unchanged`` is set
+    conditional_requests = False
+
+    # Whether the URLs returned by get_page_urls run past the last page, which
+    # is then found by get_next_page_url
+    open_ended_pages = False
+
+    _extracted: Optional[Tuple[BeautifulSoup, Iterable[dict]]] = None
+    _transport: Optional[Transport] = None
+    # Whether the transport outlives a sync of the stream, as in service mode
+    keep_transport = False
+    # Moving average of the seconds a page takes to fetch and extract
+    _page_seconds: float = 0
+
     def _agree_cookies(self) -> None:
-        self.driver.find_element(By.LINK_TEXT, 'Continue to Site').click()
\ No newline at end of file
+        try:
+            self.driver.find_element(By.LINK_TEXT, "Continue to Site").click()
+        except NoSuchElementException:
+            pass
+
+    def driver_options(self):
+        """Return the options new WebDriver sessions are launched with."""
+        options = webdriver.ChromeOptions()
+        for argument in ("--headless", "--no-sandbox", "--disable-dev-shm-usage"):
+            options.add_argument(argument)
+        return options
+
+    def create_driver(self):
+        """Launch a new WebDriver session with ``driver_options``.
+
+        Crashed sessions are replaced with sessions from this factory, so
+        streams driving another browser than Chrome override it.
+        """
+        return webdriver.Chrome(options=self.driver_options())
+
+    def _relaunch_driver(self):
+        """Replace the stream's WebDriver session with one from ``create_driver``.
+
+        The transport quits the session it replaces.
+        """
+        self.driver = self.create_driver()
+        return self.driver
+
+    @property
+    def transport(self) -> Transport:
+        """Return the transport pages are fetched with, built from the config.
+
+        ``transport`` selects ``selenium`` (the default) or ``http``. With an
+        ``archive_path``, ``archive_mode`` either records every fetched page into
+        the archive or replays pages from it, optionally at ``replay_latency``
+        times the recorded latencies. Streams that cannot be re-parsed page by
+        page replay their pages in ``reparse`` mode.
+
+        With ``hedge_percentile``, HTTP requests slower than that percentile
+        of the recent page latencies are sent a second time (see
+        :class:`HedgedTransport`). A WebDriver session loads one page at a
+        time, so browser requests are never hedged.
+        """
+        if self._transport is None:
+            archive_path = self.config.get("archive_path")
+            mode = self.config.get("archive_mode", "record")
+            if archive_path and mode in ("replay", "reparse"):
+                self._transport = ReplayTransport(
+                    PageArchive(archive_path), self.config.get("replay_latency", 0)
+                )
+                return self._transport
+
+            transport: Transport
+            if self.config.get("transport", "selenium") == "http":
+                transport = HTTPTransport(self.timeout)
+                if self.config.get("hedge_percentile"):
+                    transport = HedgedTransport(
+                        transport,
+                        self._tap.hedge_budget,
+                        self.config["hedge_percentile"],
+                    )
+            else:
+                transport = SeleniumTransport(
+                    self.driver,
+                    self.timeout,
+                    self._agree_cookies,
+                    launch=self._relaunch_driver,
+                )
+            if archive_path:
+                transport = RecordingTransport(
+                    transport, PageArchive(archive_path), self.name
+                )
+            self._transport = transport
+        return self._transport
+
+    @property
+    def selected_properties(self) -> Optional[FrozenSet[str]]:
+        """Return the top-level properties selected in the catalog.
+
+        ``None`` when every property is selected, or when the stream itself is
+        not selected and only read by other streams.
+        """
+        if not self.selected:
+            return None
+        properties = self.schema.get("properties", {})
+        selected = frozenset(
+            name for name in properties if self.mask.get(("properties", name), True)
+        )
+        return None if len(selected) == len(properties) else selected
+
+    @property
+    def record_extractor(self) -> Extractor:
+        """Return the stream's extractor narrowed to the selected properties."""
+        return self.extractor.select(self.selected_properties)
+
+    def _needs_page(self, keys: dict) -> bool:
+        """Whether any selected property has to be read from the page itself.
+
+        Pages whose selected properties all come from their URL (see
+        :meth:`get_page_keys`) are not fetched; such streams have no pagination.
+        """
+        selected = self.selected_properties
+        return selected is None or not selected <= keys.keys()
+
+    @property
+    def profiler(self) -> Optional[Profiler]:
+        """Return the tap's profiler, if the run is profiled."""
+        return getattr(self._tap, "profiler", None)
+
+    def sync(self, context: Optional[dict] = None) -> None:
+        """Sync the stream, then release its transport unless it is kept warm."""
+        try:
+            super().sync(context)
+        finally:
+            if not self.keep_transport:
+                self.close_transport()
+
+    def forget_run(self) -> None:
+        """Drop what the stream cached in a run, before it runs with other settings."""
+        self._extracted = None
+        self._page_seconds = 0
+
+    def close_transport(self) -> None:
+        """Close the stream's transport, quitting its browser session if any."""
+        if self._transport is not None:
+            transport, self._transport = self._transport, None
+            transport.close()
+
+    def get_url(self, context: Optional[dict], path: Optional[str] = None) -> str:
+        """Return the URL of the first page, including its query parameters.
+
+        ``path`` overrides the stream's path.
+        """
+        url = urljoin(self.url_base, path if path is not None else self.path or "")
+        params = self.get_url_params(context)
+        if params:
+            url += "?" + "&".join(f"{key}={value}" for key, value in params.items())
+        return url
+
+    def get_url_params(self, context: Optional[dict]) -> Dict[str, Any]:
+        """Return the query parameters of the first page."""
+        return {}
+
+    def get_league_id(self, context: Optional[dict]) -> Optional[int]:
+        """Return the league the stream's pages are filtered by, if any."""
+        return (context or {}).get("league_id", self.config.get("league_id"))
+
+    def get_queue_partition(self, context: Optional[dict]) -> dict:
+        """Return the partition the stream's pages are queued under in a work queue."""
+        return {
+            "league_id": self.get_league_id(context),
+            "change_id": self.config.get("change_id"),
+        }
+
+    def get_next_page_url(self, response: BeautifulSoup) -> Optional[str]:
+        """Return the URL of the page following ``response``, if any."""
+        return None
+
+    def get_page_keys(self, url: str) -> dict:
+        """Return the properties of the records of a page that the page lacks."""
+        return {}
+
+    def page_in_partition(self, url: str, context: Optional[dict]) -> bool:
+        """Whether a page, archived by an earlier run, belongs to a partition."""
+        return True
+
+    def is_past_last_page(self, response: BeautifulSoup) -> bool:
+        """Whether a page of open-ended URLs lies past the last page."""
+        return False
+
+    def get_page_urls(self, context: Optional[dict]) -> Optional[Iterable[str]]:
+        """Return the URLs of all the stream's pages, if known up front.
+
+        Streams returning URLs here have their pages fetched by up to
+        ``max_workers`` concurrent requests. With ``open_ended_pages`` the
+        URLs may run past the last page, the first one after which
+        :meth:`get_next_page_url` finds no page.
+        """
+        return None
+
+    def process_records(self, records: Iterable[dict]) -> Iterable[dict]:
+        """Transform the records extracted from a page, as a whole.
+
+        Lets streams compute properties in batches rather than record by record.
+        """
+        return records
+
+    def get_source_fingerprint(self, context: Optional[dict]) -> Optional[str]:
+        """Return a cheap fingerprint of the data the stream would extract.
+
+        When ``skip_unchanged`` is set, a stream whose fingerprint matches the
+        one stored in its state by the previous run is skipped entirely.
+        """
+        return None
+
+    def _out_of_time(self) -> bool:
+        """Whether pages should no longer be scheduled to end by ``max_runtime``.
+
+        Scheduling stops once less time is left than two average pages, one
+        to drain the pages in flight and one to spare.
+        """
+        time_left = getattr(self._tap, "time_left", None)
+        seconds = time_left() if time_left else None
+        return seconds is not None and seconds <= 2 * self._page_seconds
+
+    def _time_page(self, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        if self._page_seconds:
+            elapsed = 0.8 * self._page_seconds + 0.2 * elapsed
+        self._page_seconds = elapsed
+
+    @property
+    def page_memo(self) -> Optional[PageMemo]:
+        """Return the pages fetched so far in the run, shared by all streams."""
+        return getattr(self._tap, "page_memo", None)
+
+    def _fetch_page(
+        self, url: str, parse_only: Optional[SoupStrainer] = None
+    ) -> BeautifulSoup:
+        memo = self.page_memo
+        validators = None
+        if self.conditional_requests and self.config.get("skip_unchanged"):
+            validators = self.stream_state.setdefault("validators", {})
+        fetch = partial(self.transport.fetch, url, validators and validators.get(url))
+        if memo is None:
+            page = fetch()
+        else:
+            page = memo.fetch(url, fetch, validators and validators.get(url))
+        if validators is not None and page.validators:
+            validators[url] = page.validators
+
+        parse = partial(
+            BeautifulSoup, page.source, "html.parser", parse_only=parse_only
+        )
+        # Streamed documents are taken apart as their records are extracted
+        if memo is None or self.stream_records:
+            return parse()
+        return memo.document(url, page, id(parse_only), parse)
+
+    def backoff_wait_generator(self) -> Generator[float, None, None]:
+        """Return the waits between tries of a page, as the SDK's REST streams do."""
+        return backoff.expo(factor=2)
+
+    def backoff_max_tries(self) -> int:
+        """Return the number of times a page is tried, ``max_tries`` (5 by default)."""
+        return self.config.get("max_tries", 5)
+
+    def backoff_handler(self, details: dict) -> None:
+        """Log a failed try and drop its page from the page memo, to refetch it."""
+        url = details["args"][0]
+        memo = self.page_memo
+        if memo is not None:
+            memo.discard(url)
+        self.logger.warning(
+            f"Retrying {url} in {details['wait']:.1f}s after try {details['tries']}:"
+            f" {details.get('exception')}"
+        )
+
+    def request_decorator(self, func: Callable) -> Callable:
+        """Retry a page request, whose first argument is its URL, on retriable errors.
+
+        Throttled and failed responses, transport timeouts and pages failing
+        validation raise ``RetriableAPIError``.
+        """
+        return backoff.on_exception(
+            self.backoff_wait_generator,
+            RetriableAPIError,
+            max_tries=self.backoff_max_tries,
+            on_backoff=self.backoff_handler,
+        )(func)
+
+    def _request(self, url: str, context: Optional[dict]) -> BeautifulSoup:
+        response = self._fetch_page(url, self.page_strainer)
+        self.validate_response(response)
+        self.logger.debug("Response received successfully.")
+        return response
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Fetch the stream's pages, following pagination, and yield their records."""
+        delegated = self._delegated_records(context)
+        if delegated is not None:
+            yield from delegated
+            return
+
+        if self._out_of_time():
+            self.logger.info(f"Skipping {self.name} {context or ''}, out of time")
+            return
+
+        fingerprint, unchanged = self._source_fingerprint(context)
+        if unchanged:
+            self.logger.info(f"Skipping {self.name}, unchanged since last run")
+            return
+
+        state = self.get_context_state(context)
+        page_urls = self.get_page_urls(context)
+        if page_urls is not None:
+            yield from self._request_pages(iter(page_urls), context)
+            completed = "progress" not in state
+        else:
+            completed = yield from self._follow_pages(context)
+        if completed and fingerprint is not None:
+            state["fingerprint"] = fingerprint
+
+    def _delegated_records(self, context: Optional[dict]) -> Optional[Iterable[dict]]:
+        """Return the records of a partition not fetched by the stream itself.
+
+        Those are re-parsed from the page archive with ``archive_mode``
+        ``reparse`` or fetched by the workers of the tap's work queue.
+        """
+        if self.config.get("archive_mode") == "reparse" and self.reparsable:
+            return self._reparse_records(context)
+        queue = getattr(self._tap, "work_queue", None)
+        partition = self.get_queue_partition(context)
+        if queue is not None and queue.has_jobs(self.name, partition):
+            return queue.results(
+                self.name, partition, timeout=self.config.get("queue_timeout", 600)
+            )
+        return None
+
+    def _source_fingerprint(
+        self, context: Optional[dict]
+    ) -> Tuple[Optional[str], bool]:
+        """Return the partition's source fingerprint, with ``skip_unchanged``.
+
+        Returns the fingerprint and whether it is the one of the last run.
+        """
+        if not self.config.get("skip_unchanged"):
+            return None, False
+        fingerprint = self.get_source_fingerprint(context)
+        state = self.get_context_state(context)
+        return fingerprint, fingerprint is not None and fingerprint == state.get(
+            "fingerprint"
+        )
+
+    def _resume_url(self, state: dict, first: str) -> str:
+        """Return the page a paginated partition starting at ``first`` resumes at."""
+        resume = state.pop("resume", None) or {}
+        if resume.get("start") != first:
+            return first
+        self.logger.info(f"Resuming {self.name} at {resume['url']}")
+        return resume["url"]
+
+    def _follow_pages(self, context: Optional[dict]) -> Generator[dict, None, bool]:
+        """Fetch pages one by one, following pagination, and yield their records.
+
+        Returns whether the last page was reached.
+        """
+        state = self.get_context_state(context)
+        profiler = self.profiler
+        request = self.request_decorator(self._request)
+        first = self.get_url(context)
+        url: Optional[str] = self._resume_url(state, first)
+        try:
+            while url:
+                keys = self.get_page_keys(url)
+                if not self._needs_page(keys):
+                    yield keys
+                    break
+                if self._out_of_time():
+                    self.logger.info(f"Stopping {self.name} before {url}, out of time")
+                    state["resume"] = {"start": first, "url": url}
+                    return False
+                start = time.perf_counter()
+                with profiler.scope() if profiler else nullcontext():
+                    response = request(url, context)
+                self._time_page(start)
+                records = self.process_records(self.parse_response(response))
+                if profiler:
+                    records = profiler.profile_iter(records)
+                for record in records:
+                    yield {**keys, **record}
+                url = self.get_next_page_url(response)
+        except NotModified:
+            self.logger.info(f"Skipping {self.name}, {url} has not been modified")
+            return False
+        return True
+
+    def _fetch_records(
+        self, url: str, speculative: bool = False
+    ) -> Tuple[List[dict], bool]:
+        """Fetch and extract a page in a worker thread.
+
+        A ``speculative`` page, one of open-ended URLs past the first, may lie
+        past the last page; it then has no records and no page follows it.
+
+        Returns the page's records and whether a page follows it.
+        """
+        keys = self.get_page_keys(url)
+        if not self._needs_page(keys):
+            return [keys], False
+        start = time.perf_counter()
+        profiler = self.profiler
+        with profiler.scope() if profiler else nullcontext():
+            response = self._fetch_page(url, self.page_strainer)
+            if speculative and self.is_past_last_page(response):
+                return [], False
+            extractor = self.record_extractor
+            records = [
+                {**keys, **record}
+                for record in self.process_records(extractor.extract(response))
+            ]
+        self._time_page(start)
+        return records, self.get_next_page_url(response) is not None
+
+    def fetch_page_records(self, url: str) -> List[dict]:
+        """Fetch and extract a page, retrying on retriable errors.
+
+        Workers of a work queue complete their jobs with these records.
+        """
+        records, _ = self.request_decorator(self._fetch_records)(url)
+        return records
+
+    def _request_pages(
+        self, urls: Iterator[str], context: Optional[dict]
+    ) -> Iterable[dict]:
+        """Fetch pages concurrently and yield their records in page order.
+
+        Up to ``max_workers`` pages are fetched at once and at most
+        ``max_buffered_pages`` are held ahead of the first unfinished page.
+        Pages are emitted in order, so the stream state keeps the number of
+        pages emitted and a digest of their URLs under ``progress``; an
+        interrupted run resumes after them if the pages are listed in the
+        same order, and starts over otherwise. Runs running out of
+        ``max_runtime`` stop scheduling pages, emit the pages in flight and
+        keep their ``progress`` for the next run.
+        """
+        state = self.get_context_state(context)
+        urls, skipped, digest = self._resume_pages(urls, state.get("progress") or {})
+        state["progress"] = {"pages": skipped, "digest": digest.hexdigest()}
+        # URLs of the pages scheduled, by position
+        scheduled: List[str] = []
+
+        workers = self._page_workers()
+        emitter = OrderedEmitter(self.config.get("max_buffered_pages") or workers * 4)
+        futures: Dict[Future, int] = {}
+        exhausted = stopped = False
+        fetch_records = self.request_decorator(self._fetch_records)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+
+            def schedule(url: str) -> None:
+                speculative = self.open_ended_pages and len(scheduled) > 0
+                futures[pool.submit(fetch_records, url, speculative)] = len(scheduled)
+                scheduled.append(url)
+                emitter.request()
+
+            try:
+                while not emitter.done:
+                    if not exhausted:
+                        exhausted, stopped = self._schedule_pages(
+                            schedule, urls, emitter
+                        )
+                        if stopped:
+                            self.logger.info(
+                                f"Stopping {self.name} after {len(scheduled)} pages,"
+                                " out of time"
+                            )
+                    if not futures:
+                        break
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    self._complete_pages(finished, futures, emitter)
+                    self._report_depths(len(futures), emitter.buffered)
+                    released = emitter.watermark
+                    yield from emitter.drain()
+                    for url in islice(scheduled, released, emitter.watermark):
+                        digest.update(url.encode() + b"\n")
+                    state["progress"] = {
+                        "pages": skipped + emitter.watermark,
+                        "digest": digest.hexdigest(),
+                    }
+            finally:
+                for future in futures:
+                    future.cancel()
+                self._report_depths(0, 0)
+        if emitter.done or not stopped:
+            state.pop("progress", None)
+
+    def _resume_pages(
+        self, urls: Iterator[str], progress: dict
+    ) -> Tuple[Iterator[str], int, Any]:
+        """Skip the pages emitted by an interrupted run, if listed in the same order.
+
+        Returns the pages left, the number of pages skipped and the digest of
+        their URLs.
+        """
+        digest = hashlib.sha1()
+        pages = progress.get("pages", 0)
+        if not pages:
+            return urls, 0, digest
+        emitted = list(islice(urls, pages))
+        for url in emitted:
+            digest.update(url.encode() + b"\n")
+        if digest.hexdigest() == progress.get("digest"):
+            self.logger.info(f"Resuming {self.name} after {pages} pages")
+            return urls, pages, digest
+        self.logger.info(f"Restarting {self.name}, its pages are listed differently")
+        return chain(emitted, urls), 0, hashlib.sha1()
+
+    def _page_workers(self) -> int:
+        """Return the number of pages fetched at once, ``max_workers``."""
+        if isinstance(self.transport, SeleniumTransport) or isinstance(
+            getattr(self.transport, "inner", None), SeleniumTransport
+        ):
+            # A WebDriver session loads one page at a time
+            return 1
+        return max(self.config.get("max_workers") or 1, 1)
+
+    def _schedule_pages(
+        self,
+        schedule: Callable[[str], None],
+        urls: Iterator[str],
+        emitter: OrderedEmitter,
+    ) -> Tuple[bool, bool]:
+        """Schedule pages until ``emitter`` is full or knows the last page.
+
+        Returns whether no pages are left to schedule and whether that is
+        because the run is out of time.
+        """
+        while not (emitter.full or emitter.last is not None):
+            if self._out_of_time():
+                return True, True
+            url = next(urls, None)
+            if url is None:
+                return True, False
+            schedule(url)
+        return False, False
+
+    def _complete_pages(
+        self,
+        finished: Iterable[Future],
+        futures: Dict[Future, int],
+        emitter: OrderedEmitter,
+    ) -> None:
+        """Hand the records, or errors, of finished page fetches to ``emitter``."""
+        for future in finished:
+            position = futures.pop(future)
+            try:
+                records, has_next = future.result()
+            except Exception as ex:
+                emitter.complete(position, ex)
+                continue
+            emitter.complete(position, records)
+            if self.open_ended_pages and not has_next:
+                emitter.end(position)
+
+    def _report_depths(self, fetching: int, parsed: int) -> None:
+        """Report the depths of the fetch and parse stages to the output pipeline."""
+        pipeline = getattr(self._tap, "pipeline", None)
+        if pipeline is not None:
+            pipeline.set_depth(f"{self.name}.fetching", fetching)
+            pipeline.set_depth(f"{self.name}.parsed", parsed)
+
+    def _reparse_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Re-parse the archived pages of a partition in parallel, without fetching.
+
+        Pages can be narrowed down with the ``player_id`` and ``change_id``
+        settings and are parsed by ``reparse_workers`` processes.
+        """
+        archive = PageArchive(self.config["archive_path"])
+        workers = self.config.get("reparse_workers") or os.cpu_count() or 1
+        extract = partial(
+            _extract_archived_page, (type(self).__module__, type(self).__qualname__)
+        )
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in archive.pages(
+                self.name,
+                player_id=(context or {}).get(
+                    "player_id", self.config.get("player_id")
+                ),
+                change_id=self.config.get("change_id"),
+                batch_size=workers * 16,
+            ):
+                batch = [
+                    page for page in batch if self.page_in_partition(page.url, context)
+                ]
+                results = pool.map(extract, [page.body for page in batch], chunksize=16)
+                for page, (records, error) in zip(batch, results):
+                    if error:
+                        self.logger.warning(
+                            f"Skipping archived page {page.url}: {error}"
+                        )
+                        continue
+                    keys = self.get_page_keys(page.url)
+                    for record in self.process_records(records):
+                        yield {**keys, **record}
+        archive.close()
+
+    def get_records(self, context: Optional[dict]) -> Iterable[Dict[str, Any]]:
+        """Return a generator of post-processed records.
+
+        Records of player streams are also upserted into the tap's
+        ``player_store``, if set.
+        """
+        store = getattr(self._tap, "player_store", None)
+        if store is not None and not store.stores(self.name):
+            store = None
+        league_id = self.get_league_id(context)
+        try:
+            for record in self.request_records(context):
+                transformed_record = self.post_process(record, context)
+                if transformed_record is not None:
+                    if store is not None:
+                        store.add(self.name, transformed_record, league_id)
+                    yield transformed_record
+        finally:
+            if store is not None:
+                store.flush()
+
+    def validate_response(self, response: BeautifulSoup) -> None:
+        """Validate the page against the stream's spec, keeping its records."""
+        if not self.stream_records:
+            self._extracted = (response, self.record_extractor.extract(response))
+            return
+        records = self.record_extractor.iter_extract(response, release=True)
+        # Extracting the first record validates the layout of the page
+        first = next(records, None)
+        if first is not None:
+            records = chain([first], records)
+        self._extracted = (response, records)
+
+    def parse_response(self, response: BeautifulSoup) -> Iterable[dict]:
+        """Yield the records extracted while the page was validated."""
+        if self._extracted is None or self._extracted[0] is not response:
+            self.validate_response(response)
+        _, records = self._extracted
+        self._extracted = None
+        yield from records
@@ -0,0 +1,211 @@
+"""Multi-process extraction through a shared work queue.
+
+Static shards leave workers idle while others are stuck on slow pages, so the
+pages of a run are queued as jobs in a :class:`WorkQueue` instead and any
+number of worker processes claim them until the queue is empty::
+
+    tap-sofifa-queue enqueue --config config.json --queue jobs.db \\
+        --league-ids 13 16 --change-ids 230020 230019
+    tap-sofifa-queue work --config config.json --queue jobs.db --processes 8
+
+The jobs are the ``player_changes`` pages of every league and change (the
+leagues can be discovered with ``discover_leagues``), found by probing the
+extent of their tables, and the ``player_detail`` pages of the configured or
+indexed players. Running the tap with ``work_queue`` set to the
+queue merges the records of the queued streams into a single Singer output,
+in job order, as the workers complete them.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from itertools import product
+from typing import Dict, Iterable, List, Optional
+
+from tap_sofifa.plan import Probe, count_list_pages
+from tap_sofifa.tap import TapSoFIFA
+from tap_sofifa.workqueue import LEASED, PENDING, Job, WorkQueue, worker_name
+
+logger = logging.getLogger(__name__)
+
+# Streams whose pages can be queued
+QUEUED_STREAMS = ("player_changes", "player_detail")
+
+
+def enqueue(
+    config: dict,
+    queue: WorkQueue,
+    streams: Iterable[str] = QUEUED_STREAMS,
+    league_ids: Optional[List[int]] = None,
+    change_ids: Optional[List[int]] = None,
+) -> Dict[str, int]:
+    """Queue the pages of some streams for every league and change.
+
+    Jobs are weighted by the ``priority`` of their league or player. Without
+    ``league_ids``, the leagues are those of the ``league_ids`` setting or,
+    with ``discover_leagues``, of the ``leagues`` stream.
+
+    Returns the number of jobs added per stream.
+    """
+    if not league_ids and "league_id" not in config:
+        tap = TapSoFIFA(config={**config, "_stream": "player_changes"})
+        partitions = tap.streams["player_changes"].partitions or []
+        league_ids = [partition["league_id"] for partition in partitions]
+    added: Dict[str, int] = {}
+    for stream_name in streams:
+        if stream_name not in QUEUED_STREAMS:
+            raise ValueError(f"Pages of {stream_name} cannot be queued")
+        added[stream_name] = 0
+        for league_id, change_id in product(
+            league_ids or [config.get("league_id")],
+            change_ids or [config.get("change_id")],
+        ):
+            run_config = {**config, "_stream": stream_name}
+            for key, value in (("league_id", league_id), ("change_id", change_id)):
+                if value is not None:
+                    run_config[key] = value
+            tap = TapSoFIFA(config=run_config)
+            stream = tap.streams[stream_name]
+            partition = stream.get_queue_partition(None)
+            for priority, urls in _jobs(tap, stream_name, league_id).items():
+                added[stream_name] += queue.add(stream_name, urls, priority, partition)
+    return added
+
+
+def _jobs(
+    tap: TapSoFIFA, stream_name: str, league_id: Optional[int]
+) -> Dict[float, List[str]]:
+    """Return the page URLs of a partition to queue, by priority."""
+    stream = tap.streams[stream_name]
+    jobs: Dict[float, List[str]] = {}
+    if stream_name == "player_changes":
+        url = stream.get_url(None)
+        pages = count_list_pages(stream, None, Probe())
+        jobs[tap.priorities.league_weight(league_id)] = [
+            f"{url}&offset={page * stream.page_size}" for page in range(pages)
+        ]
+        return jobs
+    player_ids = stream.get_player_ids()
+    if player_ids is None:
+        jobs[1] = [stream.get_url(None)]
+    for player_id in player_ids or []:
+        weight = tap.priorities.player_weight(player_id)
+        jobs.setdefault(weight, []).append(stream.get_player_url(player_id, None))
+    return jobs
+
+
+def run_worker(config: dict, queue: WorkQueue, poll: float = 1) -> int:
+    """Claim and complete jobs until none is pending or leased.
+
+    Workers leave the player index and store to the tap merging their
+    records, the only process writing them.
+
+    Returns the number of jobs completed.
+    """
+    worker_config = {
+        key: value
+        for key, value in config.items()
+        if key not in ("player_index_path", "player_store_path")
+    }
+    # One tap per queued stream, so only the streams working on jobs are built
+    streams = {
+        stream_name: TapSoFIFA(
+            config={**worker_config, "_stream": stream_name}
+        ).streams[stream_name]
+        for stream_name in QUEUED_STREAMS
+    }
+    worker = worker_name()
+    current: Dict[str, Job] = {}
+    stopped = threading.Event()
+
+    def send_heartbeats() -> None:
+        while not stopped.wait(queue.lease_seconds / 3):
+            job = current.get("job")
+            if job is not None and not queue.heartbeat(job, worker):
+                logger.warning(f"Lost the lease of the job for {job.url}")
+
+    heartbeats = threading.Thread(target=send_heartbeats, daemon=True)
+    heartbeats.start()
+    completed = 0
+    try:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                counts = queue.counts()
+                if not (counts.get(PENDING) or counts.get(LEASED)):
+                    return completed
+                # Leases held by other workers may still expire
+                time.sleep(poll)
+                continue
+            current["job"] = job
+            try:
+                records = streams[job.stream].fetch_page_records(job.url)
+            except Exception as ex:
+                logger.warning(f"Failed to fetch {job.url}: {ex}")
+                queue.fail(job, worker, f"{type(ex).__name__}: {ex}")
+            else:
+                completed += queue.complete(job, worker, records)
+            finally:
+                current.pop("job", None)
+    finally:
+        stopped.set()
+        for stream in streams.values():
+            stream.close_transport()
+
+
+def _work(config: dict, path: str, lease_seconds: float) -> None:
+    queue = WorkQueue(path, lease_seconds)
+    try:
+        completed = run_worker(config, queue)
+        logger.info(f"Worker {worker_name()} completed {completed} jobs")
+    finally:
+        queue.close()
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Queue the pages of a run, or work on them."""
+    parser = argparse.ArgumentParser(
+        prog="tap-sofifa-queue", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("command", choices=["enqueue", "work", "status"])
+    parser.add_argument("--config", help="Settings of the tap (JSON file)")
+    parser.add_argument("--queue", help="Path of the queue, work_queue by default")
+    parser.add_argument("--streams", nargs="+", default=list(QUEUED_STREAMS))
+    parser.add_argument("--league-ids", nargs="+", type=int)
+    parser.add_argument("--change-ids", nargs="+", type=int)
+    parser.add_argument("--processes", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    config: dict = {}
+    if args.config:
+        with open(args.config) as config_file:
+            config = json.load(config_file)
+    path = args.queue or config.get("work_queue")
+    if not path:
+        parser.error("--queue or the work_queue setting is required")
+    lease_seconds = config.get("lease_seconds", 60)
+
+    if args.command == "work":
+        workers = [
+            multiprocessing.Process(target=_work, args=(config, path, lease_seconds))
+            for _ in range(args.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return
+
+    queue = WorkQueue(path, lease_seconds)
+    try:
+        if args.command == "enqueue":
+            added = enqueue(
+                config, queue, args.streams, args.league_ids, args.change_ids
+            )
+            print(json.dumps({"added": added}))
+        print(json.dumps(queue.counts()))
+    finally:
+        queue.close()
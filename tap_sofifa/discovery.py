@@ -0,0 +1,43 @@
+"""Local cache of the records of the discovery streams.
+
+Leagues and teams only change with a new SoFIFA change, so the records of the
+``teams`` and ``leagues`` streams are kept per change ID in ``<cache
+dir>/<stream>-<change ID>.json``. Later runs, and the partitioning of the
+player tables by league, read them from there without loading any page.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Union
+
+
+class DiscoveryCache:
+    """Records of a stream per change ID, stored as JSON files.
+
+    Args:
+        path: Directory of the cache files.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, stream: str, change_id: int) -> Path:
+        return self.path / f"{stream}-{change_id}.json"
+
+    def get(self, stream: str, change_id: int) -> Optional[List[dict]]:
+        """Return the records cached for a change, if any."""
+        try:
+            with open(self._file(stream, change_id)) as cached:
+                return json.load(cached)
+        except FileNotFoundError:
+            return None
+
+    def put(self, stream: str, change_id: int, records: List[dict]) -> None:
+        """Cache the records of a change, replacing the file atomically."""
+        descriptor, temporary = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as cached:
+            json.dump(records, cached)
+        os.replace(temporary, self._file(stream, change_id))
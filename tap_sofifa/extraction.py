@@ -0,0 +1,512 @@
+"""Declarative extraction specs for SoFIFA pages.
+
+A :class:`Spec` describes where the records of a page live (selectors), how many
+nodes each selector must match (cardinalities) and how every property is read
+and coerced. Specs are compiled once into an :class:`Extractor`, which
+validates and extracts a page in a single pass: every node is located once and
+a failed expectation raises the ``RetriableAPIError`` declared next to the
+selector it belongs to.
+
+Specs marked ``indexed`` locate the nodes their top-level selectors need in a
+:class:`PageIndex`, built by one traversal of the page, instead of scanning the
+whole tree once per selector.
+
+:meth:`Extractor.select` narrows an extractor down to some of its properties,
+so the nodes of the others are neither located nor coerced.
+"""
+
+import re
+from collections import defaultdict
+from decimal import Decimal
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from bs4 import BeautifulSoup, Tag
+from singer_sdk.exceptions import RetriableAPIError
+
+Coercer = Callable[[str], Any]
+Hop = Callable[[Any], Any]
+
+
+class Select:
+    """A selector hop from a node to its matching descendants.
+
+    Args:
+        name: Tag name to match, or ``None`` for any tag.
+        class_: CSS class to match.
+        index: Pick a single match by position instead of keeping the list.
+        at_least: Minimum number of matches.
+        at_most: Maximum number of matches.
+        skip: Number of leading matches to drop from the list.
+        limit: Maximum number of matches to keep in the list.
+        recursive: Search all descendants rather than direct children only.
+        error: Message of the ``RetriableAPIError`` raised when the cardinality
+            or ``index`` is not satisfied.
+    """
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        class_: Optional[str] = None,
+        index: Optional[int] = None,
+        at_least: int = 0,
+        at_most: Optional[int] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        recursive: bool = True,
+        error: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.class_ = class_
+        self.index = index
+        self.at_least = max(at_least, 0 if index is None else index + 1)
+        self.at_most = at_most
+        self.skip = skip
+        self.limit = limit
+        self.recursive = recursive
+        self.error = (
+            error or f"Cannot find {name or class_ or 'element'} in page source"
+        )
+
+    def _compile_pick(self) -> Callable[[List[Tag]], Union[Tag, List[Tag]]]:
+        index, error = self.index, self.error
+        at_least, at_most = self.at_least, self.at_most
+        start = self.skip
+        stop = None if self.limit is None else start + self.limit
+
+        def pick(matches: List[Tag]) -> Union[Tag, List[Tag]]:
+            count = len(matches)
+            if count < at_least or (at_most is not None and count > at_most):
+                raise RetriableAPIError(error)
+            if index is not None:
+                return matches[index]
+            return matches[start:stop] if start or stop is not None else matches
+
+        return pick
+
+    def compile(self) -> Hop:
+        """Return a function applying this hop to a node."""
+        kwargs: Dict[str, Any] = {"recursive": self.recursive}
+        if self.class_ is not None:
+            kwargs["class_"] = self.class_
+        name, error = self.name, self.error
+
+        if self.index == 0 and self.at_least <= 1 and self.at_most is None:
+            # find() stops at the first match, which is all this hop needs
+            def first(node: Tag) -> Tag:
+                found = node.find(name, **kwargs)
+                if found is None:
+                    raise RetriableAPIError(error)
+                return found
+
+            return first
+
+        pick = self._compile_pick()
+        return lambda node: pick(node.find_all(name, **kwargs))
+
+    def compile_indexed(self) -> Hop:
+        """Return a function applying this hop to the index of a page."""
+        name, class_ = self.name, self.class_
+        pick = self._compile_pick()
+        return lambda index: pick(index.lookup(name, class_))
+
+
+class Cell:
+    """A hop picking one cell of a row split by :attr:`Spec.cells`."""
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+    def compile(self) -> Hop:
+        """Return a function picking the cell from a list of cells."""
+        index = self.index
+        return lambda cells: cells[index]
+
+
+class Column:
+    """A hop picking the cell of a row whose attribute names a column.
+
+    Args:
+        name: Value of the attribute identifying the column.
+        attr: Attribute identifying the column of a cell.
+        error: Message of the ``RetriableAPIError`` raised when no cell has it.
+    """
+
+    def __init__(
+        self, name: str, attr: str = "data-col", error: Optional[str] = None
+    ) -> None:
+        self.name = name
+        self.attr = attr
+        self.error = error or f"Cannot find column {name} in page source"
+
+    def compile(self) -> Hop:
+        """Return a function picking the cell from a list of cells."""
+        name, attr, error = self.name, self.attr, self.error
+
+        def pick(cells: List[Tag]) -> Tag:
+            for cell in cells:
+                if cell.get(attr) == name:
+                    return cell
+            raise RetriableAPIError(error)
+
+        return pick
+
+
+Step = Union[Select, Cell, Column]
+
+
+class PageIndex:
+    """Tags of a page by name and by class, collected in one traversal."""
+
+    def __init__(self, document: BeautifulSoup) -> None:
+        self.document = document
+        self.by_name: Dict[str, List[Tag]] = defaultdict(list)
+        self.by_class: Dict[str, List[Tag]] = defaultdict(list)
+        self.tags: List[Tag] = []
+        for tag in document.find_all(True):
+            self.tags.append(tag)
+            self.by_name[tag.name].append(tag)
+            for class_ in tag.get("class") or ():
+                self.by_class[class_].append(tag)
+
+    def lookup(self, name: Optional[str], class_: Optional[str]) -> List[Tag]:
+        """Return the tags with a name and class, in document order."""
+        if class_ is not None:
+            tags = self.by_class.get(class_, [])
+            return tags if name is None else [tag for tag in tags if tag.name == name]
+        return self.tags if name is None else self.by_name.get(name, [])
+
+
+def _compile_path(path: Sequence[Step], indexed: bool = False) -> Hop:
+    """Compile hops; ``indexed`` paths start from a :class:`PageIndex`."""
+    if indexed and not path:
+        return lambda index: index.document
+    hops = [step.compile() for step in path]
+    if indexed:
+        hops[0] = path[0].compile_indexed()  # type: ignore
+    if not hops:
+        return lambda node: node
+    if len(hops) == 1:
+        return hops[0]
+
+    def resolve(node: Any) -> Any:
+        for hop in hops:
+            node = hop(node)
+        return node
+
+    return resolve
+
+
+class Field:
+    """A property read from a node reached through a selector path.
+
+    Args:
+        path: Hops leading from the record node to the value node.
+        attr: Attribute to read; the node text is read when omitted.
+        coerce: Conversion applied to the raw string.
+        many: The path ends in a list of nodes and the value is a list.
+    """
+
+    def __init__(
+        self,
+        *path: Step,
+        attr: Optional[str] = None,
+        coerce: Optional[Coercer] = None,
+        many: bool = False,
+    ) -> None:
+        self.path = path
+        self.attr = attr
+        self.coerce = coerce
+        self.many = many
+
+    def compile(self, indexed: bool = False) -> Hop:
+        """Return a function reading this property from a record node."""
+        resolve = _compile_path(self.path, indexed)
+        attr, coerce = self.attr, self.coerce
+
+        def read(node: Tag) -> Any:
+            raw = node[attr] if attr else node.get_text()
+            return coerce(raw) if coerce else raw
+
+        if self.many:
+            return lambda node: [read(item) for item in resolve(node)]
+        return lambda node: read(resolve(node))
+
+
+class Group:
+    """A nested object whose properties are read from a common node."""
+
+    def __init__(self, *path: Step, fields: Mapping[str, "Property"]) -> None:
+        self.path = path
+        self.fields = fields
+
+    def compile(self, indexed: bool = False) -> Hop:
+        """Return a function building the nested object from a record node."""
+        resolve = _compile_path(self.path, indexed)
+        build = _compile_fields(self.fields)
+        return lambda node: build(resolve(node))
+
+
+class Entries:
+    """An object whose keys are read from the page along with its values.
+
+    Args:
+        path: Hops leading to the list of entry nodes.
+        key: Property giving the key of an entry.
+        value: Property giving the value of an entry.
+        merge: Merge the entries into the enclosing object instead of nesting
+            them under the property name.
+    """
+
+    def __init__(
+        self,
+        *path: Step,
+        key: "Property",
+        value: "Property",
+        merge: bool = False,
+    ) -> None:
+        self.path = path
+        self.key = key
+        self.value = value
+        self.merge = merge
+
+    def compile(
+        self, indexed: bool = False, keys: Optional[AbstractSet[str]] = None
+    ) -> Hop:
+        """Return a function building the object from a record node.
+
+        Args:
+            indexed: Resolve the first hop from a :class:`PageIndex`.
+            keys: Only read the values of these keys.
+        """
+        resolve = _compile_path(self.path, indexed)
+        key, value = self.key.compile(), self.value.compile()
+        if keys is None:
+            return lambda node: {key(entry): value(entry) for entry in resolve(node)}
+
+        def build(node: Any) -> dict:
+            entries = ((key(entry), entry) for entry in resolve(node))
+            return {name: value(entry) for name, entry in entries if name in keys}
+
+        return build
+
+
+Property = Union[Field, Group, Entries]
+
+
+class Check:
+    """An expectation on a record node, checked before its properties are read."""
+
+    def __init__(self, predicate: Callable[[Any], bool], error: str) -> None:
+        self.predicate = predicate
+        self.error = error
+
+    def __call__(self, node: Any) -> None:
+        """Raise ``RetriableAPIError`` unless the node meets the expectation."""
+        try:
+            satisfied = self.predicate(node)
+        except Exception:
+            satisfied = False
+        if not satisfied:
+            raise RetriableAPIError(self.error)
+
+
+def _compile_fields(
+    fields: Mapping[str, Property],
+    indexed: bool = False,
+    selected: Optional[AbstractSet[str]] = None,
+) -> Callable[[Any], dict]:
+    readers = []
+    for name, prop in fields.items():
+        merge = isinstance(prop, Entries) and prop.merge
+        if selected is None:
+            readers.append((name, prop.compile(indexed), merge))
+        elif merge:
+            # The keys of merged entries are the names of the properties
+            readers.append((name, prop.compile(indexed, selected), merge))
+        elif name in selected:
+            readers.append((name, prop.compile(indexed), merge))
+
+    def build(node: Any) -> dict:
+        record: Dict[str, Any] = {}
+        for name, read, merge in readers:
+            if merge:
+                record.update(read(node))
+            else:
+                record[name] = read(node)
+        return record
+
+    return build
+
+
+class Spec:
+    """Declarative description of the records contained in a page.
+
+    Args:
+        rows: Hops leading from the document to the record nodes. A page holding
+            a single record leaves it empty.
+        cells: Optional hop splitting each record node into cells, addressed by
+            the fields with :class:`Cell`.
+        fields: Properties of each record.
+        checks: Expectations on the first record, the sample used to detect
+            layout changes.
+        indexed: Resolve the top-level selectors, those of ``rows`` or of the
+            fields of a single-record page, from a :class:`PageIndex`. Pays
+            off when several of them would each scan a large page.
+    """
+
+    def __init__(
+        self,
+        *rows: Select,
+        cells: Optional[Select] = None,
+        fields: Mapping[str, Property],
+        checks: Sequence[Check] = (),
+        indexed: bool = False,
+    ) -> None:
+        self.rows = rows
+        self.cells = cells
+        self.fields = fields
+        self.checks = checks
+        self.indexed = indexed
+
+    def compile(self) -> "Extractor":
+        """Compile the spec into an extractor."""
+        return Extractor(self)
+
+
+class Extractor:
+    """Single-pass validator and extractor compiled from a :class:`Spec`."""
+
+    def __init__(self, spec: Spec, selected: Optional[AbstractSet[str]] = None) -> None:
+        self.spec = spec
+        self.selected = selected
+        self._rows = _compile_path(spec.rows, spec.indexed and bool(spec.rows))
+        self._cells = spec.cells.compile() if spec.cells else None
+        self._checks = tuple(spec.checks)
+        self._build = _compile_fields(
+            spec.fields, spec.indexed and not spec.rows, selected
+        )
+        # Single-record pages are released along with the document
+        self._release_rows = bool(spec.rows)
+        self._selections: Dict[AbstractSet[str], "Extractor"] = {}
+
+    def select(self, properties: Optional[AbstractSet[str]]) -> "Extractor":
+        """Return an extractor reading only some properties of the records.
+
+        Layout checks and the selectors leading to the records still apply.
+        ``None`` selects every property.
+        """
+        if properties is None:
+            return self
+        properties = frozenset(properties)
+        if properties not in self._selections:
+            self._selections[properties] = Extractor(self.spec, properties)
+        return self._selections[properties]
+
+    def extract(self, document: BeautifulSoup) -> List[dict]:
+        """Validate the page and return its records.
+
+        Raises:
+            RetriableAPIError: If the page does not match the spec.
+        """
+        return list(self.iter_extract(document))
+
+    def iter_extract(
+        self, document: BeautifulSoup, release: bool = False
+    ) -> Iterator[dict]:
+        """Validate the page and yield its records one at a time.
+
+        The page is validated up to the first record when the first record is
+        requested; the following records are extracted as they are requested.
+
+        Args:
+            document: The parsed page.
+            release: Decompose each record node once its record is built, so
+                the parse tree of a page shrinks as it is consumed. The tree
+                is still built whole before the first record.
+
+        Raises:
+            RetriableAPIError: If the page does not match the spec.
+        """
+        nodes = self._rows(PageIndex(document) if self.spec.indexed else document)
+        if not isinstance(nodes, list):
+            nodes = [nodes]
+        for position, node in enumerate(nodes):
+            row = self._cells(node) if self._cells else node
+            if position == 0:
+                for check in self._checks:
+                    check(row)
+            record = self._build(row)
+            if release and self._release_rows:
+                nodes[position] = None
+                node.decompose()
+            yield record
+
+
+def child_tags(node: Tag) -> List[str]:
+    """Return the names of the direct child tags of a node."""
+    return [child.name for child in node if child.name is not None]
+
+
+def segment(position: int, coerce: Coercer = str) -> Coercer:
+    """Return a coercer reading one ``/``-separated segment of a path."""
+    return lambda value: coerce(value.split("/")[position])
+
+
+def search(pattern: str, coerce: Coercer = str) -> Coercer:
+    """Return a coercer reading the first group matched by a regular expression."""
+    compiled = re.compile(pattern)
+    return lambda value: coerce(compiled.search(value).group(1))  # type: ignore
+
+
+# One match per line: a currency symbol, an amount and a K, M or B suffix, or
+# anything else
+MONEY = re.compile(
+    r"^(?:(?P<symbol>[^\d\n]*?)\s*(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>[KMB]?)\s*"
+    r"|[^\n]*)$",
+    re.MULTILINE,
+)
+MONEY_UNITS = {"": 1, "K": 10**3, "M": 10**6, "B": 10**9}
+CURRENCIES = {
+    "€": "EUR",
+    "£": "GBP",
+    "$": "USD",
+}
+
+
+def parse_money(texts: Sequence[str]) -> List[Tuple[Optional[str], Optional[int]]]:
+    """Parse a column of amounts like ``€110.5M`` into currencies and whole amounts.
+
+    The column is parsed in one regex pass over its joined lines instead of
+    value by value. Amounts are scaled as decimals, so ``€4.1M`` is exactly
+    4100000. Unparseable values give ``(None, None)``.
+    """
+    if not texts:
+        return []
+    joined = "\n".join(text.replace("\n", " ") for text in texts)
+    parsed = []
+    for match in MONEY.finditer(joined):
+        amount = match.group("amount")
+        if amount is None:
+            parsed.append((None, None))
+            continue
+        currency = CURRENCIES.get(match.group("symbol").strip())
+        scaled = Decimal(amount) * MONEY_UNITS[match.group("unit")]
+        parsed.append((currency, int(scaled.to_integral_value())))
+    return parsed
+
+
+def snake_case(value: str) -> str:
+    """Lower-case a label and join its words with underscores."""
+    return value.lower().replace(" ", "_")
@@ -0,0 +1,240 @@
+"""Memory-mapped index of the players seen in ``player_changes``.
+
+The index answers "which players belong to league X in change r?" and "what
+were this player's last ratings?" without scraping SoFIFA again or loading
+the index into memory. It is made of three files:
+
+- ``<path>``: append-only fixed-size entries, each linking to the previous
+  entry of the same player and of the same league and change.
+- ``<path>.players``: hash table from a player ID to its latest entry.
+- ``<path>.leagues``: hash table from a league and change ID to the latest
+  entry of that change in that league.
+
+All three are memory-mapped, so a lookup reads a hash slot and then follows
+the links of the entries it needs only. The entries of a player are linked from
+the latest change down, whatever order the changes are indexed in.
+
+An index has a single writer: the first process adding an entry locks the
+entries file until it closes the index, and other processes adding entries
+meanwhile fail. Any number of processes can read it.
+"""
+
+import errno
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Union
+
+# player_id, change_id, team_id, league_id, overall, potential, age, padding,
+# previous entry of the player, previous entry of the league and change
+ENTRY = struct.Struct("<IIIIBBBxII")
+# Link of an entry to the previous entry of the player, rewritten when an
+# older change is indexed after a newer one
+PLAYER_LINK = struct.Struct("<I")
+PLAYER_LINK_OFFSET = ENTRY.size - 2 * PLAYER_LINK.size
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+
+class IndexEntry(NamedTuple):
+    """Summary of a player in a change."""
+
+    player_id: int
+    change_id: int
+    team_id: int
+    league_id: int
+    overall_rating: int
+    potential_rating: int
+    age: int
+
+    @classmethod
+    def from_record(cls, record: dict, league_id: Optional[int] = None) -> "IndexEntry":
+        """Summarise a ``player_changes`` record; 0 stands for an unknown league."""
+        return cls(
+            record["id"],
+            record["change_id"],
+            (record.get("team") or {}).get("id") or 0,
+            league_id or 0,
+            record["overall_rating"],
+            record["potential_rating"],
+            record["age"],
+        )
+
+
+class _HashTable:
+    """Memory-mapped open-addressing table from a pair of integers to an entry.
+
+    Entries are numbered from 1, 0 marking an empty slot.
+    """
+
+    HEADER = struct.Struct("<II")
+    SLOT = struct.Struct("<III")
+
+    def __init__(self, path: Path, capacity: int = 1024) -> None:
+        self.path = path
+        if not path.exists():
+            self._create(path, capacity)
+        self._open()
+
+    @classmethod
+    def _create(cls, path: Path, capacity: int) -> None:
+        with open(path, "wb") as table:
+            table.write(cls.HEADER.pack(capacity, 0))
+            table.truncate(cls.HEADER.size + capacity * cls.SLOT.size)
+
+    def _open(self) -> None:
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.capacity, self.count = self.HEADER.unpack_from(self._map, 0)
+
+    def _find(self, first: int, second: int):
+        position = (first * 2654435761 ^ second * 2246822519) % self.capacity
+        while True:
+            offset = self.HEADER.size + position * self.SLOT.size
+            key_first, key_second, value = self.SLOT.unpack_from(self._map, offset)
+            if value == 0 or (key_first, key_second) == (first, second):
+                return offset, value
+            position = (position + 1) % self.capacity
+
+    def get(self, first: int, second: int) -> int:
+        """Return the entry stored for a key, or 0."""
+        return self._find(first, second)[1]
+
+    def put(self, first: int, second: int, value: int) -> None:
+        """Store the entry of a key."""
+        offset, previous = self._find(first, second)
+        self.SLOT.pack_into(self._map, offset, first, second, value)
+        if previous == 0:
+            self.count += 1
+            self.HEADER.pack_into(self._map, 0, self.capacity, self.count)
+            if self.count * 2 > self.capacity:
+                self._grow()
+
+    def _grow(self) -> None:
+        resized = self.path.with_name(self.path.name + ".resize")
+        if resized.exists():
+            resized.unlink()
+        table = _HashTable(resized, self.capacity * 2)
+        for position in range(self.capacity):
+            offset = self.HEADER.size + position * self.SLOT.size
+            first, second, value = self.SLOT.unpack_from(self._map, offset)
+            if value:
+                table.put(first, second, value)
+        table.close()
+        self.close()
+        os.replace(resized, self.path)
+        self._open()
+
+    def close(self) -> None:
+        """Unmap and close the table."""
+        self._map.close()
+        self._file.close()
+
+
+class PlayerIndex:
+    """Append-only index of player summaries per change.
+
+    Args:
+        path: Path of the entries file; the hash tables are stored next to it.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._entries = open(self.path, "a+b")
+        # Appending handles ignore seeks, so links are rewritten through another
+        self._links = open(self.path, "r+b")
+        self._locked = False
+        self._players = _HashTable(self.path.with_name(self.path.name + ".players"))
+        self._leagues = _HashTable(self.path.with_name(self.path.name + ".leagues"))
+        self._map: Optional[mmap.mmap] = None
+
+    def __len__(self) -> int:
+        return os.fstat(self._entries.fileno()).st_size // ENTRY.size
+
+    def _read(self, number: int):
+        end = number * ENTRY.size
+        if self._map is None or len(self._map) < end:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._entries.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = ENTRY.unpack_from(self._map, end - ENTRY.size)
+        return IndexEntry(*fields[:7]), fields[7], fields[8]
+
+    def _lock_writer(self) -> None:
+        if self._locked or fcntl is None:
+            return
+        try:
+            fcntl.flock(self._entries.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as ex:
+            if ex.errno in (errno.EAGAIN, errno.EACCES):
+                raise RuntimeError(
+                    f"{self.path} is being written by another process"
+                ) from ex
+            raise
+        self._locked = True
+
+    def add(self, entry: IndexEntry) -> bool:
+        """Add an entry, unless the player already has one for its change.
+
+        Returns whether the entry was added.
+        """
+        self._lock_writer()
+        # Find the entries of the player of the next later and earlier changes
+        later, earlier = 0, self._players.get(entry.player_id, 0)
+        while earlier:
+            current, previous, _ = self._read(earlier)
+            if current.change_id == entry.change_id:
+                return False
+            if current.change_id < entry.change_id:
+                break
+            later, earlier = earlier, previous
+        group = self._leagues.get(entry.league_id, entry.change_id)
+        number = len(self) + 1
+        self._entries.write(ENTRY.pack(*entry, earlier, group))
+        self._entries.flush()
+        if later:
+            self._links.seek((later - 1) * ENTRY.size + PLAYER_LINK_OFFSET)
+            self._links.write(PLAYER_LINK.pack(number))
+            self._links.flush()
+        else:
+            self._players.put(entry.player_id, 0, number)
+        self._leagues.put(entry.league_id, entry.change_id, number)
+        return True
+
+    def latest(self, player_id: int) -> Optional[IndexEntry]:
+        """Return the entry of a player's latest change, if any."""
+        number = self._players.get(player_id, 0)
+        return self._read(number)[0] if number else None
+
+    def history(self, player_id: int) -> Iterator[IndexEntry]:
+        """Yield the entries of a player, from the latest change down."""
+        number = self._players.get(player_id, 0)
+        while number:
+            entry, number, _ = self._read(number)
+            yield entry
+
+    def player_ids(self, change_id: int, league_id: Optional[int] = None) -> List[int]:
+        """Return the players of a league in a change, in the order they were seen.
+
+        Without a league, return the players indexed from unfiltered runs.
+        """
+        ids = []
+        number = self._leagues.get(league_id or 0, change_id)
+        while number:
+            entry, _, number = self._read(number)
+            ids.append(entry.player_id)
+        return list(dict.fromkeys(reversed(ids)))
+
+    def close(self) -> None:
+        """Unmap and close the index files."""
+        if self._map is not None:
+            self._map.close()
+        self._entries.close()
+        self._links.close()
+        self._players.close()
+        self._leagues.close()
@@ -0,0 +1,167 @@
+"""Load-test harness running the streams against the SoFIFA stand-in.
+
+Every stream is run over plain HTTP against a :class:`StandInServer`, for each
+combination of the settings under test, and the throughput and page latency
+percentiles are reported::
+
+    tap-sofifa-loadtest --streams player_changes player_detail \\
+        --max-workers 1 4 8 --latency 0.05 --throttle-rate 0.01
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+from tap_sofifa.standin import StandInServer, StandInSettings, player_ids
+from tap_sofifa.tap import TapSoFIFA
+from tap_sofifa.transport import Page, Transport, percentile
+
+
+class TimingTransport(Transport):
+    """Record the latency of every page fetched by another transport."""
+
+    def __init__(self, inner: Transport) -> None:
+        self.inner = inner
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Page:
+        """Fetch a URL with the inner transport, timing it."""
+        start = time.perf_counter()
+        try:
+            page = self.inner.fetch(url, validators)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+        return page
+
+    def close(self) -> None:
+        """Close the inner transport."""
+        self.inner.close()
+
+
+def run_stream(server: StandInServer, stream_name: str, config: dict) -> dict:
+    """Run a stream against the stand-in and report its throughput.
+
+    Args:
+        server: Running stand-in server.
+        stream_name: Name of the stream to run.
+        config: Settings of the run, over plain HTTP transport.
+    """
+    tap = TapSoFIFA(config={**config, "transport": "http", "_stream": stream_name})
+    stream = tap.streams[stream_name]
+    stream.url_base = server.url
+    stream.page_size = server.settings.page_size
+    timing = TimingTransport(stream.transport)
+    stream._transport = timing
+
+    records = 0
+    error = None
+    start = time.perf_counter()
+    try:
+        for _ in stream.get_records(None):
+            records += 1
+    except Exception as ex:
+        error = f"{type(ex).__name__}: {ex}"
+    seconds = time.perf_counter() - start
+    timing.close()
+
+    latencies = timing.latencies
+    return {
+        "stream": stream_name,
+        "max_workers": config.get("max_workers", 1),
+        "pages": len(latencies),
+        "records": records,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(len(latencies) / seconds, 2) if seconds else None,
+        "records_per_second": round(records / seconds, 2) if seconds else None,
+        **{
+            f"p{int(share * 100)}_ms": (
+                None if value is None else round(value * 1000, 1)
+            )
+            for share in (0.5, 0.9, 0.99)
+            for value in [percentile(latencies, share)]
+        },
+        "fetch_errors": timing.errors,
+        "error": error,
+    }
+
+
+def run(
+    settings: StandInSettings,
+    streams: Iterable[str],
+    max_workers: Iterable[int] = (1,),
+    detail_players: int = 100,
+    hedge_percentile: Optional[float] = None,
+    max_tries: int = 5,
+) -> List[dict]:
+    """Run every stream for every concurrency level and return the reports.
+
+    Failed pages are tried up to ``max_tries`` times, as in a sync.
+    """
+    reports = []
+    with StandInServer(settings) as server:
+        for stream_name in streams:
+            for workers in max_workers:
+                config: dict = {
+                    "max_workers": workers,
+                    "game_year": 23,
+                    "max_tries": max_tries,
+                }
+                if hedge_percentile:
+                    config["hedge_percentile"] = hedge_percentile
+                if stream_name in ("player_detail", "player_history"):
+                    config["player_ids"] = player_ids(
+                        min(detail_players, settings.players)
+                    )
+                reports.append(run_stream(server, stream_name, config))
+    return reports
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Run the load test and print one JSON report per line."""
+    parser = argparse.ArgumentParser(
+        prog="tap-sofifa-loadtest", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument(
+        "--streams",
+        nargs="+",
+        default=["versions", "changes", "player_changes", "player_detail"],
+    )
+    parser.add_argument("--max-workers", nargs="+", type=int, default=[1])
+    parser.add_argument("--players", type=int, default=600)
+    parser.add_argument("--page-size", type=int, default=60)
+    parser.add_argument("--detail-players", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument("--challenge-rate", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hedge-percentile", type=float)
+    parser.add_argument("--max-tries", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    settings = StandInSettings(
+        players=args.players,
+        page_size=args.page_size,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        challenge_rate=args.challenge_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    reports = run(
+        settings,
+        args.streams,
+        args.max_workers,
+        args.detail_players,
+        args.hedge_percentile,
+        args.max_tries,
+    )
+    for report in reports:
+        print(json.dumps(report))
@@ -0,0 +1,85 @@
+"""Ordered emission of pages fetched concurrently.
+
+Pages fetched by a pool of workers complete in any order, but records have to
+be emitted in page order and the stream state may only record pages whose
+predecessors are all done, so an interrupted run resumes without gaps.
+:class:`OrderedEmitter` buffers the pages completed ahead of the first
+unfinished one and releases them as soon as the gap closes.
+"""
+
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+
+class OrderedEmitter:
+    """Release completed pages in sequence order.
+
+    Pages are numbered from 0 in the order they were requested. The
+    ``watermark`` is the number of pages released so far, i.e. the first page
+    that has not been emitted yet.
+
+    Args:
+        max_pending: Number of pages that may be buffered or in flight ahead
+            of the watermark; callers should not request more pages while
+            :attr:`full` is set.
+    """
+
+    def __init__(self, max_pending: int = 16) -> None:
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.max_pending = max_pending
+        self.watermark = 0
+        self.in_flight = 0
+        self.last: Optional[int] = None
+        self._completed: Dict[int, Union[Iterable[dict], BaseException]] = {}
+
+    @property
+    def full(self) -> bool:
+        """Whether the number of pages held ahead of the watermark is at its cap."""
+        return self.in_flight + len(self._completed) >= self.max_pending
+
+    @property
+    def buffered(self) -> int:
+        """Number of completed pages waiting for an earlier page."""
+        return len(self._completed)
+
+    def request(self) -> None:
+        """Account for a page handed to a worker."""
+        self.in_flight += 1
+
+    def complete(
+        self, sequence: int, result: Union[Iterable[dict], BaseException]
+    ) -> None:
+        """Store the records of a page, or the error it failed with.
+
+        Errors are raised by :meth:`drain` only when the page is reached, so a
+        failure of a page past the last one is ignored.
+        """
+        if sequence < self.watermark or sequence in self._completed:
+            raise ValueError(f"Page {sequence} was already completed")
+        self.in_flight -= 1
+        if self.last is None or sequence <= self.last:
+            self._completed[sequence] = result
+
+    def end(self, sequence: int) -> None:
+        """Mark a page as the last one, dropping any buffered page past it."""
+        if self.last is None or sequence < self.last:
+            self.last = sequence
+        for later in [key for key in self._completed if key > sequence]:
+            del self._completed[later]
+
+    @property
+    def done(self) -> bool:
+        """Whether every page up to the last one has been released."""
+        return self.last is not None and self.watermark > self.last
+
+    def drain(self) -> Iterator[dict]:
+        """Yield the records of the pages contiguous with the watermark.
+
+        The watermark moves past a page once all of its records are yielded.
+        """
+        while self.watermark in self._completed:
+            result = self._completed.pop(self.watermark)
+            if isinstance(result, BaseException):
+                raise result
+            yield from result
+            self.watermark += 1
@@ -0,0 +1,223 @@
+"""Bounded output pipeline between the streams and the Singer target.
+
+Singer messages are written to stdout, so a slow target (a warehouse loader
+flushing a batch, say) blocks the stream that writes them, and with it the
+pages being fetched. :class:`OutputPipeline` puts a bounded queue between the
+streams and a thread writing to stdout:
+
+- up to ``max_queued`` messages are held in memory;
+- past that, messages are spilled to a compressed file in ``spill_dir`` and
+  read back in order once the target catches up;
+- once ``max_spilled`` messages are on disk, or when spilling is disabled,
+  writing a message blocks, which stops the streams from fetching more pages.
+
+The depth of the queue, of the spill file and of the stages reported by the
+streams (pages being fetched, pages parsed and waiting to be emitted) are
+logged as Singer ``METRIC`` gauges.
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import IO, Deque, Dict, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+
+class OutputPipeline:
+    """File-like queue of Singer messages written to ``output`` by a thread.
+
+    Use it as ``sys.stdout`` while the streams are synced, then call
+    :meth:`close` to wait for the queued messages to be written.
+
+    Args:
+        output: Stream the messages are written to.
+        max_queued: Number of messages held in memory.
+        spill_dir: Directory of the spill files; messages are not spilled
+            when it is not set.
+        max_spilled: Number of messages spilled at most; unlimited when not
+            set.
+        metrics_interval: Seconds between two reports of the queue depths.
+    """
+
+    def __init__(
+        self,
+        output: TextIO,
+        max_queued: int = 1000,
+        spill_dir: Optional[str] = None,
+        max_spilled: Optional[int] = None,
+        metrics_interval: float = 60,
+    ) -> None:
+        if max_queued < 1:
+            raise ValueError("max_queued must be at least 1")
+        self.output = output
+        self.max_queued = max_queued
+        self.spill_dir = spill_dir
+        self.max_spilled = max_spilled
+        self.metrics_interval = metrics_interval
+        self.stages: Dict[str, int] = {}
+        self._partial = ""
+        self._memory: Deque[str] = deque()
+        self._spilled = 0
+        # Spill segments, oldest first, with the number of messages left in each
+        self._segments: Deque[List] = deque()
+        self._spill_path: Optional[str] = None
+        self._writer: Optional[IO[str]] = None
+        self._reader: Optional[IO[str]] = None
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._reported = time.monotonic()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="sofifa-output", daemon=True
+        )
+        self._thread.start()
+
+    def depths(self) -> Dict[str, int]:
+        """Return the number of messages queued and spilled, and the stage depths."""
+        with self._condition:
+            return {
+                "queued": len(self._memory),
+                "spilled": self._spilled,
+                **self.stages,
+            }
+
+    def set_depth(self, stage: str, depth: int) -> None:
+        """Report the number of items waiting in a stage of a stream."""
+        self.stages[stage] = depth
+
+    def write(self, text: str) -> int:
+        """Queue the complete lines written, blocking while the queue is full."""
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._put(line + "\n")
+        return len(text)
+
+    def flush(self) -> None:
+        """Do nothing; messages are flushed by the output thread."""
+
+    def _can_spill(self) -> bool:
+        return self.spill_dir is not None and (
+            self.max_spilled is None or self._spilled < self.max_spilled
+        )
+
+    def _put(self, line: str) -> None:
+        with self._condition:
+            while (
+                self._error is None
+                and (self._spilled or len(self._memory) >= self.max_queued)
+                and not self._can_spill()
+            ):
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            if not self._spilled and len(self._memory) < self.max_queued:
+                self._memory.append(line)
+            else:
+                self._spill(line)
+            self._condition.notify_all()
+
+    def _spill(self, line: str) -> None:
+        if self._writer is None:
+            if self._spill_path is None:
+                self._spill_path = tempfile.mkdtemp(
+                    prefix="tap-sofifa-", dir=self.spill_dir
+                )
+            path = os.path.join(self._spill_path, f"{time.monotonic_ns()}.jsonl.gz")
+            self._writer = gzip.open(path, "wt", encoding="utf-8")
+            self._segments.append([path, 0])
+            logger.info(f"Target is lagging, spilling messages to {path}")
+        self._writer.write(line)
+        self._segments[-1][1] += 1
+        self._spilled += 1
+
+    def _unspill(self) -> str:
+        segment = self._segments[0]
+        if self._reader is None:
+            if self._writer is not None and len(self._segments) == 1:
+                # New messages go to the next segment while this one is read
+                self._writer.close()
+                self._writer = None
+            self._reader = gzip.open(segment[0], "rt", encoding="utf-8")
+        line = self._reader.readline()
+        segment[1] -= 1
+        self._spilled -= 1
+        if segment[1] == 0:
+            self._reader.close()
+            self._reader = None
+            os.unlink(segment[0])
+            self._segments.popleft()
+        return line
+
+    def _get(self) -> Optional[str]:
+        with self._condition:
+            while not (self._memory or self._spilled or self._closed):
+                self._condition.wait(self.metrics_interval)
+                self._report()
+            if self._memory:
+                line = self._memory.popleft()
+            elif self._spilled:
+                line = self._unspill()
+            else:
+                return None
+            self._condition.notify_all()
+            return line
+
+    def _report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._reported < self.metrics_interval:
+            return
+        self._reported = now
+        for stage, depth in self.depths().items():
+            metric = {
+                "type": "gauge",
+                "metric": "queue_depth",
+                "value": depth,
+                "tags": {"stage": stage},
+            }
+            logger.info(f"METRIC: {json.dumps(metric)}")
+
+    def _run(self) -> None:
+        try:
+            while True:
+                line = self._get()
+                if line is None:
+                    break
+                self.output.write(line)
+                if not (self._memory or self._spilled):
+                    self.output.flush()
+                self._report()
+            self.output.flush()
+        except BaseException as ex:
+            with self._condition:
+                self._error = ex
+                self._condition.notify_all()
+
+    def close(self) -> None:
+        """Write the remaining messages and remove the spill files.
+
+        Raises the error the output thread stopped on, if any.
+        """
+        if self._partial:
+            self._put(self._partial)
+            self._partial = ""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._report(force=True)
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader is not None:
+            self._reader.close()
+        if self._spill_path is not None:
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+        if self._error is not None:
+            raise self._error
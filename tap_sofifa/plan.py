@@ -0,0 +1,285 @@
+"""Run planner estimating the pages and time a sync would take.
+
+The planner reads as little as it can of what a sync would fetch: the extent
+of each player table is found by probing pages at doubling offsets, player
+pages are counted from the configured players or the player index, and pages
+the run would not fetch (unchanged streams skipped with ``skip_unchanged``,
+replayed archives, changes already in the state, pages shared through the
+page memo) are counted as cache savings::
+
+    tap-sofifa --config config.json --state state.json --plan \\
+        --league-ids 13 16 --change-ids 230020 230019
+
+One JSON report per stream and partition is printed, followed by the totals.
+"""
+
+import argparse
+import json
+import sys
+import time
+from itertools import product
+from typing import Dict, List, Optional, Set, Tuple
+
+from bs4 import BeautifulSoup
+from singer_sdk.exceptions import FatalAPIError
+
+from tap_sofifa.client import SoFIFAStream
+from tap_sofifa.streams import PlayerDetailStream, PlayerHistoryStream, PlayerListStream
+from tap_sofifa.tap import STREAM_TYPES, TapSoFIFA
+
+
+class Probe:
+    """Fetch pages for the planner, timing them."""
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        # Changes listed on the page of the first player planned
+        self.player_changes: Optional[List[int]] = None
+
+    def fetch(self, stream: SoFIFAStream, url: str) -> Optional[BeautifulSoup]:
+        """Return a page, or ``None`` when it does not exist."""
+        start = time.perf_counter()
+        try:
+            return stream._fetch_page(url, stream.page_strainer)
+        except FatalAPIError:
+            return None
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def seconds_per_page(self) -> Optional[float]:
+        """Return the mean latency of the pages fetched."""
+        if not self.latencies:
+            return None
+        return sum(self.latencies) / len(self.latencies)
+
+
+def count_list_pages(
+    stream: PlayerListStream, context: Optional[dict], probe: Probe
+) -> int:
+    """Return the number of pages of a player table.
+
+    Pages are probed at doubling offsets until one is empty, then the last
+    page is found by bisection, so a table of ``n`` pages costs about
+    ``2 log2(n)`` requests.
+    """
+    url = stream.get_url(context)
+
+    def exists(page: int) -> bool:
+        response = probe.fetch(stream, f"{url}&offset={page * stream.page_size}")
+        return response is not None and bool(response.select("tbody tr"))
+
+    first = probe.fetch(stream, url)
+    if first is None or stream.get_next_page_url(first) is None:
+        return 1
+    last, missing = 1, 2
+    if not exists(1):
+        return 1
+    while exists(missing):
+        last, missing = missing, missing * 2
+    while missing - last > 1:
+        middle = (last + missing) // 2
+        if exists(middle):
+            last = middle
+        else:
+            missing = middle
+    return last + 1
+
+
+def missing_setting(stream: SoFIFAStream) -> Optional[str]:
+    """Return the setting a stream cannot be planned without, if missing."""
+    if (
+        isinstance(stream, PlayerDetailStream)
+        and "player_id" not in stream.config
+        and not stream.get_player_ids()
+    ):
+        return "player_id"
+    return None
+
+
+def plan_stream(
+    stream: SoFIFAStream, context: Optional[dict], probe: Probe, seen: Set[str]
+) -> dict:
+    """Estimate the pages of a stream partition and how many are cached."""
+    config = stream.config
+    report: Dict = {"stream": stream.name, "partition": context}
+    cached = 0
+    if isinstance(stream, PlayerHistoryStream):
+        pages, cached = plan_history(stream, context, probe)
+    elif isinstance(stream, PlayerDetailStream):
+        urls = stream.get_page_urls(context)
+        pages = len(list(urls)) if urls is not None else 1
+        if config.get("player_ids") is None and urls is not None:
+            report["players_from_index"] = pages
+    elif isinstance(stream, PlayerListStream):
+        pages = count_list_pages(stream, context, probe)
+    else:
+        url = stream.get_url(context)
+        pages = 1
+        if url in seen:
+            # Fetched by an earlier stream and kept by the page memo
+            cached = pages
+        seen.add(url)
+
+    if config.get("archive_path") and config.get("archive_mode") in (
+        "replay",
+        "reparse",
+    ):
+        cached = pages
+    elif config.get("skip_unchanged"):
+        fingerprint = stream.get_source_fingerprint(context)
+        state = stream.get_context_state(context)
+        if fingerprint is not None and fingerprint == state.get("fingerprint"):
+            cached = pages
+    report.update(pages=pages, cached_pages=cached)
+    return report
+
+
+def plan_history(
+    stream: PlayerHistoryStream, context: Optional[dict], probe: Probe
+) -> Tuple[int, int]:
+    """Estimate the pages of a player's history and how many are synced."""
+    if not context:
+        # No player to read the history of
+        return 0, 0
+    if probe.player_changes is None:
+        # Players are assumed to have the changes of the first one
+        start = time.perf_counter()
+        probe.player_changes = stream.get_player_changes(context["player_id"])
+        probe.latencies.append(time.perf_counter() - start)
+    synced = stream.get_context_state(context).get("change_id", 0)
+    cached = sum(change_id <= synced for change_id in probe.player_changes)
+    return 1 + len(probe.player_changes), cached
+
+
+def selected_stream_names(catalog: Optional[dict]) -> List[str]:
+    """Return the names of the streams a run with a catalog would sync.
+
+    Without a catalog, those are the streams selected by default.
+    """
+    if catalog is None:
+        return [
+            name
+            for name, stream_class in STREAM_TYPES.items()
+            if stream_class.selected_by_default
+        ]
+    names = []
+    for entry in catalog.get("streams", []):
+        for item in entry.get("metadata", []):
+            if item.get("breadcrumb"):
+                continue
+            metadata = item.get("metadata", {})
+            selected = metadata.get("selected")
+            if selected is None:
+                selected = metadata.get("selected-by-default", False)
+            if selected or metadata.get("inclusion") == "automatic":
+                names.append(entry["tap_stream_id"])
+    return names
+
+
+def plan(
+    taps: List[TapSoFIFA], requests_per_second: Optional[float] = None
+) -> Tuple[List[dict], dict]:
+    """Plan the runs of some taps.
+
+    Returns a report per stream partition and the totals: the pages to
+    fetch, the share saved by caches and the expected duration at the
+    configured concurrency, capped at ``requests_per_second``.
+    """
+    probe = Probe()
+    reports = []
+    workers = 1
+    for tap in taps:
+        seen: Set[str] = set()
+        for stream in tap.streams.values():
+            if not (isinstance(stream, SoFIFAStream) and stream.selected):
+                continue
+            missing = missing_setting(stream)
+            if missing is not None:
+                stream.logger.warning(
+                    f"Not planning {stream.name}, {missing} is not set"
+                )
+                continue
+            if tap.config.get("transport") == "http":
+                workers = max(workers, tap.config.get("max_workers") or 1)
+            contexts: List[Optional[dict]] = list(stream.partitions or [None])
+            for context in contexts:
+                reports.append(plan_stream(stream, context, probe, seen))
+
+    pages = sum(report["pages"] for report in reports)
+    cached = sum(report["cached_pages"] for report in reports)
+    seconds_per_page = probe.seconds_per_page()
+    expected = None
+    if seconds_per_page is not None:
+        expected = (pages - cached) * seconds_per_page / workers
+        if requests_per_second:
+            expected = max(expected, (pages - cached) / requests_per_second)
+    totals = {
+        "pages": pages,
+        "cached_pages": cached,
+        "pages_to_fetch": pages - cached,
+        "cache_savings": round(cached / pages, 3) if pages else None,
+        "probe_requests": len(probe.latencies),
+        "seconds_per_page": seconds_per_page and round(seconds_per_page, 3),
+        "max_workers": workers,
+        "expected_seconds": expected and round(expected, 1),
+    }
+    return reports, totals
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Print the plan of a run, one JSON report per line."""
+    parser = argparse.ArgumentParser(
+        prog="tap-sofifa --plan", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--config", action="append", default=[])
+    parser.add_argument("--state")
+    parser.add_argument("--catalog")
+    parser.add_argument("--league-ids", nargs="+", type=int)
+    parser.add_argument("--change-ids", nargs="+", type=int)
+    parser.add_argument("--requests-per-second", type=float)
+    args = parser.parse_args(argv)
+
+    config: dict = {}
+    for path in args.config:
+        with open(path) as config_file:
+            config.update(json.load(config_file))
+    state = catalog = None
+    if args.state:
+        with open(args.state) as state_file:
+            state = json.load(state_file)
+    if args.catalog:
+        with open(args.catalog) as catalog_file:
+            catalog = json.load(catalog_file)
+
+    # One tap per selected stream, so the streams not synced are never built
+    stream_names = selected_stream_names(catalog)
+    taps = []
+    for league_id, change_id in product(
+        args.league_ids or [config.get("league_id")],
+        args.change_ids or [config.get("change_id")],
+    ):
+        run_config = dict(config)
+        for key, value in (("league_id", league_id), ("change_id", change_id)):
+            if value is not None:
+                run_config[key] = value
+        for stream_name in stream_names:
+            taps.append(
+                TapSoFIFA(
+                    config={**run_config, "_stream": stream_name},
+                    catalog=catalog,
+                    state=state,
+                )
+            )
+
+    reports, totals = plan(taps, args.requests_per_second)
+    for report in reports:
+        print(json.dumps(report))
+    print(json.dumps({"totals": totals}))
+
+
+def cli() -> None:
+    """Run the tap, or print the plan of the run when ``--plan`` is given."""
+    if "--plan" in sys.argv[1:]:
+        main([arg for arg in sys.argv[1:] if arg != "--plan"])
+    else:
+        TapSoFIFA.cli()
@@ -0,0 +1,79 @@
+"""Priorities of leagues and players, from the ``priority`` setting.
+
+Some data has to land first: the top leagues, the players whose ratings just
+changed. The setting weighs them::
+
+    {
+        "leagues": {"13": 10, "53": 10, "19": 10, "31": 10, "16": 10},
+        "players": {"158023": 20},
+        "changed_players": 5
+    }
+
+League partitions of the player tables, player pages and queued jobs are
+then fetched from the weightiest down; leagues and players without a rule
+weigh 1 and keep their order.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from tap_sofifa.index import PlayerIndex
+from tap_sofifa.store import PlayerStore
+
+
+class Priorities:
+    """Weights of leagues and players.
+
+    Args:
+        rules: The ``priority`` setting; ``leagues`` and ``players`` map IDs
+            to weights, and ``changed_players`` is the weight of players whose
+            overall or potential rating changed between their two latest
+            entries in the player index.
+        index: Player index or store to look up the league and the changes of
+            players.
+    """
+
+    def __init__(
+        self, rules: dict, index: Optional[Union[PlayerIndex, PlayerStore]] = None
+    ) -> None:
+        self.leagues: Dict[int, float] = {
+            int(key): value for key, value in rules.get("leagues", {}).items()
+        }
+        self.players: Dict[int, float] = {
+            int(key): value for key, value in rules.get("players", {}).items()
+        }
+        self.changed_players: Optional[float] = rules.get("changed_players")
+        self.index = index
+
+    def __bool__(self) -> bool:
+        return bool(self.leagues or self.players or self.changed_players)
+
+    def league_weight(self, league_id: Optional[int]) -> float:
+        """Return the weight of a league."""
+        return self.leagues.get(league_id or 0, 1)
+
+    def player_weight(self, player_id: int) -> float:
+        """Return the weightiest rule matching a player."""
+        weight = self.players.get(player_id, 1)
+        if self.index is None or not (self.leagues or self.changed_players):
+            return weight
+        history = self.index.history(player_id)
+        latest = next(history, None)
+        if latest is None:
+            return weight
+        weight = max(weight, self.league_weight(latest.league_id))
+        previous = next(history, None)
+        if (
+            self.changed_players
+            and previous is not None
+            and (previous.overall_rating, previous.potential_rating)
+            != (latest.overall_rating, latest.potential_rating)
+        ):
+            weight = max(weight, self.changed_players)
+        return weight
+
+    def order(self, ids: Iterable[int], weight: Callable[[int], float]) -> List[int]:
+        """Return IDs from the weightiest down, keeping the order of equals."""
+        ids = list(ids)
+        if not self:
+            return ids
+        return sorted(ids, key=lambda key: -weight(key))
@@ -0,0 +1,274 @@
+"""Profilers scoped to the page handling of SoFIFA streams.
+
+Only the time spent inside profiled scopes (fetching, validating and parsing
+pages) is measured, so the output is not drowned by Singer message writing.
+Scopes are tracked per thread, so pages handled by the worker threads of
+``max_workers`` are profiled along with those of the main thread.
+
+- :class:`CProfileProfiler` traces every call; precise but slow, for short runs.
+- :class:`SamplingProfiler` samples the stacks of the threads in profiled
+  scopes from a background thread; cheap enough for production runs.
+
+Both write a top-N hot-function summary; the sampling profiler also writes a
+collapsed-stack file for ``flamegraph.pl`` or speedscope, and the cProfile one a
+``pstats`` dump.
+"""
+
+import cProfile
+import io
+from abc import ABC, abstractmethod
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Iterator, List, Optional, Set, Tuple, Union
+
+
+class Profiler(ABC):
+    """Base class for profilers.
+
+    Args:
+        output_dir: Directory the profile files are written to.
+        top: Number of functions listed in the summary.
+    """
+
+    suffix = ""
+
+    def __init__(self, output_dir: Union[str, Path] = ".", top: int = 25) -> None:
+        self.output_dir = Path(output_dir)
+        self.top = top
+        self.run_name = time.strftime("tap-sofifa-%Y%m%dT%H%M%S")
+        self._local = threading.local()
+
+    @contextmanager
+    def scope(self) -> Iterator[None]:
+        """Profile the code run within the context by the current thread."""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        if depth == 0:
+            self._start()
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                self._stop()
+
+    def profile_iter(self, iterable: Iterator) -> Iterator:
+        """Profile the production of each item of an iterator, not its use."""
+        iterator = iter(iterable)
+        while True:
+            with self.scope():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def write(self) -> List[Path]:
+        """Stop profiling, write the profile files and return their paths."""
+        self.close()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        summary = self.output_dir / f"{self.run_name}.{self.suffix}.txt"
+        summary.write_text(self.summary())
+        return [summary]
+
+    def close(self) -> None:
+        """Release the resources held by the profiler."""
+
+    @abstractmethod
+    def summary(self) -> str:
+        """Return the top-N hot-function summary."""
+
+    @abstractmethod
+    def _start(self) -> None:
+        """Start profiling the current thread."""
+
+    @abstractmethod
+    def _stop(self) -> None:
+        """Stop profiling the current thread."""
+
+
+class CProfileProfiler(Profiler):
+    """Deterministic profiler built on :mod:`cProfile`.
+
+    A cProfile profile only traces the thread that enabled it, so every
+    thread gets its own, merged into one set of statistics when written.
+    """
+
+    suffix = "cprofile"
+
+    def __init__(self, output_dir: Union[str, Path] = ".", top: int = 25) -> None:
+        super().__init__(output_dir, top)
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _thread_profile(self) -> cProfile.Profile:
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    def _start(self) -> None:
+        self._thread_profile().enable()
+
+    def _stop(self) -> None:
+        self._thread_profile().disable()
+
+    def stats(self, stream: Optional[io.StringIO] = None) -> Optional[pstats.Stats]:
+        """Return the statistics of every thread, if any was profiled."""
+        with self._lock:
+            profiles = [profile for profile in self._profiles if profile.getstats()]
+        if not profiles:
+            return None
+        return pstats.Stats(*profiles, stream=stream)
+
+    def summary(self) -> str:
+        """Return the functions with the highest cumulative and own time."""
+        output = io.StringIO()
+        stats = self.stats(output)
+        if stats is None:
+            return "No profiled calls\n"
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stats.sort_stats("tottime").print_stats(self.top)
+        return output.getvalue()
+
+    def write(self) -> List[Path]:
+        """Write the summary and a ``pstats`` dump."""
+        paths = super().write()
+        stats = self.stats()
+        if stats is None:
+            return paths
+        dump = self.output_dir / f"{self.run_name}.prof"
+        stats.dump_stats(str(dump))
+        return paths + [dump]
+
+
+class SamplingProfiler(Profiler):
+    """Low-overhead profiler sampling the stacks of the profiled threads.
+
+    Samples are taken by a background thread, started with the first scope
+    and stopped and joined when the profiler is closed or written.
+
+    Args:
+        output_dir: Directory the profile files are written to.
+        top: Number of functions listed in the summary.
+        interval: Seconds between two samples.
+    """
+
+    suffix = "sampling"
+
+    def __init__(
+        self,
+        output_dir: Union[str, Path] = ".",
+        top: int = 25,
+        interval: float = 0.005,
+    ) -> None:
+        super().__init__(output_dir, top)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._thread_ids: Set[int] = set()
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._closed = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def _start(self) -> None:
+        with self._lock:
+            self._thread_ids.add(threading.get_ident())
+            if self._sampler is None:
+                self._closed.clear()
+                self._sampler = threading.Thread(
+                    target=self._sample, name="tap-sofifa-sampler", daemon=True
+                )
+                self._sampler.start()
+            self._active.set()
+
+    def _stop(self) -> None:
+        with self._lock:
+            self._thread_ids.discard(threading.get_ident())
+            if not self._thread_ids:
+                self._active.clear()
+
+    def close(self) -> None:
+        """Stop sampling and wait for the sampling thread to end."""
+        with self._lock:
+            sampler, self._sampler = self._sampler, None
+        if sampler is None:
+            return
+        self._closed.set()
+        # Wake the sampler up if no thread is profiled
+        self._active.set()
+        sampler.join()
+        with self._lock:
+            if not self._thread_ids:
+                self._active.clear()
+
+    def _sample(self) -> None:
+        while True:
+            self._active.wait()
+            if self._closed.is_set():
+                return
+            frames = sys._current_frames()  # type: ignore
+            with self._lock:
+                for thread_id in self._thread_ids:
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        self.stacks[self._collapse(frame)] += 1
+            if self._closed.wait(self.interval):
+                return
+
+    @staticmethod
+    def _collapse(frame: Optional[FrameType]) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", "?")
+            names.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _stack_counts(self) -> List[Tuple[str, int]]:
+        with self._lock:
+            return list(self.stacks.items())
+
+    def summary(self) -> str:
+        """Return the functions sampled most often, on top of and in the stack."""
+        stacks = self._stack_counts()
+        total = sum(count for _, count in stacks) or 1
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in stacks:
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+
+        lines = [f"{total} samples every {self.interval * 1000:g} ms", ""]
+        for title, counts in (("Own", own), ("Inclusive", inclusive)):
+            lines.append(f"{title} samples:")
+            for name, count in counts.most_common(self.top):
+                lines.append(f"{count:8d} {100 * count / total:6.2f}%  {name}")
+            lines.append("")
+        return "\n".join(lines)
+
+    def write(self) -> List[Path]:
+        """Write the summary and the collapsed stacks."""
+        paths = super().write()
+        collapsed = self.output_dir / f"{self.run_name}.collapsed"
+        collapsed.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in self._stack_counts())
+        )
+        return paths + [collapsed]
+
+
+PROFILERS = {
+    "cprofile": CProfileProfiler,
+    "sampling": SamplingProfiler,
+}
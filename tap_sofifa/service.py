@@ -0,0 +1,185 @@
+"""Long-running service mode for tap-sofifa.
+
+Starting the tap costs the Python imports, the browser launch, the cookie
+consent click and loading the schemas before the first page is fetched. For
+many small jobs (one player, one change) that startup dominates, so the
+service keeps a process running and accepts extraction jobs as JSON lines,
+from stdin or a local Unix socket::
+
+    {"id": "job-1", "stream": "player_detail", "config": {"player_id": 1}}
+
+Each job is merged over the service's config and run by a :class:`TapSoFIFA`,
+which writes its Singer messages back on the same channel, followed by a
+``JOB`` line reporting the outcome::
+
+    {"type": "JOB", "id": "job-1", "status": "succeeded", "seconds": 0.4}
+
+Taps are kept warm per stream, catalog and transport settings: the following
+jobs run on the same streams, reconfigured with their own settings and state
+(see :meth:`TapSoFIFA.reconfigure`), so their schemas are loaded and their
+browser sessions launched once. The transports, with the browser sessions,
+HTTP connection pools and archives behind them, are kept with the streams, and
+the player index and store files are shared by all taps. The page memo is
+not kept: a page fetched for an earlier job may have changed since.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Dict, Optional, TextIO
+
+from tap_sofifa.index import PlayerIndex
+from tap_sofifa.store import PlayerStore
+from tap_sofifa.tap import TapSoFIFA
+
+# Settings the transport of a stream is built from
+TRANSPORT_SETTINGS = ("transport", "archive_path", "archive_mode", "replay_latency")
+
+
+class TapService:
+    """Run extraction jobs on warm taps.
+
+    Args:
+        config: Settings shared by all jobs; a job's own config is merged over
+            them.
+    """
+
+    def __init__(self, config: Optional[dict] = None) -> None:
+        self.config = config or {}
+        self._taps: Dict[str, TapSoFIFA] = {}
+        self._indexes: Dict[str, PlayerIndex] = {}
+        self._stores: Dict[str, PlayerStore] = {}
+
+    @staticmethod
+    def _tap_key(config: dict, catalog: Optional[dict]) -> str:
+        settings = {key: config.get(key) for key in ("_stream", *TRANSPORT_SETTINGS)}
+        return json.dumps([settings, catalog], sort_keys=True)
+
+    def run_job(self, job: dict, output: TextIO) -> dict:
+        """Run a job, writing its Singer messages to ``output``.
+
+        Returns the ``JOB`` message reporting the outcome of the job.
+        """
+        config = {**self.config, **job.get("config", {})}
+        if "stream" in job:
+            config["_stream"] = job["stream"]
+        start = time.perf_counter()
+        key = self._tap_key(config, job.get("catalog"))
+        try:
+            tap = self._warm_tap(key, config, job)
+            with redirect_stdout(output):
+                tap.sync_all()
+        except Exception as ex:
+            status = {"status": "failed", "error": f"{type(ex).__name__}: {ex}"}
+            # The transports of the tap may be what failed
+            self._drop_tap(key)
+        else:
+            status = {"status": "succeeded"}
+        return {
+            "type": "JOB",
+            "id": job.get("id"),
+            **status,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def _warm_tap(self, key: str, config: dict, job: dict) -> TapSoFIFA:
+        """Return the tap kept for a job's settings, reconfigured for the job."""
+        tap = self._taps.get(key)
+        if tap is not None:
+            tap.reconfigure(config, job.get("state"))
+        else:
+            tap = TapSoFIFA(
+                config=config, catalog=job.get("catalog"), state=job.get("state")
+            )
+            for stream in tap.streams.values():
+                stream.keep_transport = True
+            self._taps[key] = tap
+        self._share_files(tap)
+        return tap
+
+    def _drop_tap(self, key: str) -> None:
+        tap = self._taps.pop(key, None)
+        if tap is not None:
+            for stream in tap.streams.values():
+                stream.close_transport()
+
+    def _share_files(self, tap: TapSoFIFA) -> None:
+        """Hand the index and store files of a job, opened once, to its tap."""
+        index_path = tap.config.get("player_index_path")
+        if index_path and index_path not in self._indexes:
+            self._indexes[index_path] = PlayerIndex(index_path)
+        tap._player_index = self._indexes.get(index_path) if index_path else None
+        store_path = tap.config.get("player_store_path")
+        if store_path and store_path not in self._stores:
+            self._stores[store_path] = PlayerStore(
+                store_path, tap.config.get("store_batch_size", 500)
+            )
+        tap._player_store = self._stores.get(store_path) if store_path else None
+
+    def serve(self, jobs: TextIO, output: TextIO) -> None:
+        """Run the jobs read line by line from ``jobs`` until it is closed."""
+        for line in jobs:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as ex:
+                result = {"type": "JOB", "status": "failed", "error": str(ex)}
+            else:
+                result = self.run_job(job, output)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+    def serve_socket(self, path: str) -> None:
+        """Accept connections on a Unix socket, serving one at a time."""
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen()
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection, connection.makefile(
+                    "r", encoding="utf-8"
+                ) as jobs, connection.makefile("w", encoding="utf-8") as output:
+                    self.serve(jobs, output)
+        finally:
+            server.close()
+            os.unlink(path)
+
+    def close(self) -> None:
+        """Release the warm taps, quitting their browsers, and the files kept open."""
+        for key in list(self._taps):
+            self._drop_tap(key)
+        for resource in [*self._indexes.values(), *self._stores.values()]:
+            resource.close()
+        self._indexes.clear()
+        self._stores.clear()
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Run the service on stdin and stdout, or on a Unix socket."""
+    parser = argparse.ArgumentParser(
+        prog="tap-sofifa-service", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--config", help="Settings shared by all jobs (JSON file)")
+    parser.add_argument("--socket", help="Serve jobs on this Unix socket path")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.config:
+        with open(args.config) as config_file:
+            config = json.load(config_file)
+    service = TapService(config)
+    try:
+        if args.socket:
+            service.serve_socket(args.socket)
+        else:
+            service.serve(sys.stdin, sys.stdout)
+    finally:
+        service.close()
@@ -0,0 +1,338 @@
+"""Local stand-in for SoFIFA serving synthetic pages.
+
+The pages have the structure the streams' extraction specs expect: the home
+page with its versions and changes menus, paginated player and team tables
+with NEXT links and an ``offset`` parameter, and player detail pages. Players are
+generated from their number, so every run serves the same data.
+
+Latency, throttling (429 responses), Cloudflare-style challenges and server
+errors can be injected to see how the tap behaves under them.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+FIRST_PLAYER_ID = 100000
+CHANGE_IDS = [230020, 230019, 230018]
+VERSION_IDS = {23: 230020, 22: 220069}
+QUARTERS = [
+    ("Attacking", "Crossing"),
+    ("Skill", "Dribbling"),
+    ("Movement", "Acceleration"),
+    ("Power", "Shot Power"),
+    ("Mentality", "Aggression"),
+    ("Defending", "Defensive Awareness"),
+    ("Goalkeeping", "GK Diving"),
+    ("Traits", "Long Shots"),
+]
+TEAMS = 40
+LEAGUES = {
+    13: "English Premier League (1)",
+    16: "French Ligue 1 (1)",
+    19: "German 1. Bundesliga (1)",
+    31: "Italian Serie A (1)",
+    53: "Spain Primera Division (1)",
+}
+CHALLENGE_PAGE = (
+    "<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+    "<body>Checking your browser before accessing sofifa.com.</body></html>"
+)
+# Served by SoFIFA past the last page of a table
+EMPTY_TABLE = "<html><body><table><tbody></tbody></table></body></html>"
+
+
+@dataclass
+class StandInSettings:
+    """Behaviour of the stand-in server.
+
+    Args:
+        players: Number of players listed.
+        page_size: Players per list page.
+        latency: Seconds added to every response.
+        jitter: Maximum random seconds added on top of ``latency``.
+        throttle_rate: Share of requests answered with 429.
+        challenge_rate: Share of requests answered with a challenge page.
+        error_rate: Share of requests answered with 500.
+        seed: Seed of the random failures and jitter.
+        empty_past_end: Answer offsets past the last player or team with an
+            empty table, as SoFIFA does, rather than 404.
+    """
+
+    players: int = 600
+    page_size: int = 60
+    latency: float = 0
+    jitter: float = 0
+    throttle_rate: float = 0
+    challenge_rate: float = 0
+    error_rate: float = 0
+    seed: int = 0
+    empty_past_end: bool = False
+
+
+def _player(number: int) -> Dict:
+    rng = random.Random(number)
+    overall = rng.randint(55, 92)
+    return {
+        "id": FIRST_PLAYER_ID + number,
+        "name": f"Player {number}",
+        "nationality": rng.choice(["England", "France", "Ghana", "Brazil"]),
+        "positions": rng.sample(["ST", "RW", "CM", "CB", "GK"], 2),
+        "age": rng.randint(17, 38),
+        "overall": overall,
+        "potential": min(overall + rng.randint(0, 8), 99),
+        "team_id": rng.randint(1, 40),
+        "value": rng.randint(1, 1500) / 10,
+        "wage": rng.randint(1, 400),
+        "total": rng.randint(1200, 2300),
+        "ratings": [rng.randint(10, 95) for _ in QUARTERS],
+    }
+
+
+def home_page() -> str:
+    """Return the home page with its versions and changes menus."""
+    versions = "".join(
+        f'<a href="/?r={change}&set=true">FIFA {year}</a>'
+        for year, change in VERSION_IDS.items()
+    )
+    changes = "".join(
+        f'<a href="/?r={change}&set=true">Feb {22 - position:02d}, 2022</a>'
+        for position, change in enumerate(CHANGE_IDS)
+    )
+    return (
+        "<html><body><a>Continue to Site</a>"
+        '<div class="bp3-menu"></div>'
+        f'<div class="bp3-menu">{versions}</div>'
+        f'<div class="bp3-menu">{changes}</div>'
+        "</body></html>"
+    )
+
+
+def _player_row(number: int, change_id: int) -> str:
+    player = _player(number)
+    positions = "".join(
+        f"<a><span>{position}</span></a>" for position in player["positions"]
+    )
+    return (
+        "<tr><td><figure></figure></td><td>"
+        f'<a href="/player/{player["id"]}/player-{number}/{change_id}"'
+        f' aria-label="{player["name"]}"><div>{player["name"]}</div></a>'
+        f'<img title="{player["nationality"]}" />{positions}</td>'
+        f'<td>{player["age"]}</td>'
+        f'<td><span>{player["overall"]}</span></td>'
+        f'<td><span>{player["potential"]}</span></td>'
+        f'<td><div><figure><img /></figure><a href="/team/{player["team_id"]}/team">'
+        f'Team {player["team_id"]}</a><div>2021 ~ 2025</div></div></td>'
+        f'<td>€{player["value"]:g}M</td>'
+        f'<td>€{player["wage"]}K</td>'
+        f'<td><span>{player["total"]}</span></td></tr>'
+    )
+
+
+def _wide_player_row(number: int, change_id: int, columns: List[str]) -> str:
+    player = _player(number)
+    ratings = {"oa": player["overall"], "pt": player["potential"]}
+    cells = "".join(
+        f'<td data-col="{code}"><span>'
+        f'{ratings.get(code) or random.Random(f"{number}-{code}").randint(10, 95)}'
+        "</span></td>"
+        for code in columns
+    )
+    return (
+        "<tr><td><figure></figure></td><td>"
+        f'<a href="/player/{player["id"]}/player-{number}/{change_id}"'
+        f' aria-label="{player["name"]}"><div>{player["name"]}</div></a>'
+        f'<img title="{player["nationality"]}" /></td>{cells}</tr>'
+    )
+
+
+def list_page(settings: StandInSettings, params: Dict[str, str]) -> Optional[str]:
+    """Return the player table at an offset, or ``None`` past the last player.
+
+    ``showCol[<n>]`` parameters select rating columns instead of the default
+    ones.
+    """
+    offset = int(params.get("offset", 0))
+    change_id = int(params.get("r", CHANGE_IDS[0]))
+    columns = [value for key, value in params.items() if key.startswith("showCol[")]
+    if offset >= settings.players:
+        return None
+    end = min(offset + settings.page_size, settings.players)
+    if columns:
+        rows = "".join(
+            _wide_player_row(number, change_id, columns)
+            for number in range(offset, end)
+        )
+    else:
+        rows = "".join(_player_row(number, change_id) for number in range(offset, end))
+    next_link = ""
+    if end < settings.players:
+        query = "&".join(
+            f"{key}={value}" for key, value in {**params, "offset": end}.items()
+        )
+        next_link = f'<a href="/?{query}">NEXT</a>'
+    return f"<html><body><table><tbody>{rows}</tbody></table>{next_link}</body></html>"
+
+
+def team_league(team_id: int) -> int:
+    """Return the league a team plays in."""
+    return list(LEAGUES)[team_id % len(LEAGUES)]
+
+
+def teams_page(settings: StandInSettings, params: Dict[str, str]) -> Optional[str]:
+    """Return the team table at an offset, or ``None`` past the last team."""
+    offset = int(params.get("offset", 0))
+    if offset >= TEAMS:
+        return None
+    end = min(offset + settings.page_size, TEAMS)
+    rows = "".join(
+        f'<tr><td><figure></figure></td><td><a href="/team/{team_id}/team-{team_id}/">'
+        f'Team {team_id}</a><div class="sub">'
+        f'<a href="/teams?lg={league_id}">{LEAGUES[league_id]}</a>'
+        "</div></td></tr>"
+        for team_id, league_id in (
+            (team_id, team_league(team_id)) for team_id in range(offset + 1, end + 1)
+        )
+    )
+    next_link = ""
+    if end < TEAMS:
+        query = "&".join(
+            f"{key}={value}" for key, value in {**params, "offset": end}.items()
+        )
+        next_link = f'<a href="/teams?{query}">NEXT</a>'
+    return f"<html><body><table><tbody>{rows}</tbody></table>{next_link}</body></html>"
+
+
+def detail_page(player_id: int) -> str:
+    """Return the detail page of a player, with its changes menu."""
+    number = player_id - FIRST_PLAYER_ID
+    player = _player(number)
+    changes = "".join(
+        f'<a href="/player/{player_id}/player-{number}/{change}/">'
+        f"Feb {22 - position:02d}, 2022</a>"
+        for position, change in enumerate(CHANGE_IDS)
+    )
+    quarters = "".join(
+        f'<div class="block-quarter"><h5>{name}</h5><ul>'
+        f"<li><span>{rating}</span><span>{attribute}</span></li></ul></div>"
+        for (name, attribute), rating in zip(QUARTERS, player["ratings"])
+    )
+    return (
+        f'<html><body><div class="bp3-menu">{changes}</div>'
+        f'<div class="info"><h1>{player["name"]}</h1></div>'
+        f'<section><div><span>{player["overall"]}</span></div>'
+        f'<div><span>{player["potential"]}</span></div></section>'
+        f'<div class="col-12"></div><div class="col-12">{quarters}</div>'
+        "</body></html>"
+    )
+
+
+class StandInServer:
+    """Threaded HTTP server serving synthetic SoFIFA pages.
+
+    Use it as a context manager, or call :meth:`start` and :meth:`stop`.
+    """
+
+    def __init__(
+        self, settings: Optional[StandInSettings] = None, port: int = 0
+    ) -> None:
+        self.settings = settings or StandInSettings()
+        self.requests = 0
+        self._random = random.Random(self.settings.seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Return the base URL to point the streams' ``url_base`` at."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def respond(self, target: str) -> Tuple[int, Dict[str, str], str]:
+        """Return the status, headers and body of the response to a request."""
+        settings = self.settings
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            delay = settings.latency + self._random.random() * settings.jitter
+        if delay:
+            time.sleep(delay)
+
+        if roll < settings.throttle_rate:
+            return 429, {"Retry-After": "1"}, "Too Many Requests"
+        roll -= settings.throttle_rate
+        if roll < settings.challenge_rate:
+            return 503, {"cf-mitigated": "challenge"}, CHALLENGE_PAGE
+        roll -= settings.challenge_rate
+        if roll < settings.error_rate:
+            return 500, {}, "Internal Server Error"
+
+        parts = urlsplit(target)
+        params = dict(parse_qsl(parts.query))
+        segments = [segment for segment in parts.path.split("/") if segment]
+        if segments[:1] == ["player"] and len(segments) > 1 and segments[1].isdigit():
+            return 200, {}, detail_page(int(segments[1]))
+        if segments == ["teams"]:
+            return self._table(teams_page(settings, params))
+        if segments:
+            return 404, {}, "Not Found"
+        if params.get("type") == "all":
+            return self._table(list_page(settings, params))
+        return 200, {}, home_page()
+
+    def _table(self, page: Optional[str]) -> Tuple[int, Dict[str, str], str]:
+        if page is not None:
+            return 200, {}, page
+        if self.settings.empty_past_end:
+            return 200, {}, EMPTY_TABLE
+        return 404, {}, "Not Found"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                status, headers, body = server.respond(self.path)
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> "StandInServer":
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="sofifa-stand-in", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def player_ids(count: int) -> List[int]:
+    """Return the IDs of the first players served."""
+    return [FIRST_PLAYER_ID + number for number in range(count)]
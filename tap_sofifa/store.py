@@ -0,0 +1,226 @@
+"""Local SQLite store of the latest state of every player.
+
+Consumers that only need the current state of each player, and the tap's own
+player selection, read it from one file instead of replaying the Singer
+output. Records of ``player_changes`` and of the rating streams are upserted
+into a row per player and change, the stream's record kept as JSON next to
+the columns the store is queried by::
+
+    SELECT player_id, overall_rating, detail_record FROM latest_players
+    WHERE league_id = 13 ORDER BY overall_rating DESC LIMIT 10
+
+Rows are written in batched transactions, and indexed on league, team and
+overall rating.
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from tap_sofifa.index import IndexEntry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player_id INTEGER NOT NULL,
+    change_id INTEGER NOT NULL,
+    league_id INTEGER,
+    team_id INTEGER,
+    overall_rating INTEGER,
+    potential_rating INTEGER,
+    age INTEGER,
+    changes_record TEXT,
+    detail_record TEXT,
+    PRIMARY KEY (player_id, change_id)
+);
+CREATE INDEX IF NOT EXISTS players_league ON players (league_id, change_id);
+CREATE INDEX IF NOT EXISTS players_team ON players (team_id, change_id);
+CREATE INDEX IF NOT EXISTS players_rating ON players (overall_rating);
+CREATE VIEW IF NOT EXISTS latest_players AS
+SELECT players.* FROM players JOIN (
+    SELECT player_id, MAX(change_id) AS change_id FROM players GROUP BY player_id
+) USING (player_id, change_id);
+"""
+
+# Column keeping the records of each stored stream
+RECORD_COLUMNS = {
+    "player_changes": "changes_record",
+    "player_attributes": "detail_record",
+    "player_detail": "detail_record",
+    "player_history": "detail_record",
+}
+
+UPSERT = """
+INSERT INTO players (
+    player_id, change_id, league_id, team_id, overall_rating, potential_rating,
+    age, {column}
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (player_id, change_id) DO UPDATE SET
+    league_id = COALESCE(excluded.league_id, league_id),
+    team_id = COALESCE(excluded.team_id, team_id),
+    overall_rating = COALESCE(excluded.overall_rating, overall_rating),
+    potential_rating = COALESCE(excluded.potential_rating, potential_rating),
+    age = COALESCE(excluded.age, age),
+    {column} = excluded.{column}
+"""
+
+COLUMNS = (
+    "player_id",
+    "change_id",
+    "league_id",
+    "team_id",
+    "overall_rating",
+    "potential_rating",
+    "age",
+    "changes_record",
+    "detail_record",
+)
+
+
+class PlayerStore:
+    """Players per change in a SQLite file, upserted in batches.
+
+    Args:
+        path: Path of the store database.
+        batch_size: Records buffered before they are written in a transaction.
+    """
+
+    def __init__(self, path: Union[str, Path], batch_size: int = 500) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self._connection = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._pending: Dict[str, List[Tuple]] = {}
+        self._buffered = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def stores(stream: str) -> bool:
+        """Whether the records of a stream are stored."""
+        return stream in RECORD_COLUMNS
+
+    def add(self, stream: str, record: dict, league_id: Optional[int] = None) -> None:
+        """Buffer the upsert of a record, writing the batch once it is full.
+
+        Columns the record has no value for keep their stored value. Records
+        without a change ID, from pages of the current change, are skipped.
+        """
+        if record.get("id") is None or record.get("change_id") is None:
+            return
+        team = record.get("team") or {}
+        row = (
+            record["id"],
+            record["change_id"],
+            league_id,
+            team.get("id"),
+            record.get("overall_rating"),
+            record.get("potential_rating"),
+            record.get("age"),
+            json.dumps(record, default=str),
+        )
+        with self._lock:
+            self._pending.setdefault(RECORD_COLUMNS[stream], []).append(row)
+            self._buffered += 1
+            if self._buffered >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records in one transaction."""
+        with self._lock:
+            if not self._buffered:
+                return
+            with self._connection:
+                for column, rows in self._pending.items():
+                    self._connection.executemany(UPSERT.format(column=column), rows)
+            self._pending = {}
+            self._buffered = 0
+
+    def _rows(self, query: str, params: Tuple = ()) -> List[dict]:
+        self.flush()
+        with self._lock:
+            cursor = self._connection.execute(query, params)
+            rows = cursor.fetchall()
+        players = []
+        for row in rows:
+            player = dict(zip(COLUMNS, row))
+            for column in ("changes_record", "detail_record"):
+                if player[column] is not None:
+                    player[column] = json.loads(player[column])
+            players.append(player)
+        return players
+
+    def latest(self, player_id: int) -> Optional[dict]:
+        """Return the row of a player's latest change, if any."""
+        rows = self._rows(
+            f"SELECT {', '.join(COLUMNS)} FROM latest_players WHERE player_id = ?",
+            (player_id,),
+        )
+        return rows[0] if rows else None
+
+    def players(
+        self,
+        league_id: Optional[int] = None,
+        team_id: Optional[int] = None,
+        min_overall_rating: Optional[int] = None,
+    ) -> List[dict]:
+        """Return the latest rows of the players matching the filters given.
+
+        The best rated players come first.
+        """
+        filters, params = [], []
+        for condition, value in (
+            ("league_id = ?", league_id),
+            ("team_id = ?", team_id),
+            ("overall_rating >= ?", min_overall_rating),
+        ):
+            if value is not None:
+                filters.append(condition)
+                params.append(value)
+        where = f" WHERE {' AND '.join(filters)}" if filters else ""
+        return self._rows(
+            f"SELECT {', '.join(COLUMNS)} FROM latest_players{where}"
+            " ORDER BY overall_rating DESC, player_id",
+            tuple(params),
+        )
+
+    def history(self, player_id: int) -> Iterator[IndexEntry]:
+        """Yield the rated changes of a player, latest first.
+
+        Entries are those of :meth:`PlayerIndex.history`, 0 standing for
+        unknown values.
+        """
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT player_id, change_id, team_id, league_id, overall_rating,"
+                " potential_rating, age FROM players"
+                " WHERE player_id = ? AND overall_rating IS NOT NULL"
+                " ORDER BY change_id DESC",
+                (player_id,),
+            ).fetchall()
+        for row in rows:
+            yield IndexEntry(*(value or 0 for value in row))
+
+    def player_ids(self, change_id: int, league_id: Optional[int] = None) -> List[int]:
+        """Return the players of a league in a change, in the order they were stored.
+
+        Without a league, return the players stored from unfiltered runs.
+        """
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT player_id FROM players"
+                " WHERE change_id = ? AND league_id IS ? ORDER BY rowid",
+                (change_id, league_id),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        """Write the buffered records and close the database."""
+        self.flush()
+        self._connection.close()
@@ -4,103 +4,218 @@ import logging
 import re
 import sys
 
+from contextlib import contextmanager
+from itertools import count, islice
 from pathlib import Path
-from typing import Any, Dict, Optional, Union, List, Iterable
+from typing import Any, Dict, Optional, Union, List, Iterable, Iterator
 
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
+from tap_sofifa.archive import page_ids
 from tap_sofifa.client import SoFIFAStream
-from bs4 import BeautifulSoup
+from tap_sofifa.discovery import DiscoveryCache
+from tap_sofifa.index import IndexEntry
+from tap_sofifa.extraction import (
+    Cell,
+    Check,
+    Column,
+    Entries,
+    Field,
+    Group,
+    Select,
+    Spec,
+    child_tags,
+    parse_money,
+    search,
+    segment,
+    snake_case
+)
+from bs4 import BeautifulSoup, SoupStrainer
 from singer_sdk.exceptions import RetriableAPIError, FatalAPIError
-from selenium.common.exceptions import NoSuchElementException
 from datetime import datetime
-from selenium.webdriver.common.by import By
+from urllib.parse import parse_qsl, urljoin, urlsplit
 
 SCHEMAS_DIR = Path(__file__).parent / Path("./schemas")
 
 
+def _parse_change_date(text: str) -> datetime:
+    return datetime.strptime(text, '%b %d, %Y')
+
+
+def _parse_contract(text: str) -> dict:
+    if '~' in text:
+        year_start, year_end = [int(year.strip()) for year in text.split('~')]
+        return {'on_loan': False, 'year_start': year_start, 'year_end': year_end}
+    return {'on_loan': True, 'year_start': None, 'year_end': int(re.findall(r'\d+', text)[1])}
+
+
+def _menu_spec(index: int, missing: str, empty: str, check: Check, **fields: Field) -> Spec:
+    return Spec(
+        Select(class_ = 'bp3-menu', index = index, error = missing),
+        Select('a', at_least = 1, error = empty),
+        fields = {
+            'name': Field(),
+            **fields,
+            'r': Field(attr = 'href', coerce = search(r'(\d+)')),
+            'set': Field(attr = 'href', coerce = search(r'set=([^\d=]*)'))
+        },
+        checks = [check]
+    )
+
+
+# Expected child tags of each column of a player_changes row; column 1 only
+# has to start with these
+PLAYER_CHANGES_COLUMN_TAGS = [
+    ['figure'],
+    ['a', 'img'],
+    [],
+    ['span'],
+    ['span'],
+    ['div'],
+    [],
+    [],
+    ['span']
+]
+
+
+def _column_check(index: int) -> Check:
+    expected = PLAYER_CHANGES_COLUMN_TAGS[index]
+    if index == 1:
+        predicate = lambda cells: child_tags(cells[1])[:len(expected)] == expected
+    else:
+        predicate = lambda cells: child_tags(cells[index]) == expected
+    return Check(predicate, f'Incorrect DOM structure for column {index}')
+
+
+# SoFIFA column codes of the ratings of player_detail, by group
+ATTRIBUTE_COLUMNS = {
+    'attacking': {'crossing': 'cr', 'finishing': 'fi', 'heading_accuracy': 'he', 'short_passing': 'sh', 'volleys': 'vo'},
+    'skill': {'dribbling': 'dr', 'curve': 'cu', 'fk_accuracy': 'fr', 'long_passing': 'lo', 'ball_control': 'bl'},
+    'movement': {'acceleration': 'ac', 'sprint_speed': 'sp', 'agility': 'ag', 'reactions': 're', 'balance': 'ba'},
+    'power': {'shot_power': 'so', 'jumping': 'ju', 'stamina': 'st', 'strength': 'sr', 'long_shots': 'ln'},
+    'mentality': {'aggression': 'ar', 'interceptions': 'in', 'positioning': 'po', 'vision': 'vi', 'penalties': 'pe', 'composure': 'cm'},
+    'defending': {'defensive_awareness': 'ma', 'standing_tackle': 'sa', 'sliding_tackle': 'sl'},
+    'goalkeeping': {'gk_diving': 'gd', 'gk_handling': 'gh', 'gk_kicking': 'gc', 'gk_positioning': 'gp', 'gk_reflexes': 'gr'}
+}
+
+
+def _rating_column(code: str) -> Field:
+    return Field(Column(code), coerce = search(r'(\d+)', int))
+
+
+def _latest_change_fingerprint(stream: SoFIFAStream, context: Optional[dict], source: Optional[str] = None) -> Optional[str]:
+    """Fingerprint the pages of a stream by the latest change published.
+
+    Streams pinned to a change never change; the others change only when
+    SoFIFA publishes a new one, which shows up first in the changes menu.
+    ``source`` identifies the pages, the stream's first URL by default.
+    """
+    source = source or stream.get_url(context)
+    if 'change_id' in stream.config:
+        return source
+    home = stream._fetch_page(stream.url_base)
+    latest = ChangesStream.extractor.extract(home)[0]['r']
+    return f'{source}#r={latest}'
+
+
+@contextmanager
+def _companion_stream(stream: SoFIFAStream, stream_class: type) -> Iterator[SoFIFAStream]:
+    """Provide the tap's stream of a class, or a new one reading the same site.
+
+    The transport of a new stream is closed on exit.
+    """
+    companion = stream._tap.streams.get(stream_class.name)
+    if companion is not None:
+        yield companion
+        return
+    companion = stream_class(tap = stream._tap)
+    companion.url_base = stream.url_base
+    try:
+        yield companion
+    finally:
+        companion.close_transport()
+
+
 class VersionsStream(SoFIFAStream):
     """Define custom stream."""
     name = "versions"
     path = ''
     schema_filepath = SCHEMAS_DIR / "versions.json"
-    
-    def validate_response(self, response: BeautifulSoup) -> None:
-        menus = response.find_all(class_ = 'bp3-menu')
-        if len(menus) < 2:
-            raise RetriableAPIError('Cannot find FIFA versions menu in page source')
-        
-        links = menus[1].find_all('a')
-        if len(links) == 0:
-            raise RetriableAPIError('Fifa versions menu dropdown contains no options')
-        
-        if 'FIFA' not in links[0].get_text():
-            raise RetriableAPIError('Wrong menu in page source selected')
-        
-    def parse_response(self, response: BeautifulSoup) -> Iterable[dict]:
-        menu = response.find_all(class_ = 'bp3-menu')
-        links = menu[1].find_all('a')
-        for link in links:
-            yield {
-                'name': link.get_text(),
-                'r': re.findall(r'\d+', link['href'])[0],
-                'set': re.findall(r'set=\D*', link['href'])[0].split('=')[1]
-            }
+    conditional_requests = True
+    extractor = _menu_spec(
+        1,
+        'Cannot find FIFA versions menu in page source',
+        'Fifa versions menu dropdown contains no options',
+        Check(lambda link: 'FIFA' in link.get_text(), 'Wrong menu in page source selected')
+    ).compile()
 
 class ChangesStream(SoFIFAStream):
     name = 'changes'
     path = ''
     schema_filepath = SCHEMAS_DIR / "changes.json"
+    reparsable = False
+    conditional_requests = True
+    extractor = _menu_spec(
+        2,
+        'Cannot find changes menu in page source',
+        'Changes menu dropdown contains no options',
+        Check(lambda link: _parse_change_date(link.get_text()), 'Wrong menu in page source selected'),
+        timestamp = Field(coerce = lambda text: _parse_change_date(text).isoformat())
+    ).compile()
 
-    def validate_response(self, response: BeautifulSoup) -> None:
-        menus = response.find_all(class_ = 'bp3-menu')
-        if len(menus) < 3:
-            raise RetriableAPIError('Cannot find changes menu in page source')
-        
-        links = menus[2].find_all('a')
-        if len(links) == 0:
-            raise RetriableAPIError('Changes menu dropdown contains no options')
-        
-        try:
-            datetime.strptime(links[0].get_text(), '%b %d, %Y')
-        except:
-            raise RetriableAPIError('Wrong menu in page source selected')
-
-    
     def _request(
         self, url: str, context: Optional[dict]
     ) -> BeautifulSoup:
-        self.driver.set_page_load_timeout(self.timeout)
-        self.driver.get(url)
-        
-        self.driver.find_element(by=By.PARTIAL_LINK_TEXT, value='FIFA').click()
-        
+        response = self._fetch_page(url)
+
         game_name = ''.join(['FIFA ', str(self.config['game_year'])])
-        try:
-            self.driver.find_element(by=By.LINK_TEXT, value=game_name).click()
-        except NoSuchElementException:
+        links = [link for link in response.find_all('a') if link.get_text(strip = True) == game_name]
+        if not links:
             raise FatalAPIError(f'{game_name} does not exist in SoFIFA database')
 
-        response = BeautifulSoup(self.driver.page_source, 'html.parser')
+        # Selecting the game in the versions menu navigates to its href
+        if links[0].get('href'):
+            response = self._fetch_page(urljoin(url, links[0]['href']))
+
         self.validate_response(response)
         logging.debug("Response received successfully.")
         return response
-    
-    def parse_response(self, response: BeautifulSoup) -> Iterable[dict]:
-        menu = response.find_all(class_ = 'bp3-menu')
-        links = menu[2].find_all('a')
-        for link in links:
-            yield {
-                'name': link.get_text(),
-                'timestamp': datetime.strptime(link.get_text(), '%b %d, %Y').isoformat(),
-                'r': re.findall(r'\d+', link['href'])[0],
-                'set': re.findall(r'set=\D*', link['href'])[0].split('=')[1]
-            }
 
-class PlayerChangesStream(SoFIFAStream):
-    name = 'player_changes'
+class PlayerListStream(SoFIFAStream):
+    """Base class of the streams reading the paginated player tables."""
     path = ''
-    schema_filepath = SCHEMAS_DIR / "player_changes.json"
+    # Only the player table and the pagination links are parsed
+    page_strainer = SoupStrainer(['tbody', 'a'])
+    stream_records = True
+    open_ended_pages = True
+    # Players listed per page, the step of the offset parameter
+    page_size = 60
+
+    _league_ids: Optional[List[int]] = None
+
+    def forget_run(self) -> None:
+        super().forget_run()
+        self._league_ids = None
+
+    @property
+    def partitions(self) -> Optional[List[dict]]:
+        """One partition per league of ``league_ids``, the weightiest first.
+
+        With ``discover_leagues`` and no ``league_ids``, the leagues are those
+        of the ``leagues`` stream.
+        """
+        league_ids = self.config.get('league_ids')
+        if not league_ids and self.config.get('discover_leagues') and 'league_id' not in self.config:
+            if self._league_ids is None:
+                with _companion_stream(self, LeaguesStream) as leagues:
+                    self._league_ids = [league['id'] for league in leagues.get_records(None)]
+            league_ids = self._league_ids
+        if not league_ids:
+            return None
+        priorities = getattr(self._tap, 'priorities', None)
+        if priorities is not None:
+            league_ids = priorities.order(league_ids, priorities.league_weight)
+        return [{'league_id': league_id} for league_id in league_ids]
 
     def get_url_params(self, context: Optional[dict]):
         params = {
@@ -108,107 +223,291 @@ class PlayerChangesStream(SoFIFAStream):
             'set': 'true'   
         }
 
-        if 'league_id' in self.config:
-            params['lg%5B0%5D'] = str(self.config['league_id'])
+        league_id = self.get_league_id(context)
+        if league_id is not None:
+            params['lg%5B0%5D'] = str(league_id)
 
         if 'change_id' in self.config:
             params['r'] = str(self.config['change_id'])
         
         return params
 
-    def validate_response(self, response: BeautifulSoup) -> None:
-        tbody = response.find('tbody')
-        if not tbody:
-            raise RetriableAPIError('SoFIFA data not available')
+    def get_source_fingerprint(self, context: Optional[dict]) -> Optional[str]:
+        return _latest_change_fingerprint(self, context)
 
-        first_row = tbody.find('tr')
-        if not first_row:
-            raise RetriableAPIError('SoFIFA data not available')
-        
-        columns = first_row.find_all('td')
-        if len(columns) != 9:
-            raise RetriableAPIError('Incorrect data format')
-        
-        tags = [
-            ['figure'],
-            ['a', 'img'],
-            [],
-            ['span'],
-            ['span'],
-            ['div'],
-            [],
-            [],
-            ['span']
-        ]
+    def get_page_urls(self, context: Optional[dict]) -> Optional[Iterable[str]]:
+        if (self.config.get('max_workers') or 1) <= 1:
+            return None
+        url = self.get_url(context)
+        return (f'{url}&offset={page * self.page_size}' for page in count())
 
-        for index, column in enumerate(columns):
-            if index == 1:
-                continue
-            if [tag.name for tag in column if tag.name is not None] != tags[index]:
-                raise RetriableAPIError(f'Incorrect DOM structure for column {index}')
-        
-        if [tag.name for tag in columns[1] if tag.name is not None][:2] != tags[1]:
-            raise RetriableAPIError(f'Incorrect DOM structure for column 1')
+    def page_in_partition(self, url: str, context: Optional[dict]) -> bool:
+        league_id = dict(parse_qsl(urlsplit(url).query)).get('lg[0]')
+        return (int(league_id) if league_id else None) == self.get_league_id(context)
 
+    def is_past_last_page(self, response: BeautifulSoup) -> bool:
+        # SoFIFA serves an empty table past the last page
+        table = response.find('tbody')
+        return table is not None and table.find('tr') is None
 
+    def get_next_page_url(self, response: BeautifulSoup) -> Optional[str]:
+        for link in response.find_all('a', href = True):
+            if link.get_text(strip = True) == 'NEXT':
+                return urljoin(self.url_base, link['href'])
+        return None
 
-    def has_next_page(self) -> bool:
-        try:
-            self.driver.find_element(by=By.LINK_TEXT, value='NEXT')
-            return True
-        except:
-            return False
-    
-    def go_to_next_page(self) -> None:
-        self.driver.find_element(by=By.LINK_TEXT, value='NEXT').click()
-
-    def parse_response(self, response: BeautifulSoup) -> Iterable[dict]:
-        tbody = response.find_all('tbody')[0]
-        rows = tbody.find_all('tr')
-
-        for row in rows:
-            columns = row.find_all('td')
-            name_col_tags = columns[1].findChildren()
-            team_col_tags = columns[5].findChild().findChildren()
-            contract_text = team_col_tags[3].get_text()
-
-            contract_years = None
-            on_loan = False
-            if '~' in contract_text:
-                contract_years = [int(year.strip()) for year in contract_text.split('~')]
-            else:
-                on_loan = True
-                contract_years = [None, int(re.findall(r'\d+', contract_text)[1])]
-            yield {
-                'id': int(name_col_tags[0]['href'].split('/')[2]),
-                'change_id': int(name_col_tags[0]['href'].split('/')[4]),
-                'name': name_col_tags[0]['aria-label'],
-                'nationality': name_col_tags[2]['title'],
-                'positions': [a_tag.get_text() for a_tag in name_col_tags[3:] if a_tag.name == 'a'],
-                'age': int(columns[2].get_text()),
-                'overall_rating': int(columns[3].get_text()),
-                'potential_rating': int(columns[4].get_text()),
-                'team': {
-                    'id': int(team_col_tags[2]['href'].split('/')[2]),
-                    'name': team_col_tags[2].get_text()
-                },
-                'contract': {
-                    'on_loan': on_loan,
-                    'year_start': contract_years[0],
-                    'year_end': contract_years[1]
-                },
-                'value': columns[6].get_text(),
-                'wage': columns[7].get_text(),
-                'total': int(columns[8].get_text())
+class PlayerChangesStream(PlayerListStream):
+    name = 'player_changes'
+    schema_filepath = SCHEMAS_DIR / "player_changes.json"
+    extractor = Spec(
+        Select('tbody', index = 0, error = 'SoFIFA data not available'),
+        Select('tr', at_least = 1, error = 'SoFIFA data not available'),
+        cells = Select('td', at_least = 9, at_most = 9, recursive = False, error = 'Incorrect data format'),
+        fields = {
+            'id': Field(Cell(1), Select('a', index = 0), attr = 'href', coerce = segment(2, int)),
+            'change_id': Field(Cell(1), Select('a', index = 0), attr = 'href', coerce = segment(4, int)),
+            'name': Field(Cell(1), Select('a', index = 0), attr = 'aria-label'),
+            'nationality': Field(Cell(1), Select('img', index = 0), attr = 'title'),
+            'positions': Field(Cell(1), Select('a', skip = 1, recursive = False), many = True),
+            'age': Field(Cell(2), coerce = int),
+            'overall_rating': Field(Cell(3), coerce = int),
+            'potential_rating': Field(Cell(4), coerce = int),
+            'team': Group(Cell(5), Select('div', index = 0), Select('a', index = 0), fields = {
+                'id': Field(attr = 'href', coerce = segment(2, int)),
+                'name': Field()
+            }),
+            'contract': Field(Cell(5), Select('div', index = 0), Select('div', index = 0), coerce = _parse_contract),
+            'value': Field(Cell(6)),
+            'wage': Field(Cell(7)),
+            'total': Field(Cell(8), coerce = int)
+        },
+        checks = [_column_check(index) for index in [0, 2, 3, 4, 5, 6, 7, 8, 1]]
+    ).compile()
+
+    # Properties parsed from others once a page is extracted
+    derived_properties = {
+        'currency': {'value', 'wage'},
+        'value_eur': {'value'},
+        'wage_eur': {'wage'}
+    }
+
+    @property
+    def selected_properties(self):
+        selected = super().selected_properties
+        if selected is None:
+            return None
+        for name, sources in self.derived_properties.items():
+            if name in selected:
+                selected |= sources
+        if getattr(self._tap, 'player_index', None) is not None or getattr(self._tap, 'player_store', None) is not None:
+            # The index and store are built from these whether they are emitted or not
+            selected |= {'id', 'change_id', 'team', 'overall_rating', 'potential_rating', 'age'}
+        return selected
+
+    def process_records(self, records: Iterable[dict]) -> Iterable[dict]:
+        # Amounts are parsed a page-sized batch at a time, keeping streamed
+        # pages streamed
+        rows = iter(records)
+        while True:
+            batch = list(islice(rows, self.page_size))
+            if not batch:
+                return
+            values = parse_money([row.get('value', '') for row in batch])
+            wages = parse_money([row.get('wage', '') for row in batch])
+            for row, (value_currency, value), (wage_currency, wage) in zip(batch, values, wages):
+                currency = value_currency or wage_currency
+                row['currency'] = currency
+                row['value_eur'] = value if value_currency == 'EUR' else None
+                row['wage_eur'] = wage if wage_currency == 'EUR' else None
+                yield row
+
+    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
+        index = getattr(self._tap, 'player_index', None)
+        if index is not None:
+            index.add(IndexEntry.from_record(row, self.get_league_id(context)))
+        return row
+
+class TeamsStream(PlayerListStream):
+    """Teams of a change and their leagues, read from the team tables.
+
+    Teams only change with a new change, so with ``discovery_cache`` set the
+    teams of a change are fetched once and read from the cache afterwards.
+    The tables are never filtered by league: every team of the change is
+    listed.
+    """
+    name = 'teams'
+    path = 'teams'
+    schema_filepath = SCHEMAS_DIR / "teams.json"
+    selected_by_default = False
+    extractor = Spec(
+        Select('tbody', index = 0, error = 'SoFIFA data not available'),
+        Select('tr', at_least = 1, error = 'SoFIFA data not available'),
+        cells = Select('td', at_least = 2, recursive = False, error = 'Incorrect data format'),
+        fields = {
+            'id': Field(Cell(1), Select('a', index = 0), attr = 'href', coerce = segment(2, int)),
+            'name': Field(Cell(1), Select('a', index = 0)),
+            'league_id': Field(
+                Cell(1),
+                Select('a', index = 1, error = 'Cannot find league of team'),
+                attr = 'href',
+                coerce = search(r'lg(?:%5B\d*%5D|\[\d*\])?=(\d+)', int)
+            ),
+            'league': Field(Cell(1), Select('a', index = 1))
+        }
+    ).compile()
+
+    _change_id: Optional[int] = None
+
+    def forget_run(self) -> None:
+        super().forget_run()
+        self._change_id = None
+
+    @property
+    def partitions(self) -> Optional[List[dict]]:
+        return None
+
+    @property
+    def discovery_cache(self) -> Optional[DiscoveryCache]:
+        path = self.config.get('discovery_cache')
+        return DiscoveryCache(path) if path else None
+
+    def get_change_id(self) -> int:
+        """Return ``change_id``, or the latest change in the changes menu."""
+        if 'change_id' in self.config:
+            return self.config['change_id']
+        if self._change_id is None:
+            home = self._fetch_page(self.url_base)
+            self._change_id = int(ChangesStream.extractor.extract(home)[0]['r'])
+        return self._change_id
+
+    def get_league_id(self, context: Optional[dict]) -> Optional[int]:
+        return None
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        cache = self.discovery_cache
+        if cache is None:
+            yield from super().request_records(context)
+            return
+
+        change_id = self.get_change_id()
+        cached = cache.get(self.name, change_id)
+        if cached is not None:
+            self.logger.info(f'Reading {self.name} of change {change_id} from the discovery cache')
+            yield from cached
+            return
+
+        records = []
+        for record in super().request_records(context):
+            records.append(record)
+            yield record
+        state = self.get_context_state(context)
+        # Runs stopped at max_runtime leave a partial table
+        if records and 'resume' not in state and 'progress' not in state:
+            cache.put(self.name, change_id, records)
+
+    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
+        row['change_id'] = self.get_change_id()
+        return row
+
+class LeaguesStream(SoFIFAStream):
+    """Leagues of a change, in the order their first team is listed.
+
+    The league filter of SoFIFA is rendered by scripts, so the leagues are
+    read from the league links of the ``teams`` stream instead, and cached
+    with it.
+    """
+    name = 'leagues'
+    path = 'teams'
+    schema_filepath = SCHEMAS_DIR / "leagues.json"
+    selected_by_default = False
+    reparsable = False
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        leagues: Dict[int, dict] = {}
+        with _companion_stream(self, TeamsStream) as teams:
+            for team in teams.get_records(None):
+                leagues.setdefault(team['league_id'], {
+                    'id': team['league_id'],
+                    'name': team['league'],
+                    'change_id': team['change_id']
+                })
+        yield from leagues.values()
+
+class PlayerAttributesStream(PlayerListStream):
+    """Ratings of player_detail read from the player tables, 60 players a page.
+
+    The tables are requested with a column for every selected rating, so one
+    page replaces the detail pages of all the players it lists.
+    """
+    name = 'player_attributes'
+    schema_filepath = SCHEMAS_DIR / "player_detail.json"
+    selected_by_default = False
+    extractor = Spec(
+        Select('tbody', index = 0, error = 'SoFIFA data not available'),
+        Select('tr', at_least = 1, error = 'SoFIFA data not available'),
+        cells = Select('td', at_least = 4, recursive = False, error = 'Incorrect data format'),
+        fields = {
+            'id': Field(Cell(1), Select('a', index = 0), attr = 'href', coerce = segment(2, int)),
+            'change_id': Field(Cell(1), Select('a', index = 0), attr = 'href', coerce = segment(4, int)),
+            'name': Field(Cell(1), Select('a', index = 0), attr = 'aria-label'),
+            'overall_rating': _rating_column('oa'),
+            'potential_rating': _rating_column('pt'),
+            **{
+                group: Group(fields = {name: _rating_column(code) for name, code in columns.items()})
+                for group, columns in ATTRIBUTE_COLUMNS.items()
             }
+        },
+        checks = [_column_check(0), _column_check(1)]
+    ).compile()
+
+    def get_url_params(self, context: Optional[dict]):
+        params = super().get_url_params(context)
+        selected = self.selected_properties
+        codes = ['oa', 'pt'] + [
+            code
+            for group, columns in ATTRIBUTE_COLUMNS.items() if selected is None or group in selected
+            for code in columns.values()
+        ]
+        for position, code in enumerate(codes):
+            params[f'showCol%5B{position}%5D'] = code
+        return params
 
 class PlayerDetailStream(SoFIFAStream):
     name = 'player_detail'
     schema_filepath = SCHEMAS_DIR / "player_detail.json"
+    extractor = Spec(
+        fields = {
+            'name': Field(
+                Select(class_ = 'info', index = 0, error = 'Cannot find name container in page source'),
+                Select('h1', index = 0, error = 'Cannot find name in page source')
+            ),
+            'overall_rating': Field(
+                Select('section', index = 0, error = 'Cannot find average ratings section in page source'),
+                Select('span', index = 0, at_least = 2, at_most = 2, error = 'Cannot find average ratings in page source'),
+                coerce = int
+            ),
+            'potential_rating': Field(Select('section', index = 0), Select('span', index = 1), coerce = int),
+            'quarters': Entries(
+                Select(class_ = 'col-12', index = 1, error = 'Cannot find container which contains in-depth ratings in page source'),
+                Select(class_ = 'block-quarter', at_least = 8, at_most = 8, limit = 7, error = 'Cannot find sub-rating block quarters in page source'),
+                key = Field(Select('h5', index = 0), coerce = str.lower),
+                value = Entries(
+                    Select('li'),
+                    key = Field(Select(index = 1), coerce = snake_case),
+                    value = Field(Select(index = 0), coerce = int)
+                ),
+                merge = True
+            )
+        },
+        indexed = True
+    ).compile()
 
     @property
     def path(self):
         return f'player/{self.config["player_id"]}'
+
+    def get_player_url(self, player_id: int, context: Optional[dict]) -> str:
+        return self.get_url(context, f'player/{player_id}')
     
     def get_url_params(self, context: Optional[dict]):
         params = {
@@ -219,46 +518,129 @@ class PlayerDetailStream(SoFIFAStream):
         
         return params
     
-    def parse_response(self, response: BeautifulSoup) -> Iterable[dict]:
-        result = dict()
-        result['id'] = self.config['player_id']
-        result['change_id'] = self.config['change_id']
-        result['name'] = response.find(class_ = 'info').find('h1').get_text()
-
-        average_ratings = [int(tag.get_text()) for tag in response.find('section').find_all('span')]
-        result['overall_rating'] = average_ratings[0]
-        result['potential_rating'] = average_ratings[1]
-        
-        quarters = response.find_all(class_='col-12')[1].find_all(class_='block-quarter')
-        for index in range(7):
-            quarter = quarters[index]
-            quarter_ratings = dict()
-            for li in quarter.find_all('li'):
-                children = li.findChildren()
-                quarter_ratings[children[1].get_text().lower().replace(' ', '_')] = int(children[0].get_text())
-            result[quarter.find('h5').get_text().lower()] = quarter_ratings
-
-        yield result
-
-    def validate_response(self, response: BeautifulSoup) -> None:
-        if not response.find(class_ = 'info'):
-            raise RetriableAPIError('Cannot find name container in page source')
-
-        if not response.find(class_ = 'info').find('h1'):
-            raise RetriableAPIError('Cannot find name in page source')
-        
-        if not response.find('section'):
-            raise RetriableAPIError('Cannot find average ratings section in page source')
+    def get_player_ids(self) -> Optional[List[int]]:
+        """Return the players given by ``player_ids`` or selected from the player index or store.
+
+        Players are ordered by their ``priority``, the weightiest first.
+        """
+        player_ids = self.config.get('player_ids')
+        index = getattr(self._tap, 'player_index', None) or getattr(self._tap, 'player_store', None)
+        if player_ids is None and index is not None and 'player_id' not in self.config and 'change_id' in self.config:
+            player_ids = index.player_ids(self.config['change_id'], self.config.get('league_id'))
+        priorities = getattr(self._tap, 'priorities', None)
+        if player_ids is not None and priorities is not None:
+            player_ids = priorities.order(player_ids, priorities.player_weight)
+        return player_ids
+
+    def get_page_urls(self, context: Optional[dict]) -> Optional[Iterable[str]]:
+        player_ids = self.get_player_ids()
+        if player_ids is None:
+            return None
+        return [self.get_player_url(player_id, context) for player_id in player_ids]
+
+    def get_source_fingerprint(self, context: Optional[dict]) -> Optional[str]:
+        if 'change_id' in self.config:
+            # Player pages of a change are still corrected after it is published,
+            # so the URLs of a pinned change do not tell whether they changed
+            return None
+        urls = self.get_page_urls(context)
+        return _latest_change_fingerprint(self, context, urls and ' '.join(urls))
+
+    def get_page_keys(self, url: str) -> dict:
+        player_id, change_id = page_ids(url)
+        return {
+            'id': player_id,
+            'change_id': change_id
+        }
 
-        if len(response.find('section').find_all('span')) != 2:
-            raise RetriableAPIError('Cannot find average ratings in page source')
-        
-        if len(response.find_all(class_ = 'col-12')) < 2:
-            raise RetriableAPIError('Cannot find container which contains in-depth ratings in page source')
+class PlayerHistoryStream(PlayerDetailStream):
+    """Ratings of players in every change listed on their pages.
+
+    Each player is a partition: their page is loaded once to read the changes
+    in its change selector, then the page of every change not synced yet is
+    fetched, concurrently with ``max_workers``. Changes are emitted oldest
+    first and the latest one emitted is kept in the partition state as
+    ``change_id``, the changes up to it being synced.
+    """
+    name = 'player_history'
+    schema_filepath = SCHEMAS_DIR / "player_history.json"
+    selected_by_default = False
+
+    _timestamps: Optional[Dict[int, Optional[str]]] = None
+
+    def forget_run(self) -> None:
+        super().forget_run()
+        self._timestamps = None
+
+    @property
+    def partitions(self) -> List[dict]:
+        player_ids = self.get_player_ids() or [self.config.get('player_id')]
+        return [{'player_id': player_id} for player_id in player_ids if player_id is not None]
+
+    def get_url_params(self, context: Optional[dict]):
+        params = {
+            'set': 'true'
+        }
+        if context and 'change_id' in context:
+            params['r'] = str(context['change_id'])
+        return params
+
+    def get_player_changes(self, player_id: int) -> List[int]:
+        """Return the changes in the change selector of a player's page, latest first."""
+        page = self._fetch_page(self.get_url({}, f'player/{player_id}'))
+        changes: Dict[int, Optional[str]] = {}
+        for link in page.select('.bp3-menu a[href]'):
+            match = re.search(r'/player/(\d+)/[^/]+/(\d+)', link['href'])
+            if match is None or int(match.group(1)) != player_id:
+                continue
+            try:
+                timestamp = _parse_change_date(link.get_text(strip = True)).isoformat()
+            except ValueError:
+                timestamp = None
+            changes.setdefault(int(match.group(2)), timestamp)
+        if not changes:
+            raise RetriableAPIError('Cannot find player changes menu in page source')
+
+        timestamps = self.get_change_timestamps()
+        for change_id, timestamp in changes.items():
+            timestamps.setdefault(change_id, timestamp)
+        return list(changes)
+
+    def get_change_timestamps(self) -> Dict[int, Optional[str]]:
+        """Return the timestamps of changes, starting from the changes menu."""
+        if self._timestamps is None:
+            home = self._fetch_page(self.url_base)
+            self._timestamps = {
+                int(change['r']): change['timestamp']
+                for change in ChangesStream.extractor.extract(home)
+            }
+        return self._timestamps
+
+    def get_page_urls(self, context: Optional[dict]) -> Optional[Iterable[str]]:
+        if not context:
+            # No player to read the history of
+            return []
+        player_id = context['player_id']
+        synced = self.get_context_state(context).get('change_id', 0)
+        return [
+            self.get_url({'change_id': change_id}, f'player/{player_id}')
+            for change_id in sorted(self.get_player_changes(player_id))
+            if change_id > synced
+        ]
+
+    def get_source_fingerprint(self, context: Optional[dict]) -> Optional[str]:
+        return None
 
-        if len(response.find_all(class_='col-12')[1].find_all(class_='block-quarter')) != 8:
-            raise RetriableAPIError('Cannot find sub-rating block quarters in page source')
+    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
+        row['timestamp'] = self.get_change_timestamps().get(row['change_id'])
+        return row
 
+    def get_records(self, context: Optional[dict]) -> Iterable[Dict[str, Any]]:
+        state = self.get_context_state(context)
+        for record in super().get_records(context):
+            yield record
+            # Bookmarked once the record has been emitted
+            state['change_id'] = record['change_id']
 
 
 
@@ -1,6 +1,9 @@
 """SoFIFA tap class."""
 
-from typing import List
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import List, Optional
 
 from singer_sdk import Tap, Stream
 from singer_sdk import typing as th  # JSON schema typing helpers
@@ -9,15 +12,30 @@ from tap_sofifa.streams import (
     VersionsStream,
     ChangesStream,
     PlayerChangesStream,
-    PlayerDetailStream
+    PlayerAttributesStream,
+    PlayerDetailStream,
+    PlayerHistoryStream,
+    TeamsStream,
+    LeaguesStream
 )
+from tap_sofifa.index import PlayerIndex
+from tap_sofifa.pipeline import OutputPipeline
+from tap_sofifa.priority import Priorities
+from tap_sofifa.profiling import PROFILERS, Profiler
+from tap_sofifa.store import PlayerStore
+from tap_sofifa.transport import HedgeBudget, PageMemo
+from tap_sofifa.workqueue import WorkQueue
 # TODO: Compile a list of custom stream types here
 #       OR rewrite discover_streams() below with your custom logic.
 STREAM_TYPES = {
     'versions': VersionsStream,
     'changes': ChangesStream,
     'player_changes': PlayerChangesStream,
-    'player_detail': PlayerDetailStream
+    'player_attributes': PlayerAttributesStream,
+    'player_detail': PlayerDetailStream,
+    'player_history': PlayerHistoryStream,
+    'teams': TeamsStream,
+    'leagues': LeaguesStream
 }
 
 
@@ -35,6 +53,18 @@ class TapSoFIFA(Tap):
             'league_id': {
                 'type': 'integer'
             },
+            'league_ids': {
+                'type': 'array',
+                'items': {
+                    'type': 'integer'
+                }
+            },
+            'discover_leagues': {
+                'type': 'boolean'
+            },
+            'discovery_cache': {
+                'type': 'string'
+            },
             'change_id': {
                 'type': 'integer'
             },
@@ -43,13 +73,289 @@ class TapSoFIFA(Tap):
             },
             '_stream': {
                 'type': 'string'
+            },
+            'transport': {
+                'type': 'string',
+                'enum': ['selenium', 'http']
+            },
+            'archive_path': {
+                'type': 'string'
+            },
+            'archive_mode': {
+                'type': 'string',
+                'enum': ['record', 'replay', 'reparse']
+            },
+            'reparse_workers': {
+                'type': 'integer'
+            },
+            'skip_unchanged': {
+                'type': 'boolean'
+            },
+            'replay_latency': {
+                'type': 'number'
+            },
+            'profile': {
+                'type': 'string',
+                'enum': list(PROFILERS)
+            },
+            'profile_dir': {
+                'type': 'string'
+            },
+            'player_ids': {
+                'type': 'array',
+                'items': {
+                    'type': 'integer'
+                }
+            },
+            'max_tries': {
+                'type': 'integer'
+            },
+            'max_workers': {
+                'type': 'integer'
+            },
+            'max_buffered_pages': {
+                'type': 'integer'
+            },
+            'player_index_path': {
+                'type': 'string'
+            },
+            'player_store_path': {
+                'type': 'string'
+            },
+            'store_batch_size': {
+                'type': 'integer'
+            },
+            'page_memo_size': {
+                'type': 'integer'
+            },
+            'max_queued_messages': {
+                'type': 'integer'
+            },
+            'spill_dir': {
+                'type': 'string'
+            },
+            'max_spilled_messages': {
+                'type': 'integer'
+            },
+            'metrics_interval': {
+                'type': 'number'
+            },
+            'hedge_percentile': {
+                'type': 'number'
+            },
+            'hedge_ratio': {
+                'type': 'number'
+            },
+            'max_hedges': {
+                'type': 'integer'
+            },
+            'work_queue': {
+                'type': 'string'
+            },
+            'lease_seconds': {
+                'type': 'number'
+            },
+            'queue_timeout': {
+                'type': 'number'
+            },
+            'max_runtime': {
+                'type': 'number'
+            },
+            'priority': {
+                'type': 'object',
+                'properties': {
+                    'leagues': {
+                        'type': 'object',
+                        'additionalProperties': {'type': 'number'}
+                    },
+                    'players': {
+                        'type': 'object',
+                        'additionalProperties': {'type': 'number'}
+                    },
+                    'changed_players': {
+                        'type': 'number'
+                    }
+                }
             }
         }
     }
 
+    _profiler: Optional[Profiler] = None
+    _player_index: Optional[PlayerIndex] = None
+    _player_store: Optional[PlayerStore] = None
+    _page_memo: Optional[PageMemo] = None
+    _hedge_budget: Optional[HedgeBudget] = None
+    _work_queue: Optional[WorkQueue] = None
+    _deadline: Optional[float] = None
+    _priorities: Optional[Priorities] = None
+    pipeline: Optional[OutputPipeline] = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._start_clock()
+
+    @property
+    def profiler(self) -> Optional[Profiler]:
+        """Return the profiler selected by the ``profile`` setting, if any.
+
+        Profiles are written to ``profile_dir`` (the working directory by
+        default) once the sync finishes, see :meth:`write_profile`.
+        """
+        if self._profiler is None and self.config.get('profile'):
+            self._profiler = PROFILERS[self.config['profile']](self.config.get('profile_dir', '.'))
+        return self._profiler
+
+    @property
+    def page_memo(self) -> Optional[PageMemo]:
+        """Return the pages fetched in this run, kept for the other streams.
+
+        ``page_memo_size`` pages are kept (32 by default); 0 disables it.
+        """
+        size = self.config.get('page_memo_size', 32)
+        if self._page_memo is None and size:
+            self._page_memo = PageMemo(size)
+        return self._page_memo
+
+    @property
+    def hedge_budget(self) -> HedgeBudget:
+        """Return the cap on hedged requests shared by the streams.
+
+        At most ``hedge_ratio`` of the requests (5% by default) are hedged,
+        with at most ``max_hedges`` (2 by default) hedges running at once.
+        """
+        if self._hedge_budget is None:
+            self._hedge_budget = HedgeBudget(self.config.get('hedge_ratio', 0.05), self.config.get('max_hedges', 2))
+        return self._hedge_budget
+
+    @property
+    def player_index(self) -> Optional[PlayerIndex]:
+        """Return the index at ``player_index_path``, if set.
+
+        ``player_changes`` adds every player it extracts to the index, and
+        ``player_detail`` selects its players from it when given a
+        ``change_id`` (and optionally a ``league_id``) but no player.
+        """
+        if self._player_index is None and self.config.get('player_index_path'):
+            self._player_index = PlayerIndex(self.config['player_index_path'])
+        return self._player_index
+
+    @property
+    def player_store(self) -> Optional[PlayerStore]:
+        """Return the store at ``player_store_path``, if set.
+
+        Records of the player streams are upserted into it, per player and
+        change, in transactions of ``store_batch_size`` records (500 by
+        default). Without a ``player_index_path``, ``player_detail`` selects
+        its players and ``priority`` finds changed players from the store.
+        """
+        if self._player_store is None and self.config.get('player_store_path'):
+            self._player_store = PlayerStore(self.config['player_store_path'], self.config.get('store_batch_size', 500))
+        return self._player_store
+
+    def reconfigure(self, config: dict, state: Optional[dict] = None) -> None:
+        """Take the settings and state of another run, keeping the streams.
+
+        The service runs its jobs on warm taps this way, rather than creating
+        new streams, and launching their browsers, for every job. The streams
+        keep their transports and the tap its index and store; whatever else
+        the previous run cached is dropped.
+        """
+        self._config = dict(config)
+        if self._work_queue is not None:
+            self._work_queue.close()
+        self._profiler = self._page_memo = self._hedge_budget = None
+        self._work_queue = self._priorities = None
+        self._deadline = None
+        self.state.clear()
+        self.load_state(state or {})
+        for stream in self.streams.values():
+            stream._config = dict(config)
+            stream.forget_run()
+
+    def write_profile(self) -> None:
+        """Write the profile of the run, if profiled."""
+        if self._profiler is not None:
+            for path in self._profiler.write():
+                self.logger.info(f"Wrote profile to {path}")
+
+    def sync_all(self) -> None:  # type: ignore[misc]
+        """Sync all streams, through an output pipeline if ``max_queued_messages`` is set.
+
+        The pipeline holds that many messages while the target lags, spills
+        the overflow to ``spill_dir`` (up to ``max_spilled_messages``) and
+        otherwise blocks the streams until the target catches up. Queue depths
+        are logged every ``metrics_interval`` seconds.
+        """
+        self._start_clock()
+        try:
+            self._sync_all()
+        finally:
+            self.write_profile()
+
+    def _sync_all(self) -> None:
+        if not self.config.get('max_queued_messages'):
+            super().sync_all()
+            return
+
+        self.pipeline = OutputPipeline(
+            sys.stdout,
+            max_queued = self.config['max_queued_messages'],
+            spill_dir = self.config.get('spill_dir'),
+            max_spilled = self.config.get('max_spilled_messages'),
+            metrics_interval = self.config.get('metrics_interval', 60)
+        )
+        try:
+            with redirect_stdout(self.pipeline):
+                super().sync_all()
+        finally:
+            pipeline, self.pipeline = self.pipeline, None
+            pipeline.close()
+
+    @property
+    def work_queue(self) -> Optional[WorkQueue]:
+        """Return the queue at ``work_queue``, if set.
+
+        Stream partitions with pages in the queue emit the records the
+        workers stored there instead of fetching their pages (see
+        ``tap-sofifa-queue``), failing when no job completes for
+        ``queue_timeout`` seconds (600 by default).
+        """
+        if self._work_queue is None and self.config.get('work_queue'):
+            self._work_queue = WorkQueue(self.config['work_queue'], self.config.get('lease_seconds', 60))
+        return self._work_queue
+
+    @property
+    def priorities(self) -> Priorities:
+        """Return the weights of leagues and players from the ``priority`` setting.
+
+        League partitions of ``league_ids`` and players of ``player_detail``
+        and ``player_history`` are fetched from the weightiest down.
+        """
+        if self._priorities is None:
+            self._priorities = Priorities(self.config.get('priority') or {}, self.player_index or self.player_store)
+        return self._priorities
+
+    def time_left(self) -> Optional[float]:
+        """Return the seconds left before ``max_runtime`` runs out, if set.
+
+        The clock starts as the sync starts, or as the tap is created for
+        streams synced on their own. Streams then stop scheduling pages as the
+        deadline nears and keep bookmarks in their state to resume from.
+        """
+        if self._deadline is None:
+            return None
+        return self._deadline - time.monotonic()
+
+    def _start_clock(self) -> None:
+        if self.config.get('max_runtime'):
+            self._deadline = time.monotonic() + self.config['max_runtime']
+
     def discover_streams(self) -> List[Stream]:
         """Return a list of discovered streams."""
         if '_stream' in self.config:
-            return [STREAM_TYPES[self.config['_stream']](tap=self)]
+            stream = STREAM_TYPES[self.config['_stream']](tap=self)
+            # Streams not selected by default are still synced when named
+            stream.metadata.root.selected = True
+            return [stream]
         else:
             return [stream_class(tap=self) for stream_class in STREAM_TYPES.values()]
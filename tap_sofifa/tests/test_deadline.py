@@ -0,0 +1,65 @@
+import time
+
+from tap_sofifa.standin import StandInServer, StandInSettings, player_ids
+from tap_sofifa.tap import TapSoFIFA
+
+
+def run(server, stream_name, state=None, **config):
+    tap = TapSoFIFA(config={'transport': 'http', '_stream': stream_name, **config}, state=state)
+    stream = tap.streams[stream_name]
+    stream.url_base = server.url
+    stream.page_size = server.settings.page_size
+    records = [record['id'] for record in stream.get_records(None)]
+    return records, stream.stream_state
+
+
+class TestMaxRuntime:
+    def test_resume_concurrent_pages_after_deadline(self):
+        with StandInServer(StandInSettings(latency=0.05)) as server:
+            config = {'player_ids': player_ids(40), 'max_workers': 2, 'max_runtime': 0.3}
+            first, state = run(server, 'player_detail', **config)
+
+            assert 0 < len(first) < 40
+            assert state['progress']['pages'] == len(first)
+
+            rest, state = run(server, 'player_detail', state={'bookmarks': {'player_detail': state}}, **{**config, 'max_runtime': 60})
+
+        assert first + rest == player_ids(40)
+        assert 'progress' not in state
+
+    def test_start_over_when_players_are_reordered(self):
+        with StandInServer(StandInSettings(latency=0.05)) as server:
+            config = {'player_ids': player_ids(40), 'max_workers': 2, 'max_runtime': 0.3}
+            first, state = run(server, 'player_detail', **config)
+            # The last players come first in the next run
+            priority = {'players': {str(player_id): 2 for player_id in player_ids(40)[30:]}}
+
+            rest, state = run(server, 'player_detail', state={'bookmarks': {'player_detail': state}}, **{**config, 'max_runtime': 60, 'priority': priority})
+
+        assert 0 < len(first) < 40
+        assert rest == player_ids(40)[30:] + player_ids(40)[:30]
+        assert 'progress' not in state
+
+    def test_resume_paginated_pages_after_deadline(self):
+        with StandInServer(StandInSettings(players=30, page_size=2, latency=0.05)) as server:
+            first, state = run(server, 'player_changes', max_runtime=0.3)
+
+            assert 0 < len(first) < 30
+            assert state['resume']['url'].endswith(f'offset={len(first)}')
+
+            rest, state = run(server, 'player_changes', state={'bookmarks': {'player_changes': state}}, max_runtime=60)
+
+        assert first + rest == player_ids(30)
+        assert 'resume' not in state
+
+    def test_start_clock_with_the_tap(self):
+        tap = TapSoFIFA(config={'transport': 'http', 'max_runtime': 0.2})
+        time.sleep(0.3)
+
+        assert tap.time_left() < 0
+
+    def test_skip_streams_started_after_deadline(self):
+        with StandInServer() as server:
+            records, _ = run(server, 'player_detail', player_id=player_ids(1)[0], max_runtime=-1)
+
+        assert records == []
@@ -0,0 +1,56 @@
+from tap_sofifa.discovery import DiscoveryCache
+from tap_sofifa.standin import LEAGUES, TEAMS, StandInServer, StandInSettings, team_league
+from tap_sofifa.tap import TapSoFIFA
+
+
+def tap_for(server, stream_name, **config):
+    tap = TapSoFIFA(config={'transport': 'http', 'game_year': 23, '_stream': stream_name, **config})
+    tap.streams[stream_name].url_base = server.url
+    return tap
+
+
+class TestDiscovery:
+    def test_select_costly_streams_only_when_named(self):
+        tap = TapSoFIFA(config={'transport': 'http', 'game_year': 23})
+        selected = {name for name, stream in tap.streams.items() if stream.selected}
+
+        assert not selected & {'player_attributes', 'teams', 'leagues', 'player_history'}
+        assert {'versions', 'changes', 'player_changes', 'player_detail'} <= selected
+        assert TapSoFIFA(config={'transport': 'http', 'game_year': 23, '_stream': 'teams'}).streams['teams'].selected
+
+    def test_extract_teams_of_latest_change(self):
+        with StandInServer(StandInSettings(page_size=15)) as server:
+            stream = tap_for(server, 'teams').streams['teams']
+            stream.page_size = 15
+            teams = list(stream.get_records(None))
+
+        assert [team['id'] for team in teams] == list(range(1, TEAMS + 1))
+        assert teams[0] == {
+            'id': 1,
+            'name': 'Team 1',
+            'league_id': team_league(1),
+            'league': LEAGUES[team_league(1)],
+            'change_id': 230020
+        }
+
+    def test_read_cached_teams_without_loading_pages(self, tmp_path):
+        with StandInServer(StandInSettings(page_size=15)) as server:
+            stream = tap_for(server, 'teams', change_id=230019, discovery_cache=str(tmp_path)).streams['teams']
+            stream.page_size = 15
+            fetched = list(stream.get_records(None))
+            requests = server.requests
+
+            cached = list(tap_for(server, 'teams', change_id=230019, discovery_cache=str(tmp_path)).streams['teams'].get_records(None))
+
+            assert server.requests == requests
+        assert cached == fetched
+        assert DiscoveryCache(tmp_path).get('teams', 230019) == fetched
+        assert DiscoveryCache(tmp_path).get('teams', 230020) is None
+
+    def test_partition_player_tables_by_discovered_leagues(self, tmp_path):
+        with StandInServer(StandInSettings(page_size=15)) as server:
+            tap = tap_for(server, 'player_changes', discover_leagues=True, discovery_cache=str(tmp_path))
+            partitions = tap.streams['player_changes'].partitions
+
+        assert sorted(partition['league_id'] for partition in partitions) == sorted(LEAGUES)
+        assert len(DiscoveryCache(tmp_path).get('teams', 230020)) == TEAMS
@@ -0,0 +1,217 @@
+from bs4 import BeautifulSoup
+from pytest import raises
+from tap_sofifa.extraction import (
+    Cell,
+    Check,
+    Entries,
+    Field,
+    Group,
+    PageIndex,
+    Select,
+    Spec,
+    parse_money,
+    segment,
+    snake_case
+)
+
+
+def soup(html):
+    return BeautifulSoup(html, 'html.parser')
+
+
+class TestSpec:
+    def test_extract_rows_with_cells(self):
+        spec = Spec(
+            Select('tbody', index=0),
+            Select('tr', at_least=1),
+            cells=Select('td', at_least=2, at_most=2, recursive=False, error='Incorrect data format'),
+            fields={
+                'id': Field(Cell(0), Select('a', index=0), attr='href', coerce=segment(2, int)),
+                'name': Field(Cell(0)),
+                'total': Field(Cell(1), coerce=int)
+            }
+        )
+
+        page = soup("""
+        <table><tbody>
+        <tr><td><a href="/player/1/a">A</a></td><td>10</td></tr>
+        <tr><td><a href="/player/2/b">B</a></td><td>20</td></tr>
+        </tbody></table>
+        """)
+
+        assert spec.compile().extract(page) == [
+            {'id': 1, 'name': 'A', 'total': 10},
+            {'id': 2, 'name': 'B', 'total': 20}
+        ]
+
+    def test_extract_single_record_page_with_groups_and_entries(self):
+        spec = Spec(fields={
+            'team': Group(Select('a', index=0), fields={
+                'id': Field(attr='href', coerce=segment(2, int)),
+                'name': Field()
+            }),
+            'ratings': Entries(
+                Select('li'),
+                key=Field(Select(index=1), coerce=snake_case),
+                value=Field(Select(index=0), coerce=int)
+            ),
+            'extra': Entries(
+                Select('p', limit=1),
+                key=Field(attr='title'),
+                value=Field(),
+                merge=True
+            )
+        })
+
+        page = soup("""
+        <a href="/team/7/arsenal">Arsenal</a>
+        <ul><li><span>40</span><span>Shot Power</span></li></ul>
+        <p title="kit">Red</p><p title="ignored">Blue</p>
+        """)
+
+        assert spec.compile().extract(page) == [{
+            'team': {'id': 7, 'name': 'Arsenal'},
+            'ratings': {'shot_power': 40},
+            'kit': 'Red'
+        }]
+
+    def test_raise_declared_error_when_cardinality_is_not_met(self):
+        spec = Spec(
+            Select(class_='menu', index=1, error='Cannot find menu'),
+            Select('a', at_least=1, error='Menu contains no options'),
+            fields={'name': Field()}
+        )
+        extractor = spec.compile()
+
+        with raises(Exception, match='Cannot find menu'):
+            extractor.extract(soup('<div class="menu"></div>'))
+
+        with raises(Exception, match='Menu contains no options'):
+            extractor.extract(soup('<div class="menu"></div><div class="menu"></div>'))
+
+    def test_first_match_hop_still_requires_at_least(self):
+        hop = Select('span', index=0, at_least=2, error='Cannot find both ratings').compile()
+
+        assert hop(soup('<span>1</span><span>2</span>')).get_text() == '1'
+        with raises(Exception, match='Cannot find both ratings'):
+            hop(soup('<span>1</span>'))
+
+    def test_checks_only_apply_to_first_row(self):
+        spec = Spec(
+            Select('a', at_least=1),
+            fields={'name': Field()},
+            checks=[Check(lambda link: link.get_text().startswith('FIFA'), 'Wrong menu')]
+        )
+        extractor = spec.compile()
+
+        assert extractor.extract(soup('<a>FIFA 22</a><a>Other</a>')) == [
+            {'name': 'FIFA 22'},
+            {'name': 'Other'}
+        ]
+
+        with raises(Exception, match='Wrong menu'):
+            extractor.extract(soup('<a>FM 22</a>'))
+
+    def test_iter_extract_releases_rows_as_records_are_yielded(self):
+        spec = Spec(
+            Select('tbody', index=0),
+            Select('tr', at_least=1, error='No rows'),
+            fields={'name': Field()}
+        )
+        page = soup('<table><tbody><tr><td>A</td></tr><tr><td>B</td></tr></tbody></table>')
+
+        records = spec.compile().iter_extract(page, release=True)
+
+        assert next(records) == {'name': 'A'}
+        assert [row.get_text() for row in page.find_all('tr')] == ['B']
+        assert list(records) == [{'name': 'B'}]
+        assert page.find('tr') is None
+
+        with raises(Exception, match='No rows'):
+            next(spec.compile().iter_extract(soup('<table><tbody></tbody></table>')))
+
+    def test_indexed_spec_reads_top_level_selectors_from_page_index(self):
+        spec = Spec(
+            fields={
+                'name': Field(
+                    Select(class_='info', index=0, error='Cannot find name container'),
+                    Select('h1', index=0)
+                ),
+                'ratings': Field(Select('section', index=0), Select('span'), coerce=int, many=True),
+                'blocks': Field(Select(class_='block', at_least=2, at_most=2, error='Wrong blocks'), many=True)
+            },
+            indexed=True
+        )
+        extractor = spec.compile()
+
+        page = soup("""
+        <div class="info wide"><h1>John Doe</h1></div>
+        <section><span>79</span><span>84</span></section>
+        <p class="block">A</p><div class="block">B</div>
+        """)
+
+        assert extractor.extract(page) == [{'name': 'John Doe', 'ratings': [79, 84], 'blocks': ['A', 'B']}]
+
+        with raises(Exception, match='Cannot find name container'):
+            extractor.extract(soup('<section></section>'))
+
+
+class TestPageIndex:
+    def test_lookup_tags_by_name_and_class(self):
+        page = soup('<div class="a b"><span class="a">1</span></div><span>2</span>')
+
+        index = PageIndex(page)
+
+        assert [tag.name for tag in index.lookup(None, 'a')] == ['div', 'span']
+        assert [tag.get_text() for tag in index.lookup('span', None)] == ['1', '2']
+        assert [tag.get_text() for tag in index.lookup('span', 'a')] == ['1']
+        assert index.lookup('table', None) == []
+
+
+class TestSelect:
+    def test_extract_selected_properties_only(self):
+        spec = Spec(
+            fields={
+                'name': Field(Select('h1', index=0)),
+                'rating': Field(Select('span', index=0, error='Cannot find rating'), coerce=int),
+                'blocks': Entries(
+                    Select(class_='block'),
+                    key=Field(Select('h5', index=0), coerce=str.lower),
+                    value=Field(Select('p', index=0), coerce=int),
+                    merge=True
+                )
+            }
+        )
+        extractor = spec.compile()
+        page = soup("""
+        <h1>John Doe</h1>
+        <div class="block"><h5>Attacking</h5><p>40</p></div>
+        <div class="block"><h5>Skill</h5><p>oops</p></div>
+        """)
+
+        selected = extractor.select({'name', 'attacking'})
+
+        assert selected.extract(page) == [{'name': 'John Doe', 'attacking': 40}]
+        assert extractor.select({'name', 'attacking'}) is selected
+        assert extractor.select(None) is extractor
+        with raises(Exception, match='Cannot find rating'):
+            extractor.extract(page)
+
+
+class TestParseMoney:
+    def test_parse_amounts_with_currency_and_suffix(self):
+        assert parse_money(['€110.5M', '€350K', '£2B', '$500', '', 'n/a']) == [
+            ('EUR', 110500000),
+            ('EUR', 350000),
+            ('GBP', 2000000000),
+            ('USD', 500),
+            (None, None),
+            (None, None)
+        ]
+        assert parse_money([]) == []
+
+    def test_parse_money_exactly(self):
+        amounts = [f'€{tenths / 10}M' for tenths in range(1, 1500)]
+
+        assert [value for _, value in parse_money(amounts)] == [tenths * 100000 for tenths in range(1, 1500)]
+        assert parse_money(['€4.1M', '€16.4M', '€8.2M']) == [('EUR', 4100000), ('EUR', 16400000), ('EUR', 8200000)]
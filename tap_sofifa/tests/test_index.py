@@ -0,0 +1,71 @@
+from pytest import raises
+
+from tap_sofifa.index import IndexEntry, PlayerIndex
+
+
+def entry(player_id, change_id, overall=80, league_id=13):
+    return IndexEntry(player_id, change_id, 1, league_id, overall, 85, 23)
+
+
+class TestPlayerIndex:
+    def test_lookup_players_of_league_and_change(self, tmp_path):
+        index = PlayerIndex(tmp_path / 'players.idx')
+        for player_id in range(1, 4):
+            index.add(entry(player_id, 200000))
+        index.add(entry(4, 200000, league_id=16))
+        index.add(entry(1, 200001))
+
+        assert index.player_ids(200000, 13) == [1, 2, 3]
+        assert index.player_ids(200000, 16) == [4]
+        assert index.player_ids(200001, 13) == [1]
+        assert index.player_ids(200002, 13) == []
+
+    def test_latest_ratings_and_history_of_player(self, tmp_path):
+        index = PlayerIndex(tmp_path / 'players.idx')
+        index.add(entry(1, 200000, overall=80))
+        index.add(entry(1, 200001, overall=82))
+
+        assert index.latest(1) == entry(1, 200001, overall=82)
+        assert list(index.history(1)) == [entry(1, 200001, overall=82), entry(1, 200000, overall=80)]
+        assert index.latest(2) is None
+
+    def test_skip_unchanged_entries_and_persist_across_runs(self, tmp_path):
+        index = PlayerIndex(tmp_path / 'players.idx')
+        assert index.add(entry(1, 200000))
+        assert not index.add(entry(1, 200000))
+        index.close()
+
+        index = PlayerIndex(tmp_path / 'players.idx')
+        assert len(index) == 1
+        assert index.latest(1) == entry(1, 200000)
+
+    def test_grow_hash_tables(self, tmp_path):
+        index = PlayerIndex(tmp_path / 'players.idx')
+        for player_id in range(1, 2001):
+            index.add(entry(player_id, 200000))
+
+        assert index.latest(1500) == entry(1500, 200000)
+        assert index.player_ids(200000, 13) == list(range(1, 2001))
+
+    def test_order_history_by_change_whatever_the_order_indexed(self, tmp_path):
+        index = PlayerIndex(tmp_path / 'players.idx')
+        index.add(entry(1, 200002, overall=84))
+        index.add(entry(1, 200000, overall=80))
+        index.add(entry(1, 200001, overall=82))
+
+        assert not index.add(entry(1, 200001, overall=90))
+        assert len(index) == 3
+        assert index.latest(1) == entry(1, 200002, overall=84)
+        assert [item.change_id for item in index.history(1)] == [200002, 200001, 200000]
+
+    def test_lock_index_for_a_single_writer(self, tmp_path):
+        index = PlayerIndex(tmp_path / 'players.idx')
+        index.add(entry(1, 200000))
+        other = PlayerIndex(tmp_path / 'players.idx')
+
+        assert other.latest(1) == entry(1, 200000)
+        with raises(RuntimeError, match='written by another process'):
+            other.add(entry(2, 200000))
+
+        index.close()
+        assert other.add(entry(2, 200000))
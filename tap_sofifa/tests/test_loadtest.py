@@ -0,0 +1,54 @@
+import requests
+
+from tap_sofifa.loadtest import percentile, run
+from tap_sofifa.standin import StandInServer, StandInSettings
+
+
+class TestStandInServer:
+    def test_serve_paginated_player_tables(self):
+        with StandInServer(StandInSettings(players=5, page_size=2)) as server:
+            first = requests.get(server.url + '?type=all&set=true')
+            last = requests.get(server.url + '?type=all&set=true&offset=4')
+            past = requests.get(server.url + '?type=all&set=true&offset=6')
+
+        assert first.text.count('<tr>') == 2
+        assert 'offset=2">NEXT</a>' in first.text
+        assert last.text.count('<tr>') == 1
+        assert 'NEXT' not in last.text
+        assert past.status_code == 404
+
+    def test_inject_throttling(self):
+        with StandInServer(StandInSettings(throttle_rate=1)) as server:
+            response = requests.get(server.url)
+
+        assert response.status_code == 429
+
+
+class TestLoadTest:
+    def test_report_throughput_of_each_stream(self):
+        settings = StandInSettings(players=5, page_size=2)
+
+        reports = run(settings, ['versions', 'changes', 'player_changes', 'player_detail'], [1, 2], detail_players=3)
+
+        assert [(report['stream'], report['max_workers'], report['records'], report['error']) for report in reports] == [
+            ('versions', 1, 2, None),
+            ('versions', 2, 2, None),
+            ('changes', 1, 3, None),
+            ('changes', 2, 3, None),
+            ('player_changes', 1, 5, None),
+            ('player_changes', 2, 5, None),
+            ('player_detail', 1, 3, None),
+            ('player_detail', 2, 3, None)
+        ]
+        assert all(report['p50_ms'] is not None for report in reports)
+
+    def test_report_stream_failures(self):
+        reports = run(StandInSettings(error_rate=1), ['versions'], max_tries=1)
+
+        assert reports[0]['records'] == 0
+        assert reports[0]['error'].startswith('RetriableAPIError: 500 response')
+
+    def test_percentile(self):
+        assert percentile([], 0.5) is None
+        assert percentile([3, 1, 2, 4], 0.5) == 2
+        assert percentile(list(range(1, 101)), 0.99) == 99
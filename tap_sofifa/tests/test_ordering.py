@@ -0,0 +1,62 @@
+from pytest import raises
+from tap_sofifa.ordering import OrderedEmitter
+
+
+def complete(emitter, sequence, result):
+    emitter.request()
+    emitter.complete(sequence, result)
+
+
+class TestOrderedEmitter:
+    def test_release_pages_once_contiguous(self):
+        emitter = OrderedEmitter(4)
+
+        complete(emitter, 1, [{'page': 1}])
+        complete(emitter, 2, [{'page': 2}])
+
+        assert list(emitter.drain()) == []
+        assert emitter.watermark == 0
+        assert emitter.buffered == 2
+
+        complete(emitter, 0, [{'page': 0}])
+
+        assert list(emitter.drain()) == [{'page': 0}, {'page': 1}, {'page': 2}]
+        assert emitter.watermark == 3
+        assert emitter.buffered == 0
+
+    def test_cap_pages_held_ahead_of_watermark(self):
+        emitter = OrderedEmitter(2)
+
+        emitter.request()
+        complete(emitter, 1, [])
+
+        assert emitter.full
+
+        emitter.complete(0, [])
+        list(emitter.drain())
+
+        assert not emitter.full
+
+    def test_raise_errors_in_page_order(self):
+        emitter = OrderedEmitter(4)
+
+        complete(emitter, 1, RuntimeError('Page 1 failed'))
+        complete(emitter, 0, [{'page': 0}])
+
+        records = emitter.drain()
+        assert next(records) == {'page': 0}
+        with raises(RuntimeError, match='Page 1 failed'):
+            next(records)
+        assert emitter.watermark == 1
+
+    def test_drop_pages_past_the_last_one(self):
+        emitter = OrderedEmitter(4)
+
+        complete(emitter, 2, RuntimeError('SoFIFA data not available'))
+        complete(emitter, 1, [{'page': 1}])
+        emitter.end(1)
+        complete(emitter, 3, [{'page': 3}])
+        complete(emitter, 0, [{'page': 0}])
+
+        assert list(emitter.drain()) == [{'page': 0}, {'page': 1}]
+        assert emitter.done
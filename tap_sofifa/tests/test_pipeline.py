@@ -0,0 +1,99 @@
+import io
+import json
+import threading
+
+from pytest import raises
+from tap_sofifa.pipeline import OutputPipeline
+from tap_sofifa.tap import TapSoFIFA
+
+
+class SlowOutput(io.StringIO):
+    """Output blocking every write until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def write(self, text):
+        self.released.wait()
+        return super().write(text)
+
+
+class BrokenOutput(io.StringIO):
+    def write(self, text):
+        raise BrokenPipeError('target exited')
+
+
+class TestOutputPipeline:
+    def test_write_lines_in_order(self):
+        output = io.StringIO()
+        pipeline = OutputPipeline(output, max_queued=2)
+
+        pipeline.write('{"n": 1}\n{"n"')
+        pipeline.write(': 2}\n')
+        pipeline.write('{"n": 3}')
+        pipeline.close()
+
+        assert output.getvalue() == '{"n": 1}\n{"n": 2}\n{"n": 3}'
+
+    def test_spill_overflow_while_target_lags(self, tmp_path):
+        output = SlowOutput()
+        pipeline = OutputPipeline(output, max_queued=2, spill_dir=str(tmp_path))
+
+        for number in range(10):
+            pipeline.write(f'{number}\n')
+
+        assert pipeline.depths()['spilled'] >= 7
+        assert list(tmp_path.glob('*/*.jsonl.gz'))
+
+        output.released.set()
+        pipeline.close()
+
+        assert output.getvalue().splitlines() == [str(number) for number in range(10)]
+        assert list(tmp_path.iterdir()) == []
+
+    def test_block_writes_once_queue_and_spill_are_full(self, tmp_path):
+        output = SlowOutput()
+        pipeline = OutputPipeline(output, max_queued=1, spill_dir=str(tmp_path), max_spilled=2)
+        writer = threading.Thread(target=lambda: [pipeline.write(f'{number}\n') for number in range(6)])
+
+        writer.start()
+        writer.join(0.2)
+
+        assert writer.is_alive()
+        assert pipeline.depths()['spilled'] == 2
+
+        output.released.set()
+        writer.join()
+        pipeline.close()
+
+        assert output.getvalue().splitlines() == [str(number) for number in range(6)]
+
+    def test_raise_output_errors_to_writers(self):
+        pipeline = OutputPipeline(BrokenOutput(), max_queued=1)
+
+        with raises(BrokenPipeError):
+            for number in range(100):
+                pipeline.write(f'{number}\n')
+        with raises(BrokenPipeError):
+            pipeline.close()
+
+    def test_sync_through_pipeline(self, tmp_path, capsys):
+        tap = TapSoFIFA(config={
+            '_stream': 'versions',
+            'archive_path': str(tmp_path / 'pages.db'),
+            'archive_mode': 'replay',
+            'max_queued_messages': 1,
+            'spill_dir': str(tmp_path)
+        })
+        tap.streams['versions'].get_records = lambda context: iter([
+            {'name': f'FIFA {year}', 'r': str(year), 'set': 'true'} for year in range(20, 23)
+        ])
+
+        tap.sync_all()
+
+        messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [message['record']['name'] for message in messages if message['type'] == 'RECORD'] == [
+            'FIFA 20', 'FIFA 21', 'FIFA 22'
+        ]
+        assert tap.pipeline is None
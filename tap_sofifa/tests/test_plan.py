@@ -0,0 +1,72 @@
+from tap_sofifa.plan import Probe, count_list_pages, plan, selected_stream_names
+from tap_sofifa.standin import StandInServer, StandInSettings, player_ids
+from tap_sofifa.tap import TapSoFIFA
+
+
+def tap_for(server, stream_name, state=None, **config):
+    tap = TapSoFIFA(config={'transport': 'http', 'game_year': 23, '_stream': stream_name, **config}, state=state)
+    tap.streams[stream_name].url_base = server.url
+    return tap
+
+
+class TestPlan:
+    def test_count_player_table_pages_by_probing(self):
+        for players in [1, 2, 3, 7, 8, 9, 33]:
+            with StandInServer(StandInSettings(players=players, page_size=2)) as server:
+                stream = tap_for(server, 'player_changes').streams['player_changes']
+                stream.page_size = 2
+                probe = Probe()
+
+                assert count_list_pages(stream, None, probe) == (players + 1) // 2
+                assert len(probe.latencies) <= 12
+
+    def test_skip_streams_missing_their_settings(self):
+        with StandInServer(StandInSettings(players=3)) as server:
+            tap = TapSoFIFA(config={'transport': 'http', 'game_year': 23})
+            for stream in tap.streams.values():
+                stream.url_base = server.url
+
+            reports, totals = plan([tap])
+
+        assert 'player_detail' not in {report['stream'] for report in reports}
+        assert 'player_history' not in {report['stream'] for report in reports}
+        assert tap.streams['player_history'].partitions == []
+        assert totals['pages'] > 0
+
+    def test_build_taps_of_selected_streams_only(self):
+        catalog = {
+            'streams': [
+                {'tap_stream_id': 'teams', 'metadata': [{'breadcrumb': [], 'metadata': {'selected': True}}]},
+                {'tap_stream_id': 'leagues', 'metadata': [{'breadcrumb': [], 'metadata': {'selected': False}}]},
+                {'tap_stream_id': 'versions', 'metadata': [{'breadcrumb': [], 'metadata': {'selected-by-default': True}}]}
+            ]
+        }
+
+        assert selected_stream_names(catalog) == ['teams', 'versions']
+        assert selected_stream_names(None) == ['versions', 'changes', 'player_changes', 'player_detail']
+
+    def test_plan_pages_and_cache_savings(self):
+        state = {
+            'bookmarks': {
+                'player_history': {
+                    'partitions': [{'context': {'player_id': 100000}, 'change_id': 230019}]
+                }
+            }
+        }
+        with StandInServer(StandInSettings(players=10)) as server:
+            taps = [
+                tap_for(server, 'player_detail', player_ids=player_ids(4), max_workers=2),
+                tap_for(server, 'player_history', state=state, player_ids=player_ids(2))
+            ]
+
+            reports, totals = plan(taps, requests_per_second=1)
+
+        assert [(report['stream'], report['pages'], report['cached_pages']) for report in reports] == [
+            ('player_detail', 4, 0),
+            ('player_history', 4, 2),
+            ('player_history', 4, 0)
+        ]
+        assert totals['pages'] == 12
+        assert totals['pages_to_fetch'] == 10
+        assert totals['max_workers'] == 2
+        assert totals['expected_seconds'] == 10
@@ -0,0 +1,45 @@
+from tap_sofifa.index import IndexEntry, PlayerIndex
+from tap_sofifa.priority import Priorities
+from tap_sofifa.tap import TapSoFIFA
+from tap_sofifa.workqueue import WorkQueue
+
+
+def entry(player_id, change_id, overall=80, league_id=13):
+    return IndexEntry(player_id, change_id, 1, league_id, overall, 85, 23)
+
+
+class TestPriorities:
+    def test_order_players_by_weightiest_rule(self, tmp_path):
+        index = PlayerIndex(tmp_path / 'players.idx')
+        index.add(entry(1, 200000, league_id=16))
+        index.add(entry(2, 200000, overall=80))
+        index.add(entry(2, 200001, overall=83))
+        index.add(entry(3, 200000))
+        priorities = Priorities({'leagues': {'13': 2}, 'players': {'4': 10}, 'changed_players': 5}, index)
+
+        assert [priorities.player_weight(player_id) for player_id in [1, 2, 3, 4, 5]] == [1, 5, 2, 10, 1]
+        assert priorities.order([1, 2, 3, 4, 5], priorities.player_weight) == [4, 2, 3, 1, 5]
+
+    def test_keep_order_without_rules(self):
+        priorities = Priorities({})
+
+        assert not priorities
+        assert priorities.order([3, 1, 2], priorities.league_weight) == [3, 1, 2]
+
+    def test_partition_player_tables_by_league(self):
+        tap = TapSoFIFA(config={
+            '_stream': 'player_changes',
+            'league_ids': [1, 13, 16],
+            'priority': {'leagues': {'16': 3, '13': 2}}
+        })
+        stream = tap.streams['player_changes']
+
+        assert stream.partitions == [{'league_id': 16}, {'league_id': 13}, {'league_id': 1}]
+        assert stream.get_url_params({'league_id': 16})['lg%5B0%5D'] == '16'
+
+    def test_claim_weightiest_jobs_first(self, tmp_path):
+        queue = WorkQueue(tmp_path / 'jobs.db')
+        queue.add('player_detail', ['/player/1', '/player/2'])
+        queue.add('player_detail', ['/player/3'], priority=5)
+
+        assert [queue.claim('worker').url for _ in range(3)] == ['/player/3', '/player/1', '/player/2']
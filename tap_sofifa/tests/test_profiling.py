@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tap_sofifa.profiling import CProfileProfiler, SamplingProfiler
+
+
+def parse_page():
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def write_records():
+    time.sleep(0.05)
+
+
+class TestProfilers:
+    def test_cprofile_only_measures_profiled_scopes(self, tmp_path):
+        profiler = CProfileProfiler(tmp_path)
+
+        with profiler.scope():
+            parse_page()
+        write_records()
+
+        summary, dump = profiler.write()
+
+        assert 'parse_page' in summary.read_text()
+        assert 'write_records' not in summary.read_text()
+        assert dump.exists()
+
+    def test_sampling_writes_collapsed_stacks(self, tmp_path):
+        profiler = SamplingProfiler(tmp_path, interval=0.001)
+
+        def records():
+            for _ in range(2):
+                parse_page()
+                yield {}
+
+        for _ in profiler.profile_iter(records()):
+            write_records()
+
+        summary, collapsed = profiler.write()
+
+        stacks = collapsed.read_text().splitlines()
+        assert stacks
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in stacks)
+        assert any('test_profiling:parse_page' in line for line in stacks)
+        assert not any('write_records' in line for line in stacks)
+        assert 'test_profiling:parse_page' in summary.read_text()
+
+    def test_profile_scopes_of_worker_threads(self, tmp_path):
+        for profiler in [CProfileProfiler(tmp_path), SamplingProfiler(tmp_path, interval=0.001)]:
+            def handle_page():
+                with profiler.scope():
+                    parse_page()
+
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(lambda _: handle_page(), range(2)))
+
+            assert 'parse_page' in profiler.write()[0].read_text()
+
+    def test_join_sampling_thread_when_written(self, tmp_path):
+        profiler = SamplingProfiler(tmp_path, interval=0.001)
+        with profiler.scope():
+            parse_page()
+        sampler = profiler._sampler
+
+        profiler.write()
+
+        assert not sampler.is_alive()
+        assert profiler._sampler is None
@@ -0,0 +1,59 @@
+import time
+
+import backoff
+from pytest import raises
+from singer_sdk.exceptions import RetriableAPIError
+
+from tap_sofifa.standin import StandInServer, StandInSettings, player_ids
+from tap_sofifa.tap import TapSoFIFA
+
+
+def run(server, stream_name, **config):
+    tap = TapSoFIFA(config={'transport': 'http', '_stream': stream_name, **config})
+    stream = tap.streams[stream_name]
+    stream.url_base = server.url
+    stream.page_size = server.settings.page_size
+    stream.backoff_wait_generator = lambda: backoff.constant(0)
+    return [record['id'] for record in stream.get_records(None)]
+
+
+class TestRetries:
+    def test_retry_throttled_and_failed_paginated_pages(self):
+        settings = StandInSettings(players=20, page_size=2, throttle_rate=0.1, error_rate=0.1, seed=1)
+        with StandInServer(settings) as server:
+            records = run(server, 'player_changes')
+
+            assert server.requests > 10
+
+        assert records == player_ids(20)
+
+    def test_retry_throttled_and_failed_concurrent_pages(self):
+        settings = StandInSettings(throttle_rate=0.1, error_rate=0.1, seed=1)
+        with StandInServer(settings) as server:
+            records = run(server, 'player_detail', player_ids=player_ids(20), max_workers=4)
+
+            assert server.requests > 20
+
+        assert records == player_ids(20)
+
+    def test_stop_at_empty_table_past_last_page(self):
+        settings = StandInSettings(players=20, page_size=5, empty_past_end=True)
+        with StandInServer(settings) as server:
+            tap = TapSoFIFA(config={'transport': 'http', '_stream': 'player_changes', 'max_workers': 4})
+            stream = tap.streams['player_changes']
+            stream.url_base = server.url
+            stream.page_size = 5
+            start = time.perf_counter()
+            records = [record['id'] for record in stream.get_records(None)]
+
+            assert time.perf_counter() - start < 2
+            assert server.requests <= 4 + 16
+
+        assert records == player_ids(20)
+
+    def test_raise_after_last_try(self):
+        with StandInServer(StandInSettings(error_rate=1)) as server:
+            with raises(RetriableAPIError, match='500 response'):
+                run(server, 'player_detail', player_ids=player_ids(1))
+
+            assert server.requests == 5
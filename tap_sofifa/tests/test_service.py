@@ -0,0 +1,129 @@
+import io
+import json
+
+from selenium.common.exceptions import NoSuchElementException
+from tap_sofifa.archive import PageArchive
+from tap_sofifa.client import ScraperStream
+from tap_sofifa.service import TapService
+from tap_sofifa.transport import Page
+
+
+VERSIONS_PAGE = """
+<div class="bp3-menu"></div>
+<div class="bp3-menu"><a href="/r=100000&set=true">FIFA 22</a></div>
+"""
+
+
+class TestTapService:
+    def test_run_jobs_from_json_lines(self, tmp_path):
+        archive = PageArchive(tmp_path / 'pages.db')
+        archive.add('versions', Page('https://www.sofifa.com/', VERSIONS_PAGE, 1.0))
+        archive.close()
+
+        service = TapService({
+            'archive_path': str(tmp_path / 'pages.db'),
+            'archive_mode': 'replay'
+        })
+        jobs = io.StringIO(
+            json.dumps({'id': 'first', 'stream': 'versions'}) + '\n'
+            + 'not json\n'
+            + json.dumps({'id': 'second', 'stream': 'versions'}) + '\n'
+        )
+        output = io.StringIO()
+
+        service.serve(jobs, output)
+        service.close()
+
+        messages = [json.loads(line) for line in output.getvalue().splitlines()]
+        records = [message['record'] for message in messages if message['type'] == 'RECORD']
+        results = [message for message in messages if message['type'] == 'JOB']
+
+        assert records == [{'name': 'FIFA 22', 'r': '100000', 'set': 'true'}] * 2
+        assert [(result.get('id'), result['status']) for result in results] == [
+            ('first', 'succeeded'),
+            (None, 'failed'),
+            ('second', 'succeeded')
+        ]
+
+    def test_reuse_taps_and_transports_across_jobs(self, tmp_path):
+        archive = PageArchive(tmp_path / 'pages.db')
+        archive.add('versions', Page('https://www.sofifa.com/', VERSIONS_PAGE, 1.0))
+        archive.close()
+
+        service = TapService({
+            'archive_path': str(tmp_path / 'pages.db'),
+            'archive_mode': 'replay'
+        })
+        service.run_job({'stream': 'versions'}, io.StringIO())
+        taps = dict(service._taps)
+        transport = next(iter(taps.values())).streams['versions']._transport
+        service.run_job({'stream': 'versions', 'config': {'game_year': 22}}, io.StringIO())
+
+        assert len(taps) == 1
+        assert service._taps == taps
+        tap = next(iter(taps.values()))
+        assert tap.streams['versions'].config['game_year'] == 22
+        assert tap.streams['versions']._transport is transport
+        service.close()
+
+    def test_close_transports_of_failed_jobs(self, tmp_path):
+        PageArchive(tmp_path / 'pages.db').close()
+        service = TapService({
+            'archive_path': str(tmp_path / 'pages.db'),
+            'archive_mode': 'replay'
+        })
+
+        result = service.run_job({'stream': 'versions'}, io.StringIO())
+
+        assert result['status'] == 'failed'
+        assert service._taps == {}
+        service.close()
+
+
+class VersionsDriver:
+    def __init__(self):
+        self.loaded = []
+        self.quit_calls = 0
+        self.current_url = None
+
+    def set_page_load_timeout(self, timeout):
+        pass
+
+    def get(self, url):
+        self.loaded.append(url)
+        self.current_url = url
+
+    @property
+    def page_source(self):
+        return VERSIONS_PAGE
+
+    def find_element(self, by, value):
+        raise NoSuchElementException(value)
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+class TestWarmBrowser:
+    def test_launch_browser_once_across_jobs(self, monkeypatch):
+        drivers = []
+        init = ScraperStream.__init__
+
+        def launch(stream, *args, **kwargs):
+            init(stream, *args, **kwargs)
+            stream.driver = VersionsDriver()
+            drivers.append(stream.driver)
+
+        monkeypatch.setattr(ScraperStream, '__init__', launch)
+        service = TapService({'transport': 'selenium'})
+
+        results = [service.run_job({'stream': 'versions'}, io.StringIO()) for _ in range(3)]
+
+        assert [result['status'] for result in results] == ['succeeded'] * 3
+        assert len(drivers) == 1
+        assert len(drivers[0].loaded) == 3
+        assert drivers[0].quit_calls == 0
+
+        service.close()
+
+        assert drivers[0].quit_calls == 1
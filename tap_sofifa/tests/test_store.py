@@ -0,0 +1,75 @@
+import sqlite3
+
+from tap_sofifa.index import IndexEntry
+from tap_sofifa.standin import StandInServer, StandInSettings
+from tap_sofifa.store import PlayerStore
+from tap_sofifa.tap import TapSoFIFA
+
+
+def changes_record(player_id, change_id, overall=80, team_id=1):
+    return {
+        'id': player_id,
+        'change_id': change_id,
+        'team': {'id': team_id, 'name': f'Team {team_id}'},
+        'overall_rating': overall,
+        'potential_rating': 85,
+        'age': 23
+    }
+
+
+class TestPlayerStore:
+    def test_upsert_records_of_player_streams(self, tmp_path):
+        store = PlayerStore(tmp_path / 'players.db')
+        store.add('player_changes', changes_record(1, 200000), league_id=13)
+        store.add('player_detail', {'id': 1, 'change_id': 200000, 'overall_rating': 81, 'name': 'Player 1'})
+        store.add('player_changes', changes_record(1, 200000, team_id=2))
+
+        row = store.latest(1)
+        assert (row['league_id'], row['team_id'], row['overall_rating'], row['age']) == (13, 2, 81, 23)
+        assert row['detail_record']['name'] == 'Player 1'
+        assert row['changes_record']['team']['id'] == 2
+
+    def test_write_records_in_batches(self, tmp_path):
+        store = PlayerStore(tmp_path / 'players.db', batch_size=3)
+        reader = sqlite3.connect(str(tmp_path / 'players.db'))
+
+        def stored():
+            return reader.execute('SELECT COUNT(*) FROM players').fetchone()[0]
+
+        for player_id in range(1, 6):
+            store.add('player_changes', changes_record(player_id, 200000))
+        assert stored() == 3
+        store.flush()
+        assert stored() == 5
+
+    def test_query_latest_state_of_players(self, tmp_path):
+        store = PlayerStore(tmp_path / 'players.db')
+        store.add('player_changes', changes_record(1, 200000, overall=80), league_id=13)
+        store.add('player_changes', changes_record(1, 200001, overall=84), league_id=13)
+        store.add('player_changes', changes_record(2, 200001, overall=82, team_id=2), league_id=13)
+        store.add('player_changes', changes_record(3, 200001, overall=90), league_id=16)
+        store.close()
+
+        store = PlayerStore(tmp_path / 'players.db')
+        assert [(row['player_id'], row['overall_rating']) for row in store.players(league_id=13)] == [(1, 84), (2, 82)]
+        assert [row['player_id'] for row in store.players(team_id=1)] == [3, 1]
+        assert [row['player_id'] for row in store.players(min_overall_rating=83)] == [3, 1]
+        assert store.player_ids(200001, 13) == [1, 2]
+        assert list(store.history(1)) == [
+            IndexEntry(1, 200001, 1, 13, 84, 85, 23),
+            IndexEntry(1, 200000, 1, 13, 80, 85, 23)
+        ]
+
+    def test_select_detail_players_from_store(self, tmp_path):
+        config = {'transport': 'http', 'game_year': 23, 'player_store_path': str(tmp_path / 'players.db')}
+        with StandInServer(StandInSettings(players=5)) as server:
+            tap = TapSoFIFA(config={**config, '_stream': 'player_changes', 'change_id': 230019, 'league_id': 13})
+            stream = tap.streams['player_changes']
+            stream.url_base = server.url
+            records = list(stream.get_records(None))
+
+            tap = TapSoFIFA(config={**config, '_stream': 'player_detail', 'change_id': 230019, 'league_id': 13})
+            player_ids = tap.streams['player_detail'].get_player_ids()
+
+        assert player_ids == [record['id'] for record in records]
+        assert len(tap.player_store.players(league_id=13)) == 5
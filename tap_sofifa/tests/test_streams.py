@@ -1,8 +1,13 @@
+import time
+
 from pytest import fixture, raises
 from tap_sofifa.tap import TapSoFIFA
 from singer_sdk.testing import tap_to_target_sync_test
 from target_tester.target import TargetTester
 from http.server import HTTPServer
+from tap_sofifa.archive import PageArchive
+from tap_sofifa.transport import Page
+from werkzeug import Response
 
 @fixture
 def target():
@@ -413,6 +418,10 @@ class TestPlayerChangesStream:
                 },
                 'value': 'â‚¬50M',
                 'wage': 'â‚¬100K',
+                # Served without a charset, the euro sign is decoded as cp1252
+                'currency': None,
+                'value_eur': None,
+                'wage_eur': None,
                 'total': 1000
             }
         ]
@@ -488,6 +497,10 @@ class TestPlayerChangesStream:
                 },
                 'value': 'â‚¬50M',
                 'wage': 'â‚¬100K',
+                # Served without a charset, the euro sign is decoded as cp1252
+                'currency': None,
+                'value_eur': None,
+                'wage_eur': None,
                 'total': 1000
             }
         ]
@@ -595,6 +608,10 @@ class TestPlayerChangesStream:
                 },
                 'value': 'â‚¬50M',
                 'wage': 'â‚¬100K',
+                # Served without a charset, the euro sign is decoded as cp1252
+                'currency': None,
+                'value_eur': None,
+                'wage_eur': None,
                 'total': 1000
             },
             {
@@ -617,6 +634,10 @@ class TestPlayerChangesStream:
                 },
                 'value': 'â‚¬50M',
                 'wage': 'â‚¬100K',
+                # Served without a charset, the euro sign is decoded as cp1252
+                'currency': None,
+                'value_eur': None,
+                'wage_eur': None,
                 'total': 1000
             }
         ]
@@ -1065,3 +1086,252 @@ class TestPlayerDetailStream:
 
 
 
+
+    def test_reparse_archived_pages(self, tmp_path, target):
+        archive = PageArchive(tmp_path / 'pages.db')
+        quarters = ''.join(
+            f'<div class="block-quarter"><h5>{name}</h5><ul><li><span>40</span><span>{rating}</span></li></ul></div>'
+            for name, rating in [
+                ('Attacking', 'Crossing'),
+                ('Skill', 'Dribbling'),
+                ('Movement', 'Acceleration'),
+                ('Power', 'Shot Power'),
+                ('Mentality', 'Aggression'),
+                ('Defending', 'Defensive Awareness'),
+                ('Goalkeeping', 'GK Diving')
+            ]
+        )
+        response = f"""
+        <div class="info"><h1>John Doe</h1></div>
+        <section><span>79</span><span>84</span></section>
+        <div class="col-12"></div>
+        <div class="col-12">{quarters}<div class="block-quarter"></div></div>
+        """
+        archive.add('player_detail', Page('https://www.sofifa.com/player/100000?set=true&r=200000', response, 1.0))
+        archive.close()
+
+        expected = [{
+            'id': 100000,
+            'change_id': 200000,
+            'name': 'John Doe',
+            'overall_rating': 79,
+            'potential_rating': 84,
+            'attacking': {
+                'crossing': 40
+            },
+            'skill': {
+                'dribbling': 40
+            },
+            'movement': {
+                'acceleration': 40
+            },
+            'power': {
+                'shot_power': 40
+            },
+            'mentality': {
+                'aggression': 40
+            },
+            'defending': {
+                'defensive_awareness': 40
+            },
+            'goalkeeping': {
+                'gk_diving': 40
+            }
+        }]
+
+        tap = TapSoFIFA(config={
+            '_stream': 'player_detail',
+            'player_id': 100000,
+            'archive_path': str(tmp_path / 'pages.db'),
+            'archive_mode': 'reparse',
+            'reparse_workers': 1
+        })
+
+        _, _, target_stdout, _ = tap_to_target_sync_test(tap, target)
+
+        actual = eval(target_stdout.getvalue().split('\n')[0])
+
+        assert expected == actual
+
+    def test_fetch_player_ids_concurrently_in_order(self, httpserver):
+        quarters = ''.join(
+            f'<div class="block-quarter"><h5>Q{index}</h5><ul><li><span>40</span><span>Skill</span></li></ul></div>'
+            for index in range(8)
+        )
+
+        def respond_after(delay, name):
+            def handler(request):
+                time.sleep(delay)
+                return Response(f"""
+                <div class="info"><h1>{name}</h1></div>
+                <section><span>79</span><span>84</span></section>
+                <div class="col-12"></div>
+                <div class="col-12">{quarters}</div>
+                """, content_type='text/html')
+            return handler
+
+        httpserver.expect_request('/player/100000').respond_with_handler(respond_after(0.3, 'John Doe'))
+        httpserver.expect_request('/player/100001').respond_with_handler(respond_after(0, 'Jane Doe'))
+
+        tap = TapSoFIFA(config={
+            '_stream': 'player_detail',
+            'player_ids': [100000, 100001],
+            'change_id': 200000,
+            'transport': 'http',
+            'max_workers': 2
+        })
+        stream = tap.streams['player_detail']
+        stream.url_base = httpserver.url_for('/')
+
+        records = list(stream.get_records(None))
+
+        assert [(record['id'], record['name']) for record in records] == [(100000, 'John Doe'), (100001, 'Jane Doe')]
+        assert 'progress' not in stream.stream_state
+
+    def test_skip_page_when_only_url_properties_are_selected(self, httpserver):
+        tap = TapSoFIFA(config={
+            '_stream': 'player_detail',
+            'player_id': 100000,
+            'change_id': 200000,
+            'transport': 'http'
+        })
+        stream = tap.streams['player_detail']
+        stream.url_base = httpserver.url_for('/')
+        for name in stream.schema['properties']:
+            if name not in ('id', 'change_id'):
+                stream.metadata[('properties', name)].selected = False
+
+        records = list(stream.get_records(None))
+
+        assert records == [{'id': 100000, 'change_id': 200000}]
+        assert len(httpserver.log) == 0
+
+    def test_never_skip_players_of_pinned_change_as_unchanged(self):
+        tap = TapSoFIFA(config={
+            '_stream': 'player_detail',
+            'player_ids': [100000, 100001],
+            'change_id': 200000,
+            'skip_unchanged': True
+        })
+
+        assert tap.streams['player_detail'].get_source_fingerprint(None) is None
+
+
+class TestPlayerAttributesStream:
+    def test_get_url_params(self):
+        tap = TapSoFIFA(config={
+            '_stream': 'player_attributes',
+            'change_id': 200000
+        })
+        stream = tap.streams['player_attributes']
+        for name in stream.schema['properties']:
+            if name not in ('id', 'change_id', 'name', 'defending'):
+                stream.metadata[('properties', name)].selected = False
+
+        assert stream.get_url_params({}) == {
+            'type': 'all',
+            'set': 'true',
+            'r': '200000',
+            'showCol%5B0%5D': 'oa',
+            'showCol%5B1%5D': 'pt',
+            'showCol%5B2%5D': 'ma',
+            'showCol%5B3%5D': 'sa',
+            'showCol%5B4%5D': 'sl'
+        }
+
+    def test_extract_ratings_from_rating_columns(self, httpserver):
+        tap = TapSoFIFA(config={
+            '_stream': 'player_attributes',
+            'transport': 'http'
+        })
+        stream = tap.streams['player_attributes']
+        stream.url_base = httpserver.url_for('/')
+        codes = [value for key, value in stream.get_url_params({}).items() if key.startswith('showCol')]
+        columns = ''.join(f'<td data-col="{code}"><span>{40 + position}</span></td>' for position, code in enumerate(codes))
+        response = f"""
+        <table>
+        <tbody>
+        <tr>
+        <td><figure></figure></td>
+        <td>
+        <a href="/player/100000/john-doe/200000" aria-label="John Doe"><div>J. Doe</div></a>
+        <img title="Nigeria" />
+        </td>
+        {columns}
+        </tr>
+        </tbody>
+        </table>
+        """
+        httpserver.expect_request('/').respond_with_data(response, content_type='text/html')
+
+        records = list(stream.get_records(None))
+
+        assert len(records) == 1
+        assert records[0]['id'] == 100000
+        assert records[0]['change_id'] == 200000
+        assert records[0]['name'] == 'John Doe'
+        assert records[0]['overall_rating'] == 40
+        assert records[0]['potential_rating'] == 41
+        assert records[0]['attacking'] == {
+            'crossing': 42,
+            'finishing': 43,
+            'heading_accuracy': 44,
+            'short_passing': 45,
+            'volleys': 46
+        }
+        assert records[0]['goalkeeping']['gk_reflexes'] == 40 + len(codes) - 1
+
+
+class TestPlayerHistoryStream:
+    def test_extract_ratings_of_unsynced_changes(self, httpserver):
+        quarters = ''.join(
+            f'<div class="block-quarter"><h5>Q{index}</h5><ul><li><span>40</span><span>Skill</span></li></ul></div>'
+            for index in range(8)
+        )
+
+        def player_page(overall):
+            return f"""
+            <div class="bp3-menu">
+            <a href="/player/100000/john-doe/200003/">Feb 24, 2022</a>
+            <a href="/player/100000/john-doe/200002/">Feb 23, 2022</a>
+            <a href="/player/100000/john-doe/200001/">Feb 22, 2022</a>
+            </div>
+            <div class="info"><h1>John Doe</h1></div>
+            <section><span>{overall}</span><span>84</span></section>
+            <div class="col-12"></div>
+            <div class="col-12">{quarters}</div>
+            """
+
+        home = """
+        <div class="bp3-menu"></div>
+        <div class="bp3-menu"><a href="/?r=200003&set=true">FIFA 22</a></div>
+        <div class="bp3-menu">
+        <a href="/?r=200003&set=true">Feb 24, 2022</a>
+        <a href="/?r=200002&set=true">Feb 23, 2022</a>
+        </div>
+        """
+        httpserver.expect_request('/').respond_with_data(home, content_type='text/html')
+        httpserver.expect_request('/player/100000', query_string='set=true').respond_with_data(player_page(79), content_type='text/html')
+        for overall, change_id in enumerate([200003, 200002], start=80):
+            httpserver.expect_request('/player/100000', query_string=f'set=true&r={change_id}') \
+                .respond_with_data(player_page(overall), content_type='text/html')
+
+        tap = TapSoFIFA(config={
+            '_stream': 'player_history',
+            'player_id': 100000,
+            'transport': 'http',
+            'max_workers': 2
+        })
+        stream = tap.streams['player_history']
+        stream.url_base = httpserver.url_for('/')
+        context = {'player_id': 100000}
+        stream.get_context_state(context)['change_id'] = 200001
+
+        records = list(stream.get_records(context))
+
+        assert stream.partitions == [context]
+        assert [(record['id'], record['change_id'], record['overall_rating'], record['timestamp']) for record in records] == [
+            (100000, 200002, 81, '2022-02-23T00:00:00'),
+            (100000, 200003, 80, '2022-02-24T00:00:00')
+        ]
+        assert stream.get_context_state(context)['change_id'] == 200003
@@ -0,0 +1,348 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import raises
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from singer_sdk.exceptions import RetriableAPIError
+from tap_sofifa.archive import PageArchive, decompress
+from tap_sofifa.standin import StandInServer, StandInSettings, player_ids
+from tap_sofifa.tap import TapSoFIFA
+from tap_sofifa.transport import (
+    HedgeBudget,
+    HedgedTransport,
+    HTTPTransport,
+    NotModified,
+    Page,
+    PageMemo,
+    RecordingTransport,
+    ReplayTransport,
+    SeleniumTransport,
+    Transport,
+    percentile
+)
+
+
+class StaticTransport(Transport):
+    def __init__(self, pages):
+        self.pages = pages
+
+    def fetch(self, url, validators=None):
+        return Page(url, self.pages[url], 0.25)
+
+
+class TestPageArchive:
+    def test_record_and_replay_pages(self, tmp_path):
+        archive = PageArchive(tmp_path / 'pages.db')
+        recording = RecordingTransport(
+            StaticTransport({'https://sofifa.com/?r=1&set=true': '<table></table>'}),
+            archive,
+            'player_changes'
+        )
+
+        recorded = recording.fetch('https://sofifa.com/?r=1&set=true')
+        replayed = ReplayTransport(archive).fetch('https://sofifa.com/?r=1&set=true')
+
+        assert replayed == recorded
+        row = archive._connection.execute('SELECT stream, params, size FROM pages').fetchone()
+        assert row == ('player_changes', '{"r": "1", "set": "true"}', len('<table></table>'))
+
+    def test_replay_returns_latest_page_for_url(self, tmp_path):
+        archive = PageArchive(tmp_path / 'pages.db')
+        archive.add('versions', Page('https://sofifa.com/', 'old', 1.0))
+        archive.add('versions', Page('https://sofifa.com/', 'new', 2.0))
+
+        assert ReplayTransport(archive).fetch('https://sofifa.com/') == Page('https://sofifa.com/', 'new', 2.0)
+
+    def test_raise_error_when_page_is_not_archived(self, tmp_path):
+        transport = ReplayTransport(PageArchive(tmp_path / 'pages.db'))
+
+        with raises(Exception, match='is not in the page archive'):
+            transport.fetch('https://sofifa.com/')
+
+    def test_index_pages_by_player_and_change(self, tmp_path):
+        archive = PageArchive(tmp_path / 'pages.db')
+        archive.add('player_detail', Page('https://sofifa.com/player/1?set=true&r=200000', 'a', 1.0))
+        archive.add('player_detail', Page('https://sofifa.com/player/2?set=true&r=200000', 'b', 1.0))
+        archive.add('player_detail', Page('https://sofifa.com/player/1?set=true&r=200001', 'c', 1.0))
+        archive.add('player_detail', Page('https://sofifa.com/player/1?set=true&r=200001', 'd', 1.0))
+
+        batches = list(archive.pages('player_detail', player_id=1, batch_size=1))
+
+        assert [[(page.url, page.player_id, page.change_id, decompress(page.body)) for page in batch] for batch in batches] == [
+            [('https://sofifa.com/player/1?set=true&r=200000', 1, 200000, 'a')],
+            [('https://sofifa.com/player/1?set=true&r=200001', 1, 200001, 'd')]
+        ]
+
+    def test_reparse_archived_pages_of_each_partition(self, tmp_path):
+        config = {
+            'transport': 'http',
+            '_stream': 'player_changes',
+            'league_ids': [13, 16],
+            'archive_path': str(tmp_path / 'pages.db')
+        }
+
+        def records(**settings):
+            tap = TapSoFIFA(config={**config, **settings})
+            stream = tap.streams['player_changes']
+            stream.url_base = server.url
+            return {
+                context['league_id']: [record['id'] for record in stream.get_records(context)]
+                for context in stream.partitions
+            }, tap
+
+        with StandInServer(StandInSettings(players=5)) as server:
+            recorded, _ = records()
+        reparsed, tap = records(
+            archive_mode='reparse',
+            reparse_workers=1,
+            player_index_path=str(tmp_path / 'players.idx')
+        )
+
+        assert reparsed == recorded == {13: player_ids(5), 16: player_ids(5)}
+        assert [entry.league_id for entry in tap.player_index.history(player_ids(1)[0])] == [13]
+
+
+class TestHTTPTransport:
+    def test_fetch_page(self, httpserver):
+        httpserver.expect_request('/player/1').respond_with_data('<h1>John Doe</h1>', content_type='text/html')
+
+        page = HTTPTransport(timeout=5).fetch(httpserver.url_for('/player/1'))
+
+        assert page.source == '<h1>John Doe</h1>'
+
+    def test_decode_page_without_charset_as_utf8(self, httpserver):
+        httpserver.expect_request('/').respond_with_data('<td>€50M</td>'.encode(), content_type='text/html')
+
+        page = HTTPTransport(timeout=5).fetch(httpserver.url_for('/'))
+
+        assert page.source == '<td>€50M</td>'
+
+    def test_raise_retriable_error_when_throttled(self, httpserver):
+        httpserver.expect_request('/').respond_with_data('', status=429)
+
+        with raises(Exception, match='429 response'):
+            HTTPTransport(timeout=5).fetch(httpserver.url_for('/'))
+
+    def test_revalidate_page_with_stored_validators(self, httpserver):
+        httpserver.expect_request('/', headers={'If-None-Match': '"v1"'}).respond_with_data('', status=304)
+        httpserver.expect_request('/').respond_with_data('<div></div>', headers={'ETag': '"v1"'})
+        transport = HTTPTransport(timeout=5)
+
+        page = transport.fetch(httpserver.url_for('/'))
+
+        assert page.validators == {'etag': '"v1"'}
+        with raises(NotModified):
+            transport.fetch(httpserver.url_for('/'), page.validators)
+
+
+class TestPageMemo:
+    def test_fetch_concurrent_requests_for_a_url_once(self):
+        memo = PageMemo()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            return Page('https://sofifa.com/', '<html></html>', 0.1)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            pages = list(pool.map(lambda _: memo.fetch('https://sofifa.com/', fetch), range(4)))
+
+        assert len(calls) == 1
+        assert all(page is pages[0] for page in pages)
+        assert (memo.hits, memo.misses) == (3, 1)
+
+    def test_keep_latest_pages_and_their_documents(self):
+        memo = PageMemo(size=1)
+        first = memo.fetch('https://sofifa.com/1', lambda: Page('https://sofifa.com/1', '1', 0.1))
+        parsed = []
+
+        def parse():
+            parsed.append(1)
+            return object()
+
+        document = memo.document('https://sofifa.com/1', first, None, parse)
+        assert memo.document('https://sofifa.com/1', first, None, parse) is document
+
+        memo.fetch('https://sofifa.com/2', lambda: Page('https://sofifa.com/2', '2', 0.1))
+        refetched = memo.fetch('https://sofifa.com/1', lambda: Page('https://sofifa.com/1', '1', 0.1))
+
+        assert refetched is not first
+        assert memo.document('https://sofifa.com/1', refetched, None, parse) is not document
+        assert len(parsed) == 2
+
+    def test_raise_not_modified_for_unchanged_kept_page(self):
+        memo = PageMemo()
+        memo.fetch('https://sofifa.com/', lambda: Page('https://sofifa.com/', '', 0.1, {'etag': '"v1"'}))
+
+        with raises(NotModified):
+            memo.fetch('https://sofifa.com/', None, {'etag': '"v1"'})
+        assert memo.fetch('https://sofifa.com/', None, {'etag': '"v0"'}).validators == {'etag': '"v1"'}
+
+
+class FakeDriver:
+    def __init__(self, failure=None):
+        self.failure = failure
+        self.loaded = []
+        self.current_url = None
+        self.quit_calls = 0
+
+    def set_page_load_timeout(self, timeout):
+        pass
+
+    def find_element(self, by, value):
+        raise NoSuchElementException(value)
+
+    def quit(self):
+        self.quit_calls += 1
+
+    def get(self, url):
+        if self.failure == 'crash':
+            raise WebDriverException('unknown error: session deleted because of page crash')
+        if self.failure == 'timeout':
+            raise TimeoutException('timeout: Timed out receiving message from renderer')
+        if self.failure == 'hang':
+            time.sleep(1)
+        self.loaded.append(url)
+        self.current_url = url
+
+    @property
+    def page_source(self):
+        return '<html></html>'
+
+
+class TestSeleniumTransport:
+    def test_relaunch_crashed_session_and_resume_at_page(self):
+        drivers = [FakeDriver()]
+        agreed = []
+        transport = SeleniumTransport(
+            FakeDriver('crash'),
+            1,
+            lambda: agreed.append(transport.driver),
+            launch=drivers.pop
+        )
+
+        page = transport.fetch('https://sofifa.com/?offset=60')
+
+        assert page.url == 'https://sofifa.com/?offset=60'
+        assert transport.driver.loaded == ['https://sofifa.com/?offset=60']
+        assert agreed == [transport.driver]
+
+    def test_relaunch_session_whose_page_load_timed_out(self):
+        hung = FakeDriver('timeout')
+        transport = SeleniumTransport(hung, 1, launch=FakeDriver)
+
+        assert transport.fetch('https://sofifa.com/').source == '<html></html>'
+        time.sleep(0.1)
+        assert hung.quit_calls == 1
+
+    def test_quit_session_on_close(self):
+        driver = FakeDriver()
+        transport = SeleniumTransport(driver, 1)
+        transport.fetch('https://sofifa.com/')
+
+        transport.close()
+
+        assert driver.quit_calls == 1
+        assert transport.driver is None
+
+    def test_relaunch_hung_session_after_watchdog_timeout(self):
+        transport = SeleniumTransport(
+            FakeDriver('hang'),
+            0,
+            launch=FakeDriver,
+            watchdog_grace=0.1
+        )
+
+        assert transport.fetch('https://sofifa.com/').source == '<html></html>'
+
+    def test_relaunch_crashed_session_of_stream_with_its_factory(self):
+        stream = TapSoFIFA(config={'_stream': 'versions'}).streams['versions']
+        crashed = stream.driver = FakeDriver('crash')
+        stream.create_driver = FakeDriver
+
+        stream.transport.fetch('https://sofifa.com/')
+
+        assert stream.driver is not crashed
+        assert stream.driver.loaded == ['https://sofifa.com/']
+        assert stream.transport.driver is stream.driver
+
+    def test_give_up_after_max_relaunches(self):
+        transport = SeleniumTransport(
+            FakeDriver('crash'),
+            1,
+            launch=lambda: FakeDriver('crash'),
+            max_relaunches=2
+        )
+
+        with raises(RetriableAPIError, match='Browser session lost'):
+            transport.fetch('https://sofifa.com/')
+
+
+class DelayedTransport(Transport):
+    """Answer every request after the next delay of a list."""
+
+    def __init__(self, delays):
+        self.delays = iter(delays)
+        self.calls = 0
+
+    def fetch(self, url, validators=None):
+        self.calls += 1
+        delay = next(self.delays)
+        time.sleep(abs(delay))
+        if delay < 0:
+            raise RetriableAPIError(f'Failed to request {url}')
+        return Page(url, f'answered after {delay}', delay)
+
+
+class TestHedgedTransport:
+    def test_hedge_request_slower_than_percentile(self):
+        inner = DelayedTransport([0.01] * 20 + [2, 0.01])
+        transport = HedgedTransport(inner, HedgeBudget(ratio=1), share=0.9)
+        for _ in range(20):
+            transport.fetch('https://sofifa.com/')
+
+        start = time.perf_counter()
+        page = transport.fetch('https://sofifa.com/')
+
+        assert page.source == 'answered after 0.01'
+        assert time.perf_counter() - start < 1
+        assert inner.calls == 22
+        transport.close()
+
+    def test_wait_for_other_request_when_first_fails(self):
+        inner = DelayedTransport([0.01] * 20 + [0.3, -0.01])
+        transport = HedgedTransport(inner, HedgeBudget(ratio=1), share=0.9)
+        for _ in range(20):
+            transport.fetch('https://sofifa.com/')
+
+        assert transport.fetch('https://sofifa.com/').source == 'answered after 0.3'
+        transport.close()
+
+    def test_do_not_hedge_past_budget(self):
+        inner = DelayedTransport([0.01] * 20 + [0.2])
+        transport = HedgedTransport(inner, HedgeBudget(ratio=0), share=0.9)
+        for _ in range(20):
+            transport.fetch('https://sofifa.com/')
+
+        assert transport.fetch('https://sofifa.com/').source == 'answered after 0.2'
+        assert inner.calls == 21
+        transport.close()
+
+    def test_cap_hedges_to_share_of_requests(self):
+        budget = HedgeBudget(ratio=0.1, max_in_flight=1)
+        for _ in range(10):
+            budget.count_request()
+
+        assert budget.acquire()
+        assert not budget.acquire()
+
+        budget.release()
+        for _ in range(10):
+            budget.count_request()
+
+        assert budget.acquire()
+
+    def test_percentile(self):
+        assert percentile([], 0.5) is None
+        assert percentile([0.3, 0.1, 0.2], 0.9) == 0.3
@@ -0,0 +1,122 @@
+import time
+
+from pytest import raises
+from tap_sofifa.client import SoFIFAStream
+from tap_sofifa.coordinator import enqueue, run_worker
+from tap_sofifa.standin import StandInServer, StandInSettings, player_ids
+from tap_sofifa.tap import TapSoFIFA
+from tap_sofifa.workqueue import JobFailed, JobStalled, WorkQueue
+
+
+class TestWorkQueue:
+    def test_claim_jobs_in_order_once(self, tmp_path):
+        queue = WorkQueue(tmp_path / 'jobs.db')
+
+        assert queue.add('player_detail', ['/player/1', '/player/2']) == 2
+        assert queue.add('player_detail', ['/player/2']) == 0
+
+        first = queue.claim('first')
+        second = queue.claim('second')
+
+        assert (first.url, second.url) == ('/player/1', '/player/2')
+        assert queue.claim('third') is None
+
+    def test_requeue_job_when_lease_expires(self, tmp_path):
+        queue = WorkQueue(tmp_path / 'jobs.db', lease_seconds=0.1)
+        queue.add('player_detail', ['/player/1'])
+        job = queue.claim('first')
+
+        assert queue.heartbeat(job, 'first')
+        time.sleep(0.2)
+        retried = queue.claim('second')
+
+        assert retried.url == '/player/1'
+        assert retried.attempts == 2
+        assert not queue.heartbeat(job, 'first')
+        assert not queue.complete(job, 'first', [{'id': 1}])
+        assert queue.complete(retried, 'second', [{'id': 1}])
+        assert list(queue.results('player_detail')) == [{'id': 1}]
+
+    def test_fail_job_after_last_attempt(self, tmp_path):
+        queue = WorkQueue(tmp_path / 'jobs.db', max_attempts=2)
+        queue.add('player_detail', ['/player/1'])
+
+        queue.fail(queue.claim('worker'), 'worker', 'RetriableAPIError: 500 response')
+        queue.fail(queue.claim('worker'), 'worker', 'RetriableAPIError: 500 response')
+
+        assert queue.claim('worker') is None
+        assert queue.counts() == {'failed': 1}
+        with raises(JobFailed):
+            list(queue.results('player_detail'))
+
+    def test_merge_jobs_of_partition(self, tmp_path):
+        queue = WorkQueue(tmp_path / 'jobs.db')
+        queue.add('player_changes', ['/?lg=13'], partition={'league_id': 13, 'change_id': None})
+        queue.add('player_changes', ['/?lg=16'], partition={'league_id': 16})
+        for record in [{'id': 1}, {'id': 2}]:
+            queue.complete(queue.claim('worker'), 'worker', [record])
+
+        assert list(queue.results('player_changes', {'league_id': 16})) == [{'id': 2}]
+        assert not queue.has_jobs('player_changes', {'league_id': 19})
+
+    def test_raise_when_no_worker_completes_jobs(self, tmp_path):
+        queue = WorkQueue(tmp_path / 'jobs.db', lease_seconds=0.1)
+        queue.add('player_detail', ['/player/1'])
+        queue.claim('dead')
+
+        with raises(JobStalled):
+            list(queue.results('player_detail', poll=0.05, timeout=0.5))
+        assert queue.counts() == {'pending': 1}
+
+
+class TestCoordinator:
+    def test_merge_records_completed_by_workers(self, tmp_path, monkeypatch):
+        with StandInServer(StandInSettings(players=5, page_size=2)) as server:
+            monkeypatch.setattr(SoFIFAStream, 'url_base', server.url)
+            monkeypatch.setattr('tap_sofifa.streams.PlayerListStream.page_size', 2)
+            config = {
+                'transport': 'http',
+                'player_ids': player_ids(3),
+                'work_queue': str(tmp_path / 'jobs.db')
+            }
+            queue = WorkQueue(config['work_queue'])
+
+            assert enqueue(config, queue) == {'player_changes': 3, 'player_detail': 3}
+            assert run_worker(config, queue) == 6
+
+        tap = TapSoFIFA(config={**config, '_stream': 'player_changes'})
+        records = list(tap.streams['player_changes'].get_records(None))
+
+        assert [record['id'] for record in records] == player_ids(5)
+        tap = TapSoFIFA(config={**config, '_stream': 'player_detail'})
+        records = list(tap.streams['player_detail'].get_records(None))
+
+        assert [record['id'] for record in records] == player_ids(3)
+
+    def test_merge_records_per_league(self, tmp_path, monkeypatch):
+        with StandInServer(StandInSettings(players=3, page_size=2)) as server:
+            monkeypatch.setattr(SoFIFAStream, 'url_base', server.url)
+            monkeypatch.setattr('tap_sofifa.streams.PlayerListStream.page_size', 2)
+            config = {
+                'transport': 'http',
+                'league_ids': [13, 16],
+                'change_id': 230019,
+                'work_queue': str(tmp_path / 'jobs.db'),
+                'player_index_path': str(tmp_path / 'players.idx')
+            }
+            queue = WorkQueue(config['work_queue'])
+
+            assert enqueue(config, queue, ['player_changes']) == {'player_changes': 4}
+            assert run_worker(config, queue) == 4
+            requests = server.requests
+
+            tap = TapSoFIFA(config={**config, '_stream': 'player_changes'})
+            stream = tap.streams['player_changes']
+            records = {
+                context['league_id']: [record['id'] for record in stream.get_records(context)]
+                for context in stream.partitions
+            }
+
+            assert server.requests == requests
+        assert records == {13: player_ids(3), 16: player_ids(3)}
+        assert tap.player_index.player_ids(230019, 13) == player_ids(3)
@@ -0,0 +1,505 @@
+"""Page transports used by SoFIFA streams.
+
+A transport turns a URL into the page source of that URL. Streams fetch every
+page through one, so the browser can be swapped for plain HTTP requests and any
+of them can be recorded to, or replayed from, a :class:`PageArchive`.
+"""
+
+import logging
+import math
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import requests
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from singer_sdk.exceptions import FatalAPIError, RetriableAPIError
+
+if TYPE_CHECKING:
+    from tap_sofifa.archive import PageArchive
+
+
+# Messages of WebDriver errors raised when the browser or its tab is gone
+SESSION_LOST_MESSAGES = (
+    "invalid session id",
+    "chrome not reachable",
+    "disconnected",
+    "session deleted",
+    "tab crashed",
+    "no such window",
+    "target window already closed",
+    "connection refused",
+    "max retries exceeded",
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Page(NamedTuple):
+    """A fetched page, with the validators to revalidate it with, if any."""
+
+    url: str
+    source: str
+    elapsed: float
+    validators: Optional[Dict[str, str]] = None
+
+
+class NotModified(Exception):
+    """Raised when a conditional request finds the page unchanged."""
+
+
+class Transport(ABC):
+    """Base class for page transports."""
+
+    @abstractmethod
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Page:
+        """Fetch the page at a URL.
+
+        Args:
+            url: URL of the page.
+            validators: ``ETag`` and ``Last-Modified`` values of a previous
+                fetch; transports supporting conditional requests raise
+                :class:`NotModified` when the page has not changed since.
+        """
+
+    def close(self) -> None:
+        """Release the resources held by the transport."""
+
+
+class SessionLost(Exception):
+    """Raised when the WebDriver session crashed or stopped responding."""
+
+
+class SeleniumTransport(Transport):
+    """Load pages in the stream's WebDriver session.
+
+    Every page is loaded under a watchdog: a session whose page load times
+    out, that does not answer within ``timeout`` plus ``watchdog_grace``
+    seconds, or whose browser crashed, is quit and replaced by one from
+    ``launch``, and the page is loaded again, up to ``max_relaunches`` times
+    in a row. ``on_first_load`` runs after the first page of every session,
+    e.g. to accept cookies. Closing the transport quits its session.
+    """
+
+    def __init__(
+        self,
+        driver,
+        timeout: int,
+        on_first_load: Optional[Callable] = None,
+        launch: Optional[Callable[[], Any]] = None,
+        max_relaunches: int = 3,
+        watchdog_grace: float = 30,
+    ) -> None:
+        self.driver = driver
+        self.timeout = timeout
+        self.launch = launch
+        self.max_relaunches = max_relaunches
+        self.watchdog_grace = watchdog_grace
+        self._setup = on_first_load
+        self._on_first_load = on_first_load
+
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Page:
+        """Load a URL and return the rendered page source."""
+        relaunches = 0
+        while True:
+            try:
+                return self._supervised_load(url)
+            except SessionLost as ex:
+                if self.launch is None or relaunches == self.max_relaunches:
+                    raise RetriableAPIError(f"Browser session lost loading {url}: {ex}")
+                relaunches += 1
+                logger.warning(
+                    f"Browser session lost loading {url} ({ex}), relaunching"
+                    f" ({relaunches}/{self.max_relaunches})"
+                )
+                self._quit(self.driver)
+                self.driver = self.launch()
+                self._on_first_load = self._setup
+
+    def _quit(self, driver) -> threading.Thread:
+        def quit_driver() -> None:
+            try:
+                driver.quit()
+            except Exception as ex:
+                logger.debug(f"Failed to quit browser session: {ex}")
+
+        # Quitting a hung browser can hang too
+        quitter = threading.Thread(
+            target=quit_driver, name="tap-sofifa-quit", daemon=True
+        )
+        quitter.start()
+        return quitter
+
+    def close(self) -> None:
+        """Quit the browser session."""
+        if self.driver is not None:
+            self._quit(self.driver).join(self.watchdog_grace)
+            self.driver = None
+
+    def _supervised_load(self, url: str) -> Page:
+        outcome: Dict[str, Any] = {}
+
+        def load() -> None:
+            try:
+                outcome["page"] = self._load(url)
+            except BaseException as ex:
+                outcome["error"] = ex
+
+        # A hung renderer blocks WebDriver calls past the page load timeout, so
+        # the load runs in a thread abandoned if it outlives the watchdog
+        watchdog = threading.Thread(target=load, name="tap-sofifa-load", daemon=True)
+        watchdog.start()
+        watchdog.join(self.timeout + self.watchdog_grace)
+        if watchdog.is_alive():
+            raise SessionLost("no response within the watchdog timeout")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["page"]
+
+    def _load(self, url: str) -> Page:
+        start = time.perf_counter()
+        try:
+            self.driver.set_page_load_timeout(self.timeout)
+            self.driver.get(url)
+            if self._on_first_load:
+                self._on_first_load()
+                self._on_first_load = None
+            source = self.driver.page_source
+            current_url = self.driver.current_url
+        except TimeoutException:
+            # What a hung renderer raises once the page load timeout expires
+            raise SessionLost(f"timed out loading {url}")
+        except WebDriverException as ex:
+            message = str(ex).lower()
+            if any(lost in message for lost in SESSION_LOST_MESSAGES):
+                raise SessionLost(str(ex).strip().splitlines()[0])
+            raise
+        return Page(current_url, source, time.perf_counter() - start)
+
+
+class HTTPTransport(Transport):
+    """Fetch pages with plain HTTP requests, without rendering them."""
+
+    def __init__(self, timeout: int, headers: Optional[dict] = None) -> None:
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Page:
+        """Request a URL and return the response body."""
+        headers = {}
+        if validators and "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if validators and "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as ex:
+            raise RetriableAPIError(f"Failed to request {url}: {ex}")
+        if response.status_code == 304:
+            raise NotModified(url)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetriableAPIError(f"{response.status_code} response for {url}")
+        if response.status_code >= 400:
+            raise FatalAPIError(f"{response.status_code} response for {url}")
+        if "charset" not in response.headers.get("Content-Type", "").lower():
+            # requests falls back to ISO-8859-1 for text; SoFIFA serves UTF-8
+            response.encoding = "utf-8"
+        received = {
+            key: response.headers[header]
+            for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+            if header in response.headers
+        }
+        return Page(
+            response.url,
+            response.text,
+            time.perf_counter() - start,
+            received or None,
+        )
+
+    def close(self) -> None:
+        """Close the HTTP session."""
+        self.session.close()
+
+
+def percentile(values: Iterable[float], share: float) -> Optional[float]:
+    """Return the nearest-rank percentile of some values."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(math.ceil(share * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class HedgeBudget:
+    """Cap on the extra requests made by hedging, shared by all streams of a run.
+
+    Every request earns ``ratio`` of a hedge, so at most that share of the
+    requests are hedged over a run, and at most ``max_in_flight`` hedges run
+    at once.
+    """
+
+    def __init__(self, ratio: float = 0.05, max_in_flight: int = 2) -> None:
+        self.ratio = ratio
+        self.max_in_flight = max_in_flight
+        self.requests = 0
+        self.hedges = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def count_request(self) -> None:
+        """Account for a request made."""
+        with self._lock:
+            self.requests += 1
+
+    def acquire(self) -> bool:
+        """Take a hedge from the budget, returning whether one was left."""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight or (
+                self.hedges + 1 > self.requests * self.ratio
+            ):
+                return False
+            self.hedges += 1
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        """Account for a hedge that finished."""
+        with self._lock:
+            self.in_flight -= 1
+
+
+class HedgedTransport(Transport):
+    """Request a page again when the first request is slower than usual.
+
+    Once ``min_samples`` latencies have been seen, a request that has not
+    completed by the ``share`` percentile of the recent latencies is hedged:
+    the page is requested a second time, if the budget allows it, and the
+    first of the two requests to succeed wins. The other one is left to
+    finish in the background.
+
+    Args:
+        inner: Transport the requests are made with; it has to allow
+            concurrent fetches.
+        budget: Cap on the hedged requests.
+        share: Percentile of the latencies past which a request is hedged.
+        min_samples: Number of latencies needed before hedging.
+        window: Number of recent latencies the percentile is taken over.
+    """
+
+    def __init__(
+        self,
+        inner: Transport,
+        budget: HedgeBudget,
+        share: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+    ) -> None:
+        self.inner = inner
+        self.budget = budget
+        self.share = share
+        self.min_samples = min_samples
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(thread_name_prefix="sofifa-hedge")
+
+    def threshold(self) -> Optional[float]:
+        """Return the seconds after which a request is hedged, if known yet."""
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            return percentile(self.latencies, self.share)
+
+    def _attempt(self, url: str, validators: Optional[Dict[str, str]]) -> Future:
+        start = time.perf_counter()
+        future = self._pool.submit(self.inner.fetch, url, validators)
+
+        def record(done: Future) -> None:
+            if done.exception() is None:
+                with self._lock:
+                    self.latencies.append(time.perf_counter() - start)
+
+        future.add_done_callback(record)
+        return future
+
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Page:
+        """Fetch a URL, hedging the request when it is slow."""
+        self.budget.count_request()
+        threshold = self.threshold()
+        primary = self._attempt(url, validators)
+        if threshold is None:
+            return primary.result()
+        done, _ = wait([primary], timeout=threshold)
+        if done or not self.budget.acquire():
+            return primary.result()
+
+        logger.debug(f"Hedging request for {url} after {threshold:.2f}s")
+        hedge = self._attempt(url, validators)
+        hedge.add_done_callback(lambda _: self.budget.release())
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if not isinstance(future.exception(), RetriableAPIError):
+                    return future.result()
+            # Both requests failed
+            if not pending:
+                return primary.result()
+
+    def close(self) -> None:
+        """Close the inner transport once the remaining requests are done."""
+        self._pool.shutdown(wait=True)
+        self.inner.close()
+
+
+class RecordingTransport(Transport):
+    """Store every page fetched by another transport in an archive."""
+
+    def __init__(self, inner: Transport, archive: "PageArchive", stream: str) -> None:
+        self.inner = inner
+        self.archive = archive
+        self.stream = stream
+
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Page:
+        """Fetch a URL with the inner transport and archive the page."""
+        page = self.inner.fetch(url, validators)
+        self.archive.add(self.stream, page._replace(url=url))
+        return page
+
+    def close(self) -> None:
+        """Close the inner transport and the archive."""
+        self.inner.close()
+        self.archive.close()
+
+
+class PageMemo:
+    """Pages fetched during a run, shared by all the streams of the run.
+
+    Concurrent fetches of a URL wait for the first one instead of requesting
+    the page again, and the latest ``size`` pages are kept along with the
+    documents parsed from them, so a page needed by several streams (the home
+    page of ``versions`` and ``changes``) is fetched and parsed once.
+
+    Args:
+        size: Number of pages kept.
+    """
+
+    def __init__(self, size: int = 32) -> None:
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._pages: "OrderedDict[str, Page]" = OrderedDict()
+        self._documents: Dict[Tuple[str, Any], Tuple[Page, Any]] = {}
+        self._pending: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def fetch(
+        self,
+        url: str,
+        fetch: Callable[[], Page],
+        validators: Optional[Dict[str, str]] = None,
+    ) -> Page:
+        """Return the page at a URL, calling ``fetch`` unless it is kept.
+
+        Raises:
+            NotModified: If the kept page has the ``validators`` of the caller's
+                previous fetch.
+        """
+        while True:
+            with self._lock:
+                page = self._pages.get(url)
+                if page is not None:
+                    self._pages.move_to_end(url)
+                    self.hits += 1
+                    break
+                pending = self._pending.get(url)
+                if pending is None:
+                    pending = self._pending[url] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                # Fetched by another thread meanwhile; if it failed, retry
+                pending.wait()
+                continue
+            try:
+                page = fetch()
+            finally:
+                with self._lock:
+                    del self._pending[url]
+                pending.set()
+            with self._lock:
+                self.misses += 1
+                self._pages[url] = page
+                while len(self._pages) > self.size:
+                    evicted, _ = self._pages.popitem(last=False)
+                    for key in [key for key in self._documents if key[0] == evicted]:
+                        del self._documents[key]
+            return page
+
+        if validators and page.validators == validators:
+            raise NotModified(url)
+        return page
+
+    def document(self, url: str, page: Page, key: Any, parse: Callable[[], Any]) -> Any:
+        """Return the document parsed from a kept page, parsing it once per ``key``.
+
+        Documents are shared, so they must not be modified.
+        """
+        with self._lock:
+            kept = self._documents.get((url, key))
+        if kept is not None and kept[0] is page:
+            return kept[1]
+        document = parse()
+        with self._lock:
+            if self._pages.get(url) is page:
+                self._documents[(url, key)] = (page, document)
+        return document
+
+    def discard(self, url: str) -> None:
+        """Forget the page at a URL, so it is fetched again."""
+        with self._lock:
+            self._pages.pop(url, None)
+            for key in [key for key in self._documents if key[0] == url]:
+                del self._documents[key]
+
+
+class ReplayTransport(Transport):
+    """Serve pages from an archive instead of the network.
+
+    Args:
+        archive: Archive recorded by a previous run.
+        latency: Factor applied to the recorded fetch durations; 0 replays at
+            full speed, 1 at the recorded latencies.
+    """
+
+    def __init__(self, archive: "PageArchive", latency: float = 0) -> None:
+        self.archive = archive
+        self.latency = latency
+
+    def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Page:
+        """Return the archived page for a URL."""
+        page = self.archive.get(url)
+        if page is None:
+            raise FatalAPIError(f"{url} is not in the page archive")
+        if self.latency:
+            time.sleep(page.elapsed * self.latency)
+        return page
+
+    def close(self) -> None:
+        """Close the archive."""
+        self.archive.close()
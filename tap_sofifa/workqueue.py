@@ -0,0 +1,268 @@
+"""SQLite-backed queue of page jobs shared by worker processes.
+
+Every job is a page of a stream. Workers claim a job, holding a lease on it
+which they renew with heartbeats while the page is fetched, and complete it
+with the page's records. Jobs whose lease expires, because their worker died
+or hung, are handed to the next worker claiming a job. The records are kept
+with the job, zlib-compressed, until the tap merges them into its output in
+job order, partition by partition.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    stream TEXT NOT NULL,
+    url TEXT NOT NULL,
+    partition TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    priority REAL NOT NULL DEFAULT 1,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    records BLOB,
+    UNIQUE (stream, url)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority DESC, id);
+CREATE INDEX IF NOT EXISTS jobs_partition ON jobs (stream, partition, id);
+"""
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job(NamedTuple):
+    """A page of a stream to fetch."""
+
+    id: int
+    stream: str
+    url: str
+    attempts: int
+
+
+class JobFailed(Exception):
+    """Raised when merging a job that failed on every attempt."""
+
+
+class JobStalled(JobFailed):
+    """Raised when merging while no job completes, as no worker is left."""
+
+
+def worker_name() -> str:
+    """Return a name identifying the current process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _partition_key(partition: Optional[dict]) -> str:
+    return json.dumps(
+        {key: value for key, value in (partition or {}).items() if value is not None},
+        sort_keys=True,
+    )
+
+
+class WorkQueue:
+    """Queue of page jobs in a SQLite file, safe to share between processes.
+
+    Args:
+        path: Path of the queue database.
+        lease_seconds: Seconds a claimed job stays leased without heartbeat.
+        max_attempts: Number of times a job is tried before it fails.
+    """
+
+    def __init__(
+        self, path: Union[str, Path], lease_seconds: float = 60, max_attempts: int = 3
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._connection = sqlite3.connect(
+            str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        # Heartbeats are sent from another thread than the one claiming jobs
+        self._lock = threading.RLock()
+
+    def add(
+        self,
+        stream: str,
+        urls: Iterable[str],
+        priority: float = 1,
+        partition: Optional[dict] = None,
+    ) -> int:
+        """Queue the pages of a stream partition, skipping queued ones.
+
+        Jobs are claimed from the highest ``priority`` down, in the order they
+        were added. Their records are merged by the stream partition, such as
+        ``{"league_id": 13, "change_id": 230020}``, they were queued for.
+
+        Returns the number of jobs added.
+        """
+        key = _partition_key(partition)
+        with self._lock, self._connection:
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO jobs (stream, url, partition, priority)"
+                " VALUES (?, ?, ?, ?)",
+                ((stream, url, key, priority) for url in urls),
+            )
+        return cursor.rowcount
+
+    def _release_expired(self, now: float) -> None:
+        self._connection.execute(
+            "UPDATE jobs SET status = ?, worker = NULL"
+            " WHERE status = ? AND lease_expires < ?",
+            (PENDING, LEASED, now),
+        )
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Lease the first pending job to a worker, if any.
+
+        Jobs whose lease expired are pending again.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._release_expired(now)
+                row = self._connection.execute(
+                    "SELECT id, stream, url, attempts FROM jobs WHERE status = ?"
+                    " ORDER BY priority DESC, id LIMIT 1",
+                    (PENDING,),
+                ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?,"
+                        " attempts = attempts + 1 WHERE id = ?",
+                        (LEASED, worker, now + self.lease_seconds, row[0]),
+                    )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return Job(row[0], row[1], row[2], row[3] + 1)
+
+    def heartbeat(self, job: Job, worker: str) -> bool:
+        """Renew the lease of a job, returning whether the worker still holds it."""
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET lease_expires = ?"
+                " WHERE id = ? AND status = ? AND worker = ?",
+                (time.time() + self.lease_seconds, job.id, LEASED, worker),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job: Job, worker: str, records: List[dict]) -> bool:
+        """Store the records of a job, unless its lease was lost."""
+        body = "\n".join(json.dumps(record) for record in records).encode("utf-8")
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = ?, records = ?, error = NULL"
+                " WHERE id = ? AND status = ? AND worker = ?",
+                (DONE, zlib.compress(body), job.id, LEASED, worker),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job: Job, worker: str, error: str) -> None:
+        """Give a job back to the queue, or fail it after its last attempt."""
+        status = FAILED if job.attempts >= self.max_attempts else PENDING
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, error = ?"
+                " WHERE id = ? AND status = ? AND worker = ?",
+                (status, error, job.id, LEASED, worker),
+            )
+
+    def has_jobs(self, stream: str, partition: Optional[dict] = None) -> bool:
+        """Whether pages of a stream partition were queued."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM jobs WHERE stream = ? AND partition = ? LIMIT 1",
+                (stream, _partition_key(partition)),
+            ).fetchone()
+        return row is not None
+
+    def counts(self) -> dict:
+        """Return the number of jobs in each status."""
+        with self._lock:
+            return dict(
+                self._connection.execute(
+                    "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+                ).fetchall()
+            )
+
+    def _done(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (DONE,)
+            ).fetchone()[0]
+
+    def results(
+        self,
+        stream: str,
+        partition: Optional[dict] = None,
+        poll: float = 1,
+        timeout: float = 600,
+    ) -> Iterator[dict]:
+        """Yield the records of a partition's jobs in job order, as they complete.
+
+        Jobs whose lease expires while they are waited for are pending again,
+        for the workers still running to claim.
+
+        Raises:
+            JobFailed: When a job failed on every attempt.
+            JobStalled: When no job of the queue completed for ``timeout``
+                seconds while waiting.
+        """
+        with self._lock:
+            ids = [
+                row[0]
+                for row in self._connection.execute(
+                    "SELECT id FROM jobs WHERE stream = ? AND partition = ?"
+                    " ORDER BY id",
+                    (stream, _partition_key(partition)),
+                )
+            ]
+        for job_id in ids:
+            done, since = self._done(), time.monotonic()
+            while True:
+                with self._lock:
+                    status, url, error, body = self._connection.execute(
+                        "SELECT status, url, error, records FROM jobs WHERE id = ?",
+                        (job_id,),
+                    ).fetchone()
+                if status == FAILED:
+                    raise JobFailed(f"Job for {url} failed: {error}")
+                if status == DONE:
+                    break
+                completed = self._done()
+                if completed != done:
+                    done, since = completed, time.monotonic()
+                elif time.monotonic() - since > timeout:
+                    raise JobStalled(
+                        f"No job completed in {timeout} seconds, waiting for {url}"
+                    )
+                with self._lock:
+                    self._release_expired(time.time())
+                time.sleep(poll)
+            lines = zlib.decompress(body).decode("utf-8")
+            for line in lines.splitlines():
+                yield json.loads(line)
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        self._connection.close()